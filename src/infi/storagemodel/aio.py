@@ -0,0 +1,203 @@
+"""An asyncio front-end for the storage model (Python 3.5 and later).
+
+The objects of the storage model are wrapped by proxies whose methods return awaitables:
+
+    #!python
+    from infi.storagemodel.aio import get_storage_model
+    model = get_storage_model()
+    scsi = await model.get_scsi()
+    for device in await scsi.get_all_scsi_block_devices():
+        print(await device.get_scsi_serial_number())
+
+The calls run in a thread pool, so the event loop keeps running while they read sysfs or send SG_IO ioctls. The calls
+into the layers of the model (the storage model, the SCSI and multipath models, ...) run one at a time, and so do the
+calls into each device, but calls into different devices run concurrently. The proxies wrap the objects of the
+synchronous model, so both share the same caches; `proxy.sync` returns the wrapped object.
+"""
+import asyncio
+from functools import partial, wraps
+from logging import getLogger
+
+try:
+    from asyncio import get_running_loop
+except ImportError:     # python < 3.7
+    from asyncio import get_event_loop as get_running_loop
+
+logger = getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncExecutor(object):
+    """Runs the blocking calls of the storage model in a thread pool of `concurrency` threads.
+
+    The caches of the model are not thread-safe, so the calls into the layers of the model are serialized by a lock,
+    and the calls into a device by a lock of its own. Up to `concurrency` calls into different devices (which send
+    CDBs) run at the same time. The calls that only wait (e.g. for device changes) run without a lock"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        from concurrent.futures import ThreadPoolExecutor
+        from threading import Lock, BoundedSemaphore
+        super(AsyncExecutor, self).__init__()
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(concurrency)
+        self._model_lock = Lock()
+        self._device_semaphore = BoundedSemaphore(concurrency)
+        self._device_locks_lock = Lock()
+
+    def _get_device_lock(self, device):
+        from threading import Lock
+        with self._device_locks_lock:
+            if "_async_executor_lock" not in device.__dict__:
+                device._async_executor_lock = Lock()
+            return device._async_executor_lock
+
+    def _call_locked(self, func):
+        with self._model_lock:
+            return func()
+
+    def _call_on_device(self, device, func):
+        with self._get_device_lock(device), self._device_semaphore:
+            return func()
+
+    def run(self, func, *args, **kwargs):
+        """Returns a future of func(*args, **kwargs), a call into the layers of the model, on the event loop of the
+        running coroutine"""
+        return self.run_unlocked(self._call_locked, partial(func, *args, **kwargs))
+
+    def run_on_device(self, device, func, *args, **kwargs):
+        """Like `run`, for calls into `device` (e.g. a SCSI device or a path), which run concurrently with the calls
+        into other devices"""
+        return self.run_unlocked(self._call_on_device, device, partial(func, *args, **kwargs))
+
+    def run_unlocked(self, func, *args, **kwargs):
+        """Like `run`, for calls that do not touch the model, so they don't wait for the calls that do"""
+        return get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait)
+
+
+def _get_device_types():
+    from .base.inquiry import InquiryInformationMixin
+    from .base.multipath import MultipathDevice, Path
+    from .base.disk import DiskDrive
+    from .base.partition import PartitionTable, Partition
+    return (InquiryInformationMixin, MultipathDevice, Path, DiskDrive, PartitionTable, Partition)
+
+
+def _get_wrapped_types():
+    from .base import StorageModel
+    from .base.scsi import SCSIModel, SCSIBlockDeviceIndex
+    from .base.multipath import MultipathFrameworkModel
+    from .base.disk import DiskModel
+    from .base.mount import MountManager, MountRepository
+    return (StorageModel, SCSIModel, SCSIBlockDeviceIndex, MultipathFrameworkModel, DiskModel, MountManager,
+            MountRepository) + _get_device_types()
+
+
+class AsyncProxy(object):
+    """Wraps an object of the storage model: calling its methods returns awaitables, and the model objects they return
+    (e.g. devices, or lists of devices) are wrapped as well. Attributes that are not methods are returned as they are"""
+
+    def __init__(self, sync, executor):
+        super(AsyncProxy, self).__init__()
+        self.sync = sync
+        self.executor = executor
+
+    def _wrap(self, value):
+        if isinstance(value, _get_wrapped_types()):
+            return AsyncProxy(value, self.executor)
+        if isinstance(value, (list, tuple)) and any(isinstance(item, _get_wrapped_types()) for item in value):
+            return type(value)(self._wrap(item) for item in value)
+        return value
+
+    def __getattr__(self, name):
+        attribute = getattr(self.sync, name)
+        if not callable(attribute):
+            return attribute
+
+        if isinstance(self.sync, _get_device_types()):
+            run = partial(self.executor.run_on_device, self.sync)
+        else:
+            run = self.executor.run
+
+        @wraps(attribute)
+        async def method(*args, **kwargs):
+            return self._wrap(await run(attribute, *args, **kwargs))
+        return method
+
+    def __eq__(self, other):
+        return isinstance(other, AsyncProxy) and self.sync == other.sync
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.sync)
+
+    def __repr__(self):
+        return "<{}({!r})>".format(self.__class__.__name__, self.sync)
+
+
+def _is_async_predicate(predicate):
+    return asyncio.iscoroutinefunction(predicate) or asyncio.iscoroutinefunction(getattr(predicate, "__call__", None))
+
+
+class AsyncStorageModel(AsyncProxy):
+    """Wraps a `infi.storagemodel.base.StorageModel`. Besides the awaitable versions of its methods, it has an
+    awaitable `rescan_and_wait_for` that accepts both predicates and async predicates (coroutine functions)"""
+
+    async def _try_predicate(self, predicate):
+        """Returns True/False if the predicate returned, None on RescanIsNeeded exception"""
+        from .errors import RescanIsNeeded, TimeoutError, StorageModelError
+        if not _is_async_predicate(predicate):
+            return await self.executor.run(self.sync._try_predicate, predicate)
+        try:
+            return await predicate()
+        except (RescanIsNeeded, TimeoutError, StorageModelError) as error:
+            logger.debug("Predicate {!r} raised {!r} during rescan".format(predicate, error), exc_info=True)
+            return None
+        except Exception:
+            logger.exception("An un-expected exception was raised by predicate {!r}".format(predicate))
+            raise
+
+    async def rescan_and_wait_for(self, predicate=None, timeout_in_seconds=60, scope=None, **rescan_kwargs):
+        """Like `infi.storagemodel.base.StorageModel.rescan_and_wait_for`, but the event loop keeps running while we
+        wait. The predicate may be a coroutine function"""
+        from .base import RESCAN_STEP_PREDICATE, RESCAN_STEP_SLEEP, RESCAN_STEP_WAIT
+        steps = self.sync._get_rescan_and_wait_for_steps(predicate, timeout_in_seconds, scope, rescan_kwargs)
+        try:
+            result = None
+            while True:
+                try:
+                    kind, value = steps.send(result)
+                except StopIteration:
+                    return
+                if kind == RESCAN_STEP_PREDICATE:
+                    result = await self._try_predicate(value)
+                elif kind == RESCAN_STEP_SLEEP:
+                    result = await asyncio.sleep(value)
+                elif kind == RESCAN_STEP_WAIT:
+                    result = await self.executor.run_unlocked(value)
+                else:
+                    result = await self.executor.run(value)
+        finally:
+            steps.close()
+
+
+__executor = None
+
+
+def get_executor():
+    """returns a global `AsyncExecutor`"""
+    global __executor
+    if __executor is None:
+        __executor = AsyncExecutor()
+    return __executor
+
+
+def get_storage_model(executor=None):
+    """returns an `AsyncStorageModel` of the global instance of `infi.storagemodel.base.StorageModel`"""
+    from . import get_storage_model as get_sync_storage_model
+    return AsyncStorageModel(get_sync_storage_model(), executor or get_executor())
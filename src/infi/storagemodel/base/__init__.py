@@ -1,9 +1,15 @@
 from .gevent_wrapper import sleep
+from contextlib import contextmanager
 from infi.pyutils.lazy import cached_method, clear_cache
 from logging import getLogger
 
 logger = getLogger(__name__)
 
+RESCAN_STEP_CALL = "call"
+RESCAN_STEP_WAIT = "wait"
+RESCAN_STEP_PREDICATE = "predicate"
+RESCAN_STEP_SLEEP = "sleep"
+
 
 class StorageModel(object):
     """StorageModel provides a layered view of the storage stack.
@@ -22,6 +28,13 @@ class StorageModel(object):
     # This import is for making it easier to work with storagemodel over rpyc
     from .. import predicates
 
+    # when the platform notifies us on device changes, rescan_and_wait_for rescans again only if nothing changed
+    # for this long
+    device_change_poll_interval_in_seconds = 5
+
+    # platforms that can rescan only some of the hosts and targets accept a `scope` keyword in _initiate_rescan
+    supports_scoped_rescan = False
+
     def __init__(self):
         super(StorageModel, self).__init__()
 
@@ -62,12 +75,50 @@ class StorageModel(object):
         """Returns an instance of `infi.storagemodel.base.utils.Utils` """
         return self._create_utils()
 
+    @cached_method
+    def get_device_index(self):
+        """Returns a `infi.storagemodel.base.device_index.DeviceIndex` of the native multipath block devices and the
+        SCSI block devices that are not part of one. Like the device lists, it is built once and thrown away on
+        refresh"""
+        from .device_index import DeviceIndex
+        multipath = self.get_native_multipath()
+        scsi_block_devices = self.get_scsi().get_all_scsi_block_devices()
+        devices = list(multipath.get_all_multipath_block_devices()) + \
+            list(multipath.filter_non_multipath_scsi_block_devices(scsi_block_devices))
+        return DeviceIndex(devices)
+
+    def get_devices_by_serial(self, serial):
+        """Returns a list of the devices with the given SCSI serial number, from `get_device_index`"""
+        return self.get_device_index().find_devices_by_serial(serial)
+
+    def get_device_by_serial(self, serial):
+        """Returns the device with the given SCSI serial number, from `get_device_index`.
+        Raises `KeyError` if no such device is found."""
+        devices = self.get_devices_by_serial(serial)
+        if not devices:
+            raise KeyError(serial)
+        return devices[0]
+
+    def get_devices_by_volume(self, system_serial, volume_id):
+        """Returns a list of the devices of the given volume of the given storage system, from `get_device_index`.
+        Only devices whose vendor implementation can identify their volume are indexed"""
+        return self.get_device_index().find_devices_by_volume(system_serial, volume_id)
+
     def refresh(self):
         """clears the model cache"""
         from ..connectivity import ConnectivityFactory
         clear_cache(self)
         clear_cache(ConnectivityFactory)
 
+    def refresh_incrementally(self):
+        """Refreshes the model like `refresh` does, but on platforms that support it the SCSI device objects of the
+        devices that did not change are kept, along with everything they cached (e.g. their inquiry pages).
+
+        Returns a delta of the SCSI devices that were added, removed or changed (a namedtuple of three HCTL lists), or
+        None if the platform refreshed everything."""
+        self.refresh()
+        return None
+
     def _try_predicate(self, predicate):
         """Returns True/False if the predicate returned, None on RescanIsNeeded exception"""
         from infi.storagemodel.errors import RescanIsNeeded, TimeoutError, StorageModelError
@@ -80,50 +131,116 @@ class StorageModel(object):
             logger.exception("An un-expected exception was raised by predicate {!r}".format(predicate))
             raise
 
-    def rescan_and_wait_for(self, predicate=None, timeout_in_seconds=60, **rescan_kwargs):
+    def rescan_and_wait_for(self, predicate=None, timeout_in_seconds=60, scope=None, **rescan_kwargs):
         """Rescan devices and poll the predicate until either it returns True or a timeout is reached.
 
         The model is refreshed automatically, there is no need to `refresh` after calling this method or in the
         implementation of the predicate.
 
+        On platforms that notify on device changes (Linux uevents), the predicate is tried again as soon as devices
+        change, and devices are rescanned again only if nothing changed for `device_change_poll_interval_in_seconds`.
+
         **predicate**: a callable object that returns either True or False.
 
         **timeout_in_seconds**: time in seconds to poll the predicate.
 
+        **scope**: limits the rescan to some of the hosts and targets, see `infi.storagemodel.base.rescan_scope`.
+        It is ignored on platforms that can't limit their rescans.
+
         **rescan_kwargs**: additional keyword arguments to pass to `_initiate_rescan`.
 
         Raises `infi.storagemodel.errors.TimeoutError` exception if the timeout is reached.
         """
+        steps = self._get_rescan_and_wait_for_steps(predicate, timeout_in_seconds, scope, rescan_kwargs)
+        try:
+            result = None
+            while True:
+                try:
+                    kind, value = steps.send(result)
+                except StopIteration:
+                    return
+                if kind == RESCAN_STEP_PREDICATE:
+                    result = self._try_predicate(value)
+                elif kind == RESCAN_STEP_SLEEP:
+                    result = sleep(value)
+                else:   # RESCAN_STEP_CALL or RESCAN_STEP_WAIT
+                    result = value()
+        finally:
+            steps.close()
+
+    def _get_rescan_and_wait_for_steps(self, predicate, timeout_in_seconds, scope, rescan_kwargs):
+        """A generator of the steps of `rescan_and_wait_for`, so the asyncio front-end can run the same loop.
+        It yields (kind, value) tuples and gets the result of each step sent back:
+
+        * (RESCAN_STEP_CALL, callable): a call into the model, its return value is sent back
+        * (RESCAN_STEP_WAIT, callable): a call that waits for device changes and does not touch the model
+        * (RESCAN_STEP_PREDICATE, predicate): the result of `_try_predicate(predicate)` is sent back
+        * (RESCAN_STEP_SLEEP, seconds)
+        """
         from time import time
         from sys import maxsize
+        from functools import partial
         from ..errors import TimeoutError
         if timeout_in_seconds is None:
             timeout_in_seconds = maxsize
         if predicate is None:
             from ..predicates import WaitForNothing
             predicate = WaitForNothing()
-        self.refresh()
+        rescan_kwargs = dict(rescan_kwargs, **self._get_rescan_scope_kwargs(scope, predicate))
+        yield RESCAN_STEP_CALL, self.refresh
         start_time = time()
-        logger.debug("Initiating rescan with keyword arguments {!r}".format(rescan_kwargs))
-        self._initiate_rescan(**rescan_kwargs)
-        self.refresh()
-        while True:
-            logger.debug("Trying predicate: {!r}".format(predicate))
-            result = self._try_predicate(predicate)
-            if result:
-                logger.debug("Predicate returned True, finished rescanning")
-                break
-            if time() - start_time >= timeout_in_seconds:
-                logger.debug("Rescan did not complete before timeout")
-                raise TimeoutError()  # pylint: disable=W0710
-            logger.debug("Predicate returned False, will rescan again")
-            self.retry_rescan(**rescan_kwargs)
-            sleep(1)
-            self.refresh()
+        with self._listen_for_device_changes() as listener:
+            logger.debug("Initiating rescan with keyword arguments {!r}".format(rescan_kwargs))
+            yield RESCAN_STEP_CALL, partial(self._initiate_rescan, **rescan_kwargs)
+            yield RESCAN_STEP_CALL, self.refresh
+            while True:
+                logger.debug("Trying predicate: {!r}".format(predicate))
+                result = yield RESCAN_STEP_PREDICATE, predicate
+                if result:
+                    logger.debug("Predicate returned True, finished rescanning")
+                    break
+                if time() - start_time >= timeout_in_seconds:
+                    logger.debug("Rescan did not complete before timeout")
+                    raise TimeoutError()  # pylint: disable=W0710
+                if listener is None:
+                    logger.debug("Predicate returned False, will rescan again")
+                    yield RESCAN_STEP_CALL, partial(self.retry_rescan, **rescan_kwargs)
+                    yield RESCAN_STEP_SLEEP, 1
+                else:
+                    timeout = min(self.device_change_poll_interval_in_seconds,
+                                  max(timeout_in_seconds - (time() - start_time), 0))
+                    changed = yield RESCAN_STEP_WAIT, partial(listener.wait_for_change, timeout)
+                    if changed:
+                        logger.debug("Predicate returned False, devices changed since so trying it again")
+                    else:
+                        logger.debug("Predicate returned False and no devices changed, will rescan again")
+                        yield RESCAN_STEP_CALL, partial(self.retry_rescan, **rescan_kwargs)
+                yield RESCAN_STEP_CALL, self.refresh
 
     def retry_rescan(self, **rescan_kwargs):
         self._initiate_rescan(**rescan_kwargs)
 
+    def _get_rescan_scope_kwargs(self, scope, predicate):
+        from .rescan_scope import create_rescan_scope
+        scope = create_rescan_scope(scope, predicate)
+        if scope is None:
+            return dict()
+        if not self.supports_scoped_rescan:
+            logger.debug("Rescanning everything, this platform ignores the rescan scope {!r}".format(scope))
+            return dict()
+        return dict(scope=scope)
+
+    @contextmanager
+    def _listen_for_device_changes(self):
+        """A context that yields an object with a `wait_for_change(timeout)` method that returns a true value when
+        devices were added, removed or changed, or None if the platform can't tell (then the predicate is polled)"""
+        listener = self._create_device_change_listener()
+        try:
+            yield listener
+        finally:
+            if listener is not None:
+                listener.close()
+
 
     #############################
     # Platform Specific Methods #
@@ -134,6 +251,10 @@ class StorageModel(object):
         # platform implementation
         raise NotImplementedError()
 
+    def _create_device_change_listener(self):
+        # platform implementation, optional
+        return None
+
     def _create_scsi_model(self):  # pragma: no cover
         # platform implementation
         raise NotImplementedError()
@@ -0,0 +1,35 @@
+from infi.pyutils.lazy import cached_method
+from .scsi import SCSIBlockDeviceIndex
+
+
+def _get_volume_keys(device):
+    vendor = device.get_vendor()
+    if vendor is None or not hasattr(vendor, "get_volume_index_keys"):
+        return []
+    return vendor.get_volume_index_keys()
+
+
+class DeviceIndex(SCSIBlockDeviceIndex):
+    """A `infi.storagemodel.base.scsi.SCSIBlockDeviceIndex` over the block devices that volumes are accessed through:
+    the multipath block devices and the SCSI block devices that are not part of one. On top of the tables it
+    inherits, it has a table of the volumes of the storage systems"""
+
+    @cached_method
+    def _get_volume_index(self):
+        return self._build_keys_dict(_get_volume_keys, concurrency=self._concurrency)
+
+    def get_volume_dict(self):
+        """Returns a dict of (system serial, volume id) -> list of devices, for the devices whose vendor implementation
+        has a `get_volume_index_keys` method. A device may be listed under several keys (e.g. a replicated volume)"""
+        return self._get_volume_index()[0]
+
+    def get_unindexed_volume_devices(self):
+        """Returns the devices that could not be identified when the volume table was built (e.g. they did not
+        respond to inquiry)"""
+        return list(self._get_volume_index()[1])
+
+    def find_devices_by_serial(self, serial):
+        return list(self.get_serial_dict().get(serial, []))
+
+    def find_devices_by_volume(self, system_serial, volume_id):
+        return list(self.get_volume_dict().get((system_serial, volume_id), []))
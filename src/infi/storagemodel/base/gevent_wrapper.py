@@ -7,10 +7,11 @@ try:
     from gevent import sleep
     from gevent import getcurrent as get_id
     from gevent.event import Event
+    from gevent.lock import BoundedSemaphore
     is_thread_alive = lambda greenlet: not greenlet.dead
 except ImportError:
     from time import sleep
-    from threading import Event
+    from threading import Event, BoundedSemaphore
     try:
         from thread import get_ident as get_id
     except ImportError:
@@ -43,6 +44,36 @@ def run_together(callables):
     joinall([spawn(item) for item in callables], raise_error=True)
 
 
+def run_concurrently(callables, concurrency=None):
+    """Calls the callables with at most `concurrency` of them running at once, and returns their results in order.
+    If any of the callables raised an exception, the first one is re-raised after all of them are done.
+    The callables run in greenlets when gevent is installed, and in real threads otherwise, so callables that share
+    state (e.g. the `cached_method` caches of a model) must synchronize it themselves."""
+    from collections import deque
+    from sys import exc_info
+    from six import reraise
+    tasks = deque(enumerate(callables))
+    results = [None] * len(tasks)
+    errors = []
+
+    def worker():
+        while True:
+            try:
+                index, item = tasks.popleft()
+            except IndexError:
+                return
+            try:
+                results[index] = item()
+            except Exception:
+                errors.append(exc_info())
+
+    number_of_workers = min(concurrency or len(tasks), len(tasks))
+    joinall([spawn(worker) for _ in range(number_of_workers)])
+    if errors:
+        reraise(*errors[0])
+    return results
+
+
 
 def reinit():
     try:
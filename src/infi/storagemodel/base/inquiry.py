@@ -1,10 +1,29 @@
 from infi.pyutils.lazy import cached_method, LazyImmutableDict
+from contextlib import contextmanager
 from infi.storagemodel.errors import check_for_scsi_errors, StorageModelError
+from .gevent_wrapper import BoundedSemaphore
 from logging import getLogger
 logger = getLogger(__name__)
 #pylint: disable=E1002,W0622
 
-__all__ = ['InquiryInformationMixin']
+__all__ = ['InquiryInformationMixin', 'prefetch_inquiry', 'sweep_test_unit_ready']
+
+DEFAULT_PREFETCH_PAGES = (0x00, 0x80, 0x83)
+DEFAULT_PREFETCH_CONCURRENCY = 32
+DEFAULT_TEST_UNIT_READY_CONCURRENCY = 32
+
+
+def _unpack_vpd_page(page_code, buffer):
+    from infi.asi.cdb.inquiry.vpd_pages import get_vpd_page_data
+    page = get_vpd_page_data(page_code)()
+    page.unpack(buffer)
+    return page
+
+
+def _is_inquiry_data_changed(error):
+    sense = error.sense_obj
+    return sense is not None and \
+        (sense.sense_key, sense.additional_sense_code.code_name) == ('UNIT_ATTENTION', 'INQUIRY DATA HAS CHANGED')
 
 
 class SupportedVPDPagesDict(LazyImmutableDict):
@@ -16,14 +35,174 @@ class SupportedVPDPagesDict(LazyImmutableDict):
     def _create_value(self, page_code):
         from infi.asi.cdb.inquiry.vpd_pages import get_vpd_page
         from infi.asi.coroutines.sync_adapter import sync_wait
-        with self.device.asi_context() as asi:
+        cached_buffer = self.device._get_cached_inquiry_buffer(page_code)
+        if cached_buffer is not None:
+            return _unpack_vpd_page(page_code, cached_buffer)
+        with self.device.asi_context() as asi, self.device._inquiry_data_change_guard():
             inquiry_command = get_vpd_page(page_code)()
-            return sync_wait(inquiry_command.execute(asi))
+            data = sync_wait(inquiry_command.execute(asi))
+        self.device._cache_inquiry_buffer(page_code, data)
+        return data
+
+    @check_for_scsi_errors
+    def fetch_many(self, page_codes):
+        """Fetches all the supported pages out of page_codes that were not fetched yet, over a single open of the
+        device. Pages that fail with CHECK CONDITION are left unfetched, so accessing them raises the error as usual"""
+        from infi.asi.cdb.inquiry.vpd_pages import get_vpd_page
+        from infi.asi.coroutines.sync_adapter import sync_wait
+        from infi.asi import AsiCheckConditionError
+        missing_page_codes = []
+        for page_code in page_codes:
+            if page_code not in self._dict or self._dict[page_code] is not None:
+                continue
+            cached_buffer = self.device._get_cached_inquiry_buffer(page_code)
+            if cached_buffer is not None:
+                self._dict[page_code] = _unpack_vpd_page(page_code, cached_buffer)
+            else:
+                missing_page_codes.append(page_code)
+        if not missing_page_codes:
+            return
+        with self.device.asi_context() as asi:
+            for page_code in missing_page_codes:
+                inquiry_command = get_vpd_page(page_code)()
+                try:
+                    with self.device._inquiry_data_change_guard():
+                        self._dict[page_code] = sync_wait(inquiry_command.execute(asi))
+                except AsiCheckConditionError:
+                    logger.debug("failed to fetch page {:#04x} of {!r}".format(page_code, self.device), exc_info=True)
+                else:
+                    self.device._cache_inquiry_buffer(page_code, self._dict[page_code])
 
     def __repr__(self):
         return "<Supported VPD Pages for {!r}: {!r}>".format(self.device, sorted(self.keys()))
 
 
+def _prefetch_device_inquiry(device, pages, standard_inquiry):
+    from infi.asi.cdb.inquiry.vpd_pages import INQUIRY_PAGE_UNIT_SERIAL_NUMBER
+    try:
+        if standard_inquiry:
+            device.get_scsi_standard_inquiry()
+        inquiry_pages = device.get_scsi_inquiry_pages()
+        if hasattr(inquiry_pages, 'fetch_many'):
+            inquiry_pages.fetch_many(pages)
+        else:
+            for page_code in pages:
+                if page_code in inquiry_pages:
+                    inquiry_pages[page_code]
+        if INQUIRY_PAGE_UNIT_SERIAL_NUMBER in pages:
+            device.get_scsi_serial_number()
+    except Exception:
+        # the getters will raise this again when they are called, we're only warming up the caches here
+        logger.debug("failed to prefetch inquiry data of {!r}".format(device), exc_info=True)
+
+
+def prefetch_inquiry(devices, pages=DEFAULT_PREFETCH_PAGES, concurrency=DEFAULT_PREFETCH_CONCURRENCY,
+                     standard_inquiry=True):
+    """Sends the standard inquiry and the requested VPD pages to many devices at once, at most `concurrency` devices
+    at a time, and keeps the responses in the devices' caches so later calls to `get_scsi_standard_inquiry`,
+    `get_scsi_inquiry_pages` and `get_scsi_serial_number` do not send any CDBs.
+
+    Pages that a device does not support are skipped, and errors are not raised."""
+    from .gevent_wrapper import run_concurrently
+    from functools import partial
+    unique_devices = list(dict((id(device), device) for device in devices).values())
+    run_concurrently([partial(_prefetch_device_inquiry, device, pages, standard_inquiry)
+                      for device in unique_devices], concurrency)
+
+
+# the devices (by `_get_test_unit_ready_key`) whose TEST UNIT READY was given up on and did not complete yet
+_outstanding_test_unit_ready = set()
+_outstanding_test_unit_ready_lock = BoundedSemaphore()
+
+
+def _get_test_unit_ready_key(device):
+    """The device objects are created again on every refresh, so a device is known by its access path"""
+    for method_name in ("get_scsi_access_path", "get_multipath_access_path", "get_block_access_path"):
+        try:
+            return getattr(device, method_name)()
+        except (AttributeError, NotImplementedError):
+            pass
+    return device
+
+
+def _get_time_left(deadlines):
+    from time import time
+    deadlines = [deadline for deadline in deadlines if deadline is not None]
+    return None if not deadlines else max(min(deadlines) - time(), 0)
+
+
+def sweep_test_unit_ready(devices, device_timeout=None, timeout=None,
+                          concurrency=DEFAULT_TEST_UNIT_READY_CONCURRENCY):
+    """Sends TEST UNIT READY to many devices at once, at most `concurrency` devices at a time, and returns a dict of
+    device -> True if it is ready, False if it is not ready, and None if it did not respond within `device_timeout`
+    seconds or before the sweep ended after `timeout` seconds (both are optional).
+
+    The devices that did not respond in time are given up on: their command completes (or times out) in the
+    background, and does not hold a place among the `concurrency` running ones. Until it does, later sweeps do not
+    send another command to the device (it is None in their result), so a hung device does not pile up commands and
+    open handles. If any of the commands raised an exception, the first one is re-raised after the sweep is done."""
+    from collections import deque
+    from time import time
+    from six import reraise
+    from sys import exc_info
+    from .gevent_wrapper import spawn, Event, BoundedSemaphore
+    unique_devices = list(dict((id(device), device) for device in devices).values())
+    sweep_deadline = None if timeout is None else time() + timeout
+    tasks = deque(unique_devices)
+    readiness = dict((device, None) for device in unique_devices)
+    errors = []
+    finished = Event()
+    running_workers = [min(concurrency or len(tasks), len(tasks))]
+    # without gevent the workers are threads
+    running_workers_lock = BoundedSemaphore()
+
+    def test_unit_ready(device, key, responded):
+        try:
+            readiness[device] = bool(device.get_scsi_test_unit_ready())
+        except Exception:
+            errors.append(exc_info())
+        finally:
+            with _outstanding_test_unit_ready_lock:
+                _outstanding_test_unit_ready.discard(key)
+            responded.set()
+
+    def worker():
+        try:
+            while not finished.is_set():
+                try:
+                    device = tasks.popleft()
+                except IndexError:
+                    return
+                key = _get_test_unit_ready_key(device)
+                with _outstanding_test_unit_ready_lock:
+                    if key in _outstanding_test_unit_ready:
+                        logger.debug("{!r} did not complete a previous TEST UNIT READY yet".format(device))
+                        continue
+                    _outstanding_test_unit_ready.add(key)
+                responded = Event()
+                spawn(test_unit_ready, device, key, responded)
+                device_deadline = None if device_timeout is None else time() + device_timeout
+                if not responded.wait(_get_time_left([device_deadline, sweep_deadline])):
+                    logger.debug("{!r} did not respond to TEST UNIT READY in time".format(device))
+        finally:
+            with running_workers_lock:
+                running_workers[0] -= 1
+                if running_workers[0] == 0:
+                    finished.set()
+
+    if not unique_devices:
+        return readiness
+    for _ in range(running_workers[0]):
+        spawn(worker)
+    finished.wait(_get_time_left([sweep_deadline]))
+    # workers that are still waiting will not start new commands
+    finished.set()
+    result = dict(readiness)
+    if errors:
+        reraise(*errors[0])
+    return result
+
+
 class InquiryInformationMixin(object):
     @cached_method
     def get_scsi_vendor_id_or_unknown_on_error(self):
@@ -74,12 +253,20 @@ class InquiryInformationMixin(object):
         command = SupportedVPDPagesCommand()
 
         page_dict = {}
+        cached_buffer = self._get_cached_inquiry_buffer(INQUIRY_PAGE_SUPPORTED_VPD_PAGES)
+        if cached_buffer is not None:
+            data = _unpack_vpd_page(INQUIRY_PAGE_SUPPORTED_VPD_PAGES, cached_buffer)
+            page_dict[INQUIRY_PAGE_SUPPORTED_VPD_PAGES] = data
+            for page_code in data.vpd_parameters:
+                page_dict[page_code] = None
+            return SupportedVPDPagesDict(page_dict, self)
         try:
-            with self.asi_context() as asi:
+            with self.asi_context() as asi, self._inquiry_data_change_guard():
                 data = sync_wait(command.execute(asi))
                 page_dict[INQUIRY_PAGE_SUPPORTED_VPD_PAGES] = data
                 for page_code in data.vpd_parameters:
                     page_dict[page_code] = None
+            self._cache_inquiry_buffer(INQUIRY_PAGE_SUPPORTED_VPD_PAGES, data)
         except AsiCheckConditionError as e:
             (key, code) = (e.sense_obj.sense_key, e.sense_obj.additional_sense_code.code_name)
             if (key, code) == ('ILLEGAL_REQUEST', 'INVALID FIELD IN CDB'):
@@ -125,10 +312,12 @@ class InquiryInformationMixin(object):
         from infi.asi import AsiCheckConditionError
         from infi.asi.coroutines.sync_adapter import sync_wait
         from infi.asi.cdb.inquiry.standard import StandardInquiryCommand, STANDARD_INQUIRY_MINIMAL_DATA_LENGTH
+        from infi.asi.cdb.inquiry.standard import StandardInquiryDataBuffer
+        from .inquiry_cache import STANDARD_INQUIRY_PAGE_CODE
 
         def _get_scsi_standard_inquiry_the_fastest_way(allocation_length=219):
             try:
-                with self.asi_context() as asi:
+                with self.asi_context() as asi, self._inquiry_data_change_guard():
                     command = StandardInquiryCommand(allocation_length=allocation_length)
                     return sync_wait(command.execute(asi))
             except AsiCheckConditionError as e:
@@ -139,7 +328,7 @@ class InquiryInformationMixin(object):
 
         def _get_scsi_standard_inquiry_the_right_way():
             allocation_length = STANDARD_INQUIRY_MINIMAL_DATA_LENGTH
-            with self.asi_context() as asi:
+            with self.asi_context() as asi, self._inquiry_data_change_guard():
                 command = StandardInquiryCommand(allocation_length=allocation_length)
                 result = sync_wait(command.execute(asi))
                 if result.additional_length >= 0:
@@ -154,7 +343,50 @@ class InquiryInformationMixin(object):
         # but we did not handle the case in which is was to much and the device returned INVALID FIELD IN CDB
         # so now we first ask for a large buffer of 254 bytes like other tools, and if that doesn't work
         # then we fail-back to the safe way
-        return _get_scsi_standard_inquiry_the_fastest_way() or _get_scsi_standard_inquiry_the_right_way()
+        cached_buffer = self._get_cached_inquiry_buffer(STANDARD_INQUIRY_PAGE_CODE)
+        if cached_buffer is not None:
+            result = StandardInquiryDataBuffer()
+            result.unpack(cached_buffer)
+            return result
+        result = _get_scsi_standard_inquiry_the_fastest_way() or _get_scsi_standard_inquiry_the_right_way()
+        self._cache_inquiry_buffer(STANDARD_INQUIRY_PAGE_CODE, result)
+        return result
+
+    def _get_inquiry_cache_key(self):
+        """Returns an (identity, generation) pair of strings that identify this device in the persistent inquiry cache
+        (see `infi.storagemodel.base.inquiry_cache`), or None if the device can't be identified without sending CDBs.
+        Platforms that can identify their devices override this"""
+        return None
+
+    def _get_cached_inquiry_buffer(self, page_code):
+        from .inquiry_cache import get_inquiry_cache
+        cache = get_inquiry_cache()
+        key = None if cache is None else self._get_inquiry_cache_key()
+        if key is None:
+            return None
+        return cache.get(key[0], key[1], page_code)
+
+    def _cache_inquiry_buffer(self, page_code, data):
+        from .inquiry_cache import get_inquiry_cache
+        cache = get_inquiry_cache()
+        key = None if cache is None else self._get_inquiry_cache_key()
+        if key is not None:
+            cache.put(key[0], key[1], page_code, data.pack())
+
+    @contextmanager
+    def _inquiry_data_change_guard(self):
+        """drops the persistent inquiry cache entries of this device when it reports INQUIRY DATA HAS CHANGED"""
+        from infi.asi import AsiCheckConditionError
+        from .inquiry_cache import get_inquiry_cache
+        try:
+            yield
+        except AsiCheckConditionError as error:
+            cache = get_inquiry_cache()
+            key = None if cache is None else self._get_inquiry_cache_key()
+            if key is not None and _is_inquiry_data_changed(error):
+                logger.debug("inquiry data of {!r} has changed, dropping it from the persistent cache".format(self))
+                cache.invalidate(key[0])
+            raise
 
 
 class SCSICommandInformationMixin(InquiryInformationMixin):
@@ -166,7 +398,7 @@ class SCSICommandInformationMixin(InquiryInformationMixin):
         from infi.asi.cdb.tur import TestUnitReadyCommand
         from infi.asi.coroutines.sync_adapter import sync_wait
         from infi.asi.errors import AsiCheckConditionError, AsiReservationConflictError
-        with self.asi_context() as asi:
+        with self.asi_context() as asi, self._inquiry_data_change_guard():
             try:
                 command = TestUnitReadyCommand()
                 return sync_wait(command.execute(asi))
@@ -0,0 +1,110 @@
+"""An optional persistent cache of raw inquiry buffers.
+
+When enabled, the standard inquiry and the VPD pages that are read from a device are kept on disk, keyed by the
+identity of the device. A restarted process then decodes the buffers it already has instead of sending the CDBs to
+every device again:
+
+    #!python
+    from infi.storagemodel.base.inquiry_cache import enable_persistent_inquiry_cache
+    enable_persistent_inquiry_cache()
+
+A device is identified by an (identity, generation) pair that the platform provides (on Linux: the sg devno, the HCTL
+and the WWID, and the modification times of the sysfs inquiry attributes as the generation). Entries of a device are
+dropped when its generation changes, or when the device reports UNIT ATTENTION / INQUIRY DATA HAS CHANGED.
+"""
+import os
+import threading
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+__all__ = ['PersistentInquiryCache', 'enable_persistent_inquiry_cache', 'disable_persistent_inquiry_cache',
+           'get_inquiry_cache']
+
+DEFAULT_INQUIRY_CACHE_PATH = "/var/cache/infi.storagemodel/inquiry.sqlite"
+STANDARD_INQUIRY_PAGE_CODE = -1
+
+_inquiry_cache = None
+
+
+class PersistentInquiryCache(object):
+    """A sqlite-backed store of raw inquiry buffers. All the entries are loaded into memory when the cache is opened,
+    and new entries are written through to the file"""
+
+    def __init__(self, path=DEFAULT_INQUIRY_CACHE_PATH):
+        import sqlite3
+        super(PersistentInquiryCache, self).__init__()
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # this is a cache, losing the last writes on a crash is better than an fsync on every device
+        self._connection.execute("PRAGMA synchronous=OFF")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS inquiry_pages (identity TEXT NOT NULL, "
+                                 "generation TEXT NOT NULL, page_code INTEGER NOT NULL, buffer BLOB NOT NULL, "
+                                 "PRIMARY KEY (identity, page_code))")
+        self._entries = {}
+        for identity, generation, page_code, buffer in self._connection.execute("SELECT * FROM inquiry_pages"):
+            self._entries.setdefault(identity, (generation, {}))[1][page_code] = bytes(buffer)
+
+    def get(self, identity, generation, page_code):
+        """Returns the raw buffer of the page, or None if it's not in the cache or was cached for another generation"""
+        entry = self._entries.get(identity)
+        if entry is None:
+            return None
+        if entry[0] != generation:
+            self.invalidate(identity)
+            return None
+        return entry[1].get(page_code)
+
+    def put(self, identity, generation, page_code, buffer):
+        buffer = bytes(buffer)
+        with self._lock:
+            entry = self._entries.get(identity)
+            if entry is None or entry[0] != generation:
+                entry = self._entries[identity] = (generation, {})
+                self._connection.execute("DELETE FROM inquiry_pages WHERE identity=?", (identity,))
+            entry[1][page_code] = buffer
+            self._connection.execute("INSERT OR REPLACE INTO inquiry_pages VALUES (?, ?, ?, ?)",
+                                     (identity, generation, page_code, buffer))
+
+    def invalidate(self, identity):
+        with self._lock:
+            self._entries.pop(identity, None)
+            self._connection.execute("DELETE FROM inquiry_pages WHERE identity=?", (identity,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._connection.execute("DELETE FROM inquiry_pages")
+
+    def close(self):
+        self._connection.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return "<PersistentInquiryCache {!r}: {} devices>".format(self.path, len(self))
+
+
+def get_inquiry_cache():
+    """Returns the active `PersistentInquiryCache`, or None if the persistent cache is disabled"""
+    return _inquiry_cache
+
+
+def enable_persistent_inquiry_cache(path=DEFAULT_INQUIRY_CACHE_PATH):
+    """Opens the cache file (creating it if needed) and starts using it for all the devices"""
+    global _inquiry_cache
+    disable_persistent_inquiry_cache()
+    _inquiry_cache = PersistentInquiryCache(path)
+    return _inquiry_cache
+
+
+def disable_persistent_inquiry_cache():
+    global _inquiry_cache
+    if _inquiry_cache is not None:
+        _inquiry_cache.close()
+    _inquiry_cache = None
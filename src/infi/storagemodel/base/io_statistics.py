@@ -0,0 +1,197 @@
+"""Samples the cumulative I/O counters of paths and computes their rates over sliding windows.
+
+    #!python
+    from infi.storagemodel import get_storage_model
+    model = get_storage_model()
+    sampler = IOStatisticsSampler(lambda: model.get_native_multipath().get_io_statistics_for_all_paths())
+    sampler.start(interval=10)
+    ...
+    rates = sampler.get_all_rates(window=60)   # name -> IORates
+
+The samples are kept in ring buffers of `capacity` samples: one array of doubles per name, so the memory used is
+about capacity * 7 * 8 bytes per name (a little over 30MB for 10,000 paths and the default capacity), no matter how
+long the sampler runs. A name that is missing from all the samples in the ring (e.g. a path that was removed) is
+dropped. Sampling and reading are serialized by a lock, so the rates are never computed from a partly stored sample.
+"""
+from array import array
+from collections import namedtuple
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# 10 minutes of samples, at 10 seconds
+DEFAULT_CAPACITY = 60
+
+FIELDS = ("bytes_read", "bytes_written", "read_io_count", "write_io_count", "read_time", "write_time", "io_ticks")
+BYTES_READ, BYTES_WRITTEN, READ_IO_COUNT, WRITE_IO_COUNT, READ_TIME, WRITE_TIME, IO_TICKS = range(len(FIELDS))
+
+NAN = float("nan")
+
+IORates = namedtuple("IORates", ["read_iops", "write_iops", "read_bytes_per_second", "write_bytes_per_second",
+                                 "average_latency_in_ms", "utilization"])
+IORates.__doc__ = """The rates of a path (or a LUN) over a window. average_latency_in_ms and utilization (the part of
+the window the device was busy, 0 to 1) are None if the platform does not report the time spent on I/Os"""
+
+
+def _is_nan(value):
+    return value != value
+
+
+def _get_timer():
+    try:
+        from time import monotonic
+    except ImportError:     # python 2
+        from time import time as monotonic
+    return monotonic
+
+
+def _sum_fields(buffers, slot):
+    values = [0.0] * len(FIELDS)
+    for buffer in buffers:
+        offset = slot * len(FIELDS)
+        for index in range(len(FIELDS)):
+            values[index] += buffer[offset + index]
+    return values
+
+
+class IOStatisticsSampler(object):
+    def __init__(self, get_statistics, capacity=DEFAULT_CAPACITY):
+        """`get_statistics` is called on every sample, and returns a dict of name (e.g. a path ID) ->
+        `infi.storagemodel.base.multipath.PathStatistics`"""
+        from .gevent_wrapper import BoundedSemaphore
+        super(IOStatisticsSampler, self).__init__()
+        self._get_statistics = get_statistics
+        self._capacity = capacity
+        self._timer = _get_timer()
+        self._timestamps = array("d", [NAN] * capacity)
+        self._buffers = dict()          # name -> array of capacity * len(FIELDS) doubles
+        self._missing_samples = dict()  # name -> number of consecutive samples it was missing from
+        self._next_slot = 0
+        self._number_of_samples = 0
+        self._stop_event = None
+        self._lock = BoundedSemaphore()
+
+    def _get_new_buffer(self):
+        return array("d", [NAN] * (self._capacity * len(FIELDS)))
+
+    def _store(self, buffer, slot, statistics):
+        offset = slot * len(FIELDS)
+        for index, field in enumerate(FIELDS):
+            value = getattr(statistics, field, None) if statistics is not None else None
+            buffer[offset + index] = NAN if value is None or value < 0 else value
+
+    def add_sample(self, statistics, timestamp=None):
+        """Stores a sample of a dict of name -> `infi.storagemodel.base.multipath.PathStatistics`"""
+        timestamp = self._timer() if timestamp is None else timestamp
+        with self._lock:
+            slot = self._next_slot
+            for name, path_statistics in statistics.items():
+                if name not in self._buffers:
+                    self._buffers[name] = self._get_new_buffer()
+                self._missing_samples[name] = 0
+                self._store(self._buffers[name], slot, path_statistics)
+            for name in [name for name in self._buffers if name not in statistics]:
+                self._missing_samples[name] += 1
+                if self._missing_samples[name] >= self._capacity:
+                    del self._buffers[name], self._missing_samples[name]
+                else:
+                    self._store(self._buffers[name], slot, None)
+            self._timestamps[slot] = timestamp
+            self._next_slot = (slot + 1) % self._capacity
+            self._number_of_samples = min(self._number_of_samples + 1, self._capacity)
+
+    def sample(self):
+        """Gets the statistics and stores them"""
+        self.add_sample(self._get_statistics())
+
+    def start(self, interval):
+        """Samples every `interval` seconds in the background, until `stop` is called"""
+        from .gevent_wrapper import Event, spawn
+        self.stop()
+        self._stop_event = stop_event = Event()
+
+        def run():
+            while True:
+                try:
+                    self.sample()
+                except Exception:
+                    logger.exception("failed to sample I/O statistics")
+                if stop_event.wait(interval):
+                    return
+        return spawn(run)
+
+    def stop(self):
+        if self._stop_event is not None:
+            self._stop_event.set()
+            self._stop_event = None
+
+    def get_names(self):
+        with self._lock:
+            return list(self._buffers)
+
+    def _get_window_slots(self, window):
+        """Returns the slots of the first and the last samples in the last `window` seconds, or None if there are
+        less than two"""
+        if self._number_of_samples < 2:
+            return None
+        last = (self._next_slot - 1) % self._capacity
+        first = last
+        for age in range(1, self._number_of_samples):
+            slot = (last - age) % self._capacity
+            if self._timestamps[last] - self._timestamps[slot] > window:
+                break
+            first = slot
+        return None if first == last else (first, last)
+
+    def _get_rates(self, buffers, slots, busiest_utilization=False):
+        first, last = slots
+        duration = self._timestamps[last] - self._timestamps[first]
+        deltas = [end - start for start, end in zip(_sum_fields(buffers, first), _sum_fields(buffers, last))]
+        if duration <= 0 or any(_is_nan(delta) or delta < 0 for delta in deltas[:READ_TIME]):
+            # a missing sample, or a counter that was reset (e.g. the device was re-created)
+            return None
+        io_count = deltas[READ_IO_COUNT] + deltas[WRITE_IO_COUNT]
+        io_time = deltas[READ_TIME] + deltas[WRITE_TIME]
+        latency = None if _is_nan(io_time) or io_time < 0 else (io_time / io_count if io_count else 0.0)
+        if busiest_utilization:
+            io_ticks = max(buffer[last * len(FIELDS) + IO_TICKS] - buffer[first * len(FIELDS) + IO_TICKS]
+                           for buffer in buffers)
+        else:
+            io_ticks = deltas[IO_TICKS]
+        utilization = None if _is_nan(io_ticks) or io_ticks < 0 else min(io_ticks / (duration * 1000.0), 1.0)
+        return IORates(deltas[READ_IO_COUNT] / duration, deltas[WRITE_IO_COUNT] / duration,
+                       deltas[BYTES_READ] / duration, deltas[BYTES_WRITTEN] / duration, latency, utilization)
+
+    def get_rates(self, name, window):
+        """Returns the `IORates` of `name` over the last `window` seconds, or None if there are not enough samples
+        of it in the window"""
+        with self._lock:
+            slots = self._get_window_slots(window)
+            if slots is None or name not in self._buffers:
+                return None
+            return self._get_rates([self._buffers[name]], slots)
+
+    def get_lun_rates(self, names, window):
+        """Returns the `IORates` of a LUN over the last `window` seconds, from the counters of its paths (`names`)
+        added together. The utilization is that of the busiest path. On Linux, the statistics of the dm-N device of
+        a multipath device are sampled too, and `get_rates` of it gives the rates of the LUN as the host sees them"""
+        with self._lock:
+            slots = self._get_window_slots(window)
+            buffers = [self._buffers[name] for name in names if name in self._buffers]
+            if slots is None or not buffers:
+                return None
+            return self._get_rates(buffers, slots, busiest_utilization=True)
+
+    def get_all_rates(self, window):
+        """Returns a dict of name -> `IORates` over the last `window` seconds, of all the names that have enough
+        samples in the window"""
+        result = dict()
+        with self._lock:
+            slots = self._get_window_slots(window)
+            if slots is None:
+                return result
+            for name, buffer in self._buffers.items():
+                rates = self._get_rates([buffer], slots)
+                if rates is not None:
+                    result[name] = rates
+        return result
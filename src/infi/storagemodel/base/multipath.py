@@ -1,21 +1,33 @@
 from itertools import chain
 from infi.pyutils.lazy import cached_method
 from contextlib import contextmanager
-from .inquiry import SCSICommandInformationMixin
+from .inquiry import SCSICommandInformationMixin, prefetch_inquiry
+from .inquiry import DEFAULT_PREFETCH_PAGES, DEFAULT_PREFETCH_CONCURRENCY
 
 
 class MultipathFrameworkModel(object):
+    @cached_method
+    def get_claimed_hctls(self):
+        """Returns a frozenset of the HCTLs of all the paths of the multipath block devices claimed by this framework"""
+        devices = self.get_all_multipath_block_devices()
+        return frozenset(path.get_hctl() for path in chain.from_iterable(device.get_paths() for device in devices))
+
+    @cached_method
+    def get_claimed_storage_controller_hctls(self):
+        """Returns a frozenset of the HCTLs of all the paths of the multipath storage controllers claimed by this
+        framework"""
+        devices = self.get_all_multipath_storage_controller_devices()
+        return frozenset(path.get_hctl() for path in chain.from_iterable(device.get_paths() for device in devices))
+
     def filter_non_multipath_scsi_block_devices(self, scsi_block_devices):
         """Returns items from the list that are not part of multipath devices claimed by this framework"""
-        hctl_list = [path.get_hctl() for path in chain.from_iterable(multipath.get_paths()
-                                                                     for multipath in self.get_all_multipath_block_devices())]
-        return [device for device in scsi_block_devices if device.get_hctl() not in hctl_list]
+        claimed_hctls = self.get_claimed_hctls()
+        return [device for device in scsi_block_devices if device.get_hctl() not in claimed_hctls]
 
     def filter_non_multipath_scsi_storage_controller_devices(self, scsi_controller_devices):
         """Returns items from the list that are not part of multipath devices claimed by this framework"""
-        hctl_list = [path.get_hctl() for path in chain.from_iterable(multipath.get_paths()
-                                                                     for multipath in self.get_all_multipath_storage_controller_devices())]
-        return [device for device in scsi_controller_devices if device.get_hctl() not in hctl_list]
+        claimed_hctls = self.get_claimed_storage_controller_hctls()
+        return [device for device in scsi_controller_devices if device.get_hctl() not in claimed_hctls]
 
     def filter_vendor_specific_devices(self, devices, vid_pid_tuple):
         """Returns only the items from the devices list that are of the specific type"""
@@ -23,6 +35,11 @@ class MultipathFrameworkModel(object):
         run_together(device.get_scsi_vendor_id_or_unknown_on_error for device in devices)
         return [device for device in devices if device.get_scsi_vendor_id_or_unknown_on_error() == vid_pid_tuple]
 
+    def prefetch_inquiry(self, devices, pages=DEFAULT_PREFETCH_PAGES, concurrency=DEFAULT_PREFETCH_CONCURRENCY):
+        """Sends the standard inquiry and the given VPD pages to all the devices concurrently, and caches the responses
+        in the devices. See `infi.storagemodel.base.inquiry.prefetch_inquiry`"""
+        prefetch_inquiry(devices, pages, concurrency)
+
     def find_multipath_device_by_block_access_path(self, path):
         """
         Returns `infi.storagemodel.base.multipath.MultipathBlockDevice` object that matches the given path.
@@ -32,7 +49,7 @@ class MultipathFrameworkModel(object):
         from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathBlockDevice
         from infi.storagemodel.windows.native_multipath import WindowsNativeMultipathBlockDevice
         devices_dict = dict([(device.get_block_access_path(), device) for device in self.get_all_multipath_block_devices()])
-        for value in devices_dict.values():
+        for value in list(devices_dict.values()):
             if isinstance(value, LinuxNativeMultipathBlockDevice):
                 devices_dict[value.get_device_mapper_access_path()] = value
             if isinstance(value, WindowsNativeMultipathBlockDevice):
@@ -43,6 +60,13 @@ class MultipathFrameworkModel(object):
             return devices_dict[path.upper()]
         raise KeyError(path)
 
+    def get_io_statistics_for_all_paths(self):
+        """Returns a dict of path ID -> `infi.storagemodel.base.multipath.PathStatistics` of all the paths of the
+        multipath block devices. Platforms that can read the statistics of all the devices at once override this"""
+        return dict((path.get_path_id(), path.get_io_statistics())
+                    for path in chain.from_iterable(device.get_paths()
+                                                    for device in self.get_all_multipath_block_devices()))
+
     #############################
     # Platform Specific Methods #
     #############################
@@ -159,6 +183,11 @@ class MultipathBlockDevice(SCSICommandInformationMixin, MultipathDevice):
         vpd_page = self.get_scsi_inquiry_pages()[LOGICAL_BLOCK_PROVISIONING_VPD_PAGE]
         return vpd_page.provisioning_type == PROV_TYPE_THIN
 
+    def get_alua_states(self):
+        """Returns a dict of path ID -> ALUA state (see `infi.storagemodel.base.multipath.ALUAState`) of all the
+        paths"""
+        return dict((path.get_path_id(), path.get_alua_state()) for path in self.get_paths())
+
     #############################
     # Platform Specific Methods #
     #############################
@@ -274,11 +303,18 @@ class LeastQueueDepth(LoadBalancePolicy):
     name = "Least Queue Depth"
 
 class PathStatistics(object):
-    def __init__(self, bytes_read, bytes_written, number_reads, number_writes):
+    def __init__(self, bytes_read, bytes_written, number_reads, number_writes,
+                 in_flight=None, io_ticks=None, time_in_queue=None, read_time=None, write_time=None):
+        """the keyword arguments are None on platforms that don't report them"""
         self._bytes_read = bytes_read
         self._bytes_written = bytes_written
         self._number_reads = number_reads
         self._number_writes = number_writes
+        self._in_flight = in_flight
+        self._io_ticks = io_ticks
+        self._time_in_queue = time_in_queue
+        self._read_time = read_time
+        self._write_time = write_time
 
     @property
     def bytes_read(self):
@@ -292,6 +328,26 @@ class PathStatistics(object):
     @property
     def write_io_count(self):
         return self._number_writes
+    @property
+    def in_flight(self):
+        """the number of I/Os currently in flight"""
+        return self._in_flight
+    @property
+    def io_ticks(self):
+        """the number of milliseconds the device had I/Os in flight"""
+        return self._io_ticks
+    @property
+    def time_in_queue(self):
+        """the number of milliseconds the I/Os spent in flight, weighted by the number of I/Os in flight"""
+        return self._time_in_queue
+    @property
+    def read_time(self):
+        """the number of milliseconds spent on reads"""
+        return self._read_time
+    @property
+    def write_time(self):
+        """the number of milliseconds spent on writes"""
+        return self._write_time
 
 class Path(object):
     @cached_method
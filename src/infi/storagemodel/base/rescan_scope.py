@@ -0,0 +1,89 @@
+"""Limits a rescan to some of the SCSI hosts and remote targets, instead of scanning all of them.
+
+A scope is passed to `rescan_and_wait_for(..., scope=...)` as one of:
+
+* a `RescanScope`
+* a set of SCSI host numbers, e.g. set([3, 4])
+* a set of target WWNs
+* `PREDICATE_SCOPE`, to take the scope from the predicate (see `get_rescan_scope`)
+"""
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+PREDICATE_SCOPE = "predicate"
+
+
+def _normalize_wwns(wwns):
+    from infi.dtypes.wwn import WWN
+    if wwns is None:
+        return None
+    return frozenset(str(WWN(str(wwn))) for wwn in wwns)
+
+
+def _includes_wwn(wwns, wwn):
+    from infi.dtypes.wwn import WWN
+    return wwns is None or (wwn is not None and str(WWN(str(wwn))) in wwns)
+
+
+class RescanScope(object):
+    """Each of hosts, initiator_wwns and target_wwns is either None (no limit) or a collection to limit the rescan to.
+    A host is scanned if it is in `hosts` and its port WWN is in `initiator_wwns`; in it, only the remote targets
+    whose port WWN is in `target_wwns` are scanned."""
+
+    def __init__(self, hosts=None, initiator_wwns=None, target_wwns=None):
+        super(RescanScope, self).__init__()
+        self.hosts = None if hosts is None else frozenset(int(host) for host in hosts)
+        self.initiator_wwns = _normalize_wwns(initiator_wwns)
+        self.target_wwns = _normalize_wwns(target_wwns)
+
+    def includes_host(self, host):
+        return self.hosts is None or host in self.hosts
+
+    def includes_initiator_wwn(self, wwn):
+        return _includes_wwn(self.initiator_wwns, wwn)
+
+    def includes_target_wwn(self, wwn):
+        return _includes_wwn(self.target_wwns, wwn)
+
+    def union(self, other):
+        """Returns a scope that includes everything that is included in this scope or the other"""
+        def _union(first, second):
+            return None if first is None or second is None else first.union(second)
+        return RescanScope(_union(self.hosts, other.hosts), _union(self.initiator_wwns, other.initiator_wwns),
+                           _union(self.target_wwns, other.target_wwns))
+
+    def __eq__(self, other):
+        return isinstance(other, RescanScope) and \
+            (self.hosts, self.initiator_wwns, self.target_wwns) == (other.hosts, other.initiator_wwns, other.target_wwns)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.hosts, self.initiator_wwns, self.target_wwns))
+
+    def __repr__(self):
+        def _format(items):
+            return None if items is None else sorted(items)
+        return "<RescanScope(hosts={!r}, initiator_wwns={!r}, target_wwns={!r})>".format(
+            _format(self.hosts), _format(self.initiator_wwns), _format(self.target_wwns))
+
+
+def get_rescan_scope(predicate):
+    """Returns the scope of the predicate's `get_rescan_scope` method, or None if it doesn't have one"""
+    get_scope = getattr(predicate, "get_rescan_scope", None)
+    return None if get_scope is None else get_scope()
+
+
+def create_rescan_scope(scope, predicate=None):
+    """Returns a `RescanScope` from any of the ways a scope can be given, or None to rescan everything"""
+    from six import string_types, integer_types
+    if scope is None or isinstance(scope, RescanScope):
+        return scope
+    if isinstance(scope, string_types) and scope == PREDICATE_SCOPE:
+        return get_rescan_scope(predicate)
+    items = list(scope)
+    if all(isinstance(item, integer_types) for item in items):
+        return RescanScope(hosts=items)
+    return RescanScope(target_wwns=items)
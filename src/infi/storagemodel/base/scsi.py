@@ -1,7 +1,8 @@
 from infi.pyutils.lazy import cached_method
 from contextlib import contextmanager
 
-from .inquiry import SCSICommandInformationMixin
+from .inquiry import SCSICommandInformationMixin, prefetch_inquiry
+from .inquiry import DEFAULT_PREFETCH_PAGES, DEFAULT_PREFETCH_CONCURRENCY
 from .diagnostic import SesInformationMixin
 from logging import getLogger
 
@@ -132,28 +133,122 @@ class SCSIEnclosure(SesInformationMixin, SCSIDevice):
         return "<{} {} for {}>".format(self.__class__.__name__, self.get_scsi_access_path(), self.get_display_name())
 
 
+class SCSIBlockDeviceIndex(object):
+    """Lookup tables over a list of `infi.storagemodel.base.scsi.SCSIBlockDevice` objects.
+    Each table is built once, the first time it's used. The path, HCTL and devno tables map to a single device;
+    the serial and WWID tables map to a list of devices, since all the paths to a volume share the same serial.
+    The devices are queried concurrently, at most `concurrency` at a time"""
+
+    def __init__(self, devices, concurrency=DEFAULT_PREFETCH_CONCURRENCY):
+        super(SCSIBlockDeviceIndex, self).__init__()
+        self._devices = devices
+        self._concurrency = concurrency
+
+    def _build_dict(self, getter, devices=None):
+        return dict([(getter(device), device) for device in (self._devices if devices is None else devices)])
+
+    def _build_keys_dict(self, get_keys, devices=None, concurrency=1):
+        """Returns a dict of key -> list of devices, where get_keys returns a list of keys of a device, and the list of
+        devices get_keys raised an exception for"""
+        from .gevent_wrapper import run_concurrently
+        from functools import partial
+        devices = self._devices if devices is None else devices
+
+        def get_device_keys(device):
+            try:
+                return get_keys(device)
+            except Exception:
+                logger.debug("failed to index device {!r}".format(device), exc_info=True)
+                return None
+
+        result, failed = dict(), []
+        keys_list = run_concurrently([partial(get_device_keys, device) for device in devices], concurrency)
+        for device, keys in zip(devices, keys_list):
+            if keys is None:
+                failed.append(device)
+                continue
+            for key in keys:
+                if key:
+                    result.setdefault(key, []).append(device)
+        return result, failed
+
+    def _build_list_dict(self, getter, devices=None):
+        return self._build_keys_dict(lambda device: [getter(device)], devices)[0]
+
+    @cached_method
+    def get_block_access_path_dict(self):
+        from infi.storagemodel.windows.scsi import WindowsSCSIBlockDevice
+        result = self._build_dict(lambda device: device.get_block_access_path())
+        for device in self._devices:
+            if isinstance(device, WindowsSCSIBlockDevice):
+                result[r"\\.\{}".format(device.get_display_name())] = device
+        return result
+
+    @cached_method
+    def get_scsi_access_path_dict(self):
+        return self._build_dict(lambda device: device.get_scsi_access_path())
+
+    @cached_method
+    def get_hctl_dict(self):
+        return self._build_dict(lambda device: device.get_hctl())
+
+    @cached_method
+    def get_devno_dict(self):
+        devices = [device for device in self._devices if hasattr(device, "get_unix_block_devno")]
+        return self._build_dict(lambda device: device.get_unix_block_devno(), devices)
+
+    @cached_method
+    def get_serial_dict(self):
+        from infi.asi.cdb.inquiry.vpd_pages import INQUIRY_PAGE_UNIT_SERIAL_NUMBER
+        prefetch_inquiry(self._devices, pages=(INQUIRY_PAGE_UNIT_SERIAL_NUMBER,), concurrency=self._concurrency,
+                         standard_inquiry=False)
+        return self._build_list_dict(lambda device: device.get_scsi_serial_number())
+
+    @cached_method
+    def get_wwid_dict(self):
+        devices = [device for device in self._devices if hasattr(device, "get_wwid")]
+        return self._build_list_dict(lambda device: device.get_wwid(), devices)
+
+
 class SCSIModel(object):
+    @cached_method
+    def get_scsi_block_device_index(self):
+        """Returns a `infi.storagemodel.base.scsi.SCSIBlockDeviceIndex` of all the SCSI block devices.
+        Like the device list, it is built once and thrown away on refresh"""
+        return SCSIBlockDeviceIndex(self.get_all_scsi_block_devices())
+
     def find_scsi_block_device_by_block_access_path(self, path):
         """Returns a `infi.storagemodel.base.scsi.SCSIBlockDevice` object that matches the given path.
         :raises: KeyError if no such device is found"""
-        from infi.storagemodel.windows.scsi import WindowsSCSIBlockDevice
-        devices_dict = dict([(device.get_block_access_path(), device) for device in self.get_all_scsi_block_devices()])
-        for value in devices_dict.values():
-            if isinstance(value, WindowsSCSIBlockDevice):
-                devices_dict[r"\\.\{}".format(value.get_display_name())] = value
-        return devices_dict[path]
+        return self.get_scsi_block_device_index().get_block_access_path_dict()[path]
 
     def find_scsi_block_device_by_scsi_access_path(self, path):
         """Returns `infi.storagemodel.base.scsi.SCSIBlockDevice` object that matches the given path.
         Raises `KeyError` if no such device is found."""
-        devices_dict = dict([(device.get_scsi_access_path(), device) for device in self.get_all_scsi_block_devices()])
-        return devices_dict[path]
+        return self.get_scsi_block_device_index().get_scsi_access_path_dict()[path]
 
     def find_scsi_block_device_by_hctl(self, get_hctl):
         """Returns a `infi.storagemodel.base.scsi.SCSIBlockDevice` object that matches the given get_hctl.
         Raises `KeyError` if no such device is found."""
-        devices_dict = dict([(device.get_hctl(), device) for device in self.get_all_scsi_block_devices()])
-        return devices_dict[get_hctl]
+        return self.get_scsi_block_device_index().get_hctl_dict()[get_hctl]
+
+    def find_scsi_block_device_by_devno(self, devno):
+        """Returns a `infi.storagemodel.base.scsi.SCSIBlockDevice` object that matches the given (major, minor) tuple.
+        Raises `KeyError` if no such device is found."""
+        return self.get_scsi_block_device_index().get_devno_dict()[devno]
+
+    def find_scsi_block_devices_by_serial(self, serial):
+        """Returns a list of the `infi.storagemodel.base.scsi.SCSIBlockDevice` objects with the given SCSI serial"""
+        return list(self.get_scsi_block_device_index().get_serial_dict().get(serial, []))
+
+    def find_scsi_block_devices_by_wwid(self, wwid):
+        """Returns a list of the `infi.storagemodel.base.scsi.SCSIBlockDevice` objects with the given WWID"""
+        return list(self.get_scsi_block_device_index().get_wwid_dict().get(wwid, []))
+
+    def prefetch_inquiry(self, devices, pages=DEFAULT_PREFETCH_PAGES, concurrency=DEFAULT_PREFETCH_CONCURRENCY):
+        """Sends the standard inquiry and the given VPD pages to all the devices concurrently, and caches the responses
+        in the devices. See `infi.storagemodel.base.inquiry.prefetch_inquiry`"""
+        prefetch_inquiry(devices, pages, concurrency)
 
     def filter_vendor_specific_devices(self, devices, vid_pid_tuple):
         """Returns only the items from the devices list that are of the specific type"""
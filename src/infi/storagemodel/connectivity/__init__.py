@@ -82,7 +82,6 @@ class ConnectivityFactoryImpl(object):
     @cached_method
     def get_iscsi_sessions(self):
         from infi.iscsiapi import get_iscsiapi
-        iscsiapi = get_iscsiapi()
         return get_iscsiapi().get_sessions()
 
     def get_fc_hctl_mappings(self):
@@ -105,16 +104,27 @@ class ConnectivityFactoryImpl(object):
             return result
         return result
 
+    def get_connectivity_index(self):
+        """Returns a dict of (host, channel, target) -> `FCConnectivity` or `ISCSIConnectivity`. A target that is
+        both in the FC and the iSCSI mappings is an FC target. The connectivity objects are shared by all the
+        devices of the target"""
+        result = {}
+        for hct, (local_iqn, remote_iqn) in self.get_iscsi_hctl_mappings().items():
+            result[hct] = ISCSIConnectivity(None, local_iqn, remote_iqn)
+        for hct, (local_port, remote_port) in self.get_fc_hctl_mappings().items():
+            result[hct] = FCConnectivity(None, local_port, remote_port)
+        return result
+
     def get_by_device_with_hctl(self, device):
+        # the mappings are not cached here, so we don't build the whole index for a single device
         hct = (device.get_hctl().get_host(),
                device.get_hctl().get_channel(),
                device.get_hctl().get_target())
         fc_mapping = self.get_fc_hctl_mappings().get(hct, None)
-        iscsi_mapping = self.get_iscsi_hctl_mappings().get(hct, None)
-
         if fc_mapping is not None:
             local_port, remote_port = fc_mapping
             return FCConnectivity(device, local_port, remote_port)
+        iscsi_mapping = self.get_iscsi_hctl_mappings().get(hct, None)
         if iscsi_mapping is not None:
             local_iqn, remote_iqn = iscsi_mapping
             return ISCSIConnectivity(device, local_iqn, remote_iqn)
@@ -122,9 +132,31 @@ class ConnectivityFactoryImpl(object):
 
 
 class CachedConnectivityFactoryImpl(ConnectivityFactoryImpl):
+    """Builds the mappings and the connectivity index once, until `infi.pyutils.lazy.clear_cache` is called on it
+    (the storage model does that on refresh). The devices get their connectivity from the index"""
+
     @cached_method
     def get_fc_hctl_mappings(self):
         return super(CachedConnectivityFactoryImpl, self).get_fc_hctl_mappings()
 
+    @cached_method
+    def get_iscsi_hctl_mappings(self):
+        return super(CachedConnectivityFactoryImpl, self).get_iscsi_hctl_mappings()
+
+    @cached_method
+    def get_connectivity_index(self):
+        return super(CachedConnectivityFactoryImpl, self).get_connectivity_index()
+
+    def get_by_device_with_hctl(self, device):
+        hct = (device.get_hctl().get_host(),
+               device.get_hctl().get_channel(),
+               device.get_hctl().get_target())
+        connectivity = self.get_connectivity_index().get(hct, None)
+        if connectivity is None:
+            return LocalConnectivity()
+        return connectivity
+
 
+# platforms can give their devices a factory of their own (see infi.storagemodel.linux.LinuxStorageModel), but this
+# one goes through infi.hbaapi and infi.iscsiapi, so it follows their patches (e.g. infi.storagemodel.vmware)
 ConnectivityFactory = CachedConnectivityFactoryImpl()
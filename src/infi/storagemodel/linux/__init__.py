@@ -1,24 +1,79 @@
 from ..unix import UnixStorageModel
+from .rescan_scsi_bus.logic import DEFAULT_TARGET_SCAN_CONCURRENCY, DEFAULT_TARGET_SCAN_CONCURRENCY_PER_HOST
 from infi.pyutils.lazy import cached_method
 
 
 class LinuxStorageModel(UnixStorageModel):
+    supports_scoped_rescan = True
+    # how many targets are scanned at once (each in its own process) during a rescan, in total and on each SCSI host
+    rescan_target_scan_concurrency = DEFAULT_TARGET_SCAN_CONCURRENCY
+    rescan_target_scan_concurrency_per_host = DEFAULT_TARGET_SCAN_CONCURRENCY_PER_HOST
+
+    # when True, the multipath layer asks multipathd for a short listing of the maps on refresh, and gets their
+    # topology again only if it changed
+    multipathd_poll_changed_maps = False
+    # where the multipath layer reads the maps from: "multipathd", or "sysfs" to build them from the device-mapper
+    # attributes in sysfs, which works when multipathd is hung or not running
+    native_multipath_backend = "multipathd"
+    # where the connectivity (FC/iSCSI initiator and target) of the devices is read from: "sysfs", or "hbaapi" to ask
+    # infi.hbaapi and infi.iscsiapi
+    connectivity_backend = "sysfs"
+
+    # set only during refresh_incrementally
+    _previous_sysfs = None
+    _previous_scsi_model = None
+
+    _multipathd_client = None
+
+    def get_multipathd_client(self):
+        """Returns the `infi.storagemodel.linux.multipathd.PooledMultipathClient` of the model. Unlike the layers of
+        the model, it is kept across refreshes so its connections to multipathd are reused"""
+        from .multipathd import PooledMultipathClient
+        if self._multipathd_client is None:
+            self._multipathd_client = PooledMultipathClient()
+        return self._multipathd_client
+
     @cached_method
     def _get_sysfs(self):
         from .sysfs import Sysfs
-        return Sysfs()
+        return Sysfs(previous=self._previous_sysfs)
+
+    @cached_method
+    def get_connectivity_factory(self):
+        """Returns the connectivity factory the devices of the model get their connectivity from, see
+        `connectivity_backend`"""
+        if self.connectivity_backend == "sysfs":
+            from .connectivity import LinuxConnectivityFactoryImpl
+            return LinuxConnectivityFactoryImpl()
+        from ..connectivity import ConnectivityFactory
+        return ConnectivityFactory
 
     def _create_scsi_model(self):
         from .scsi import LinuxSCSIModel
-        return LinuxSCSIModel(self._get_sysfs())
+        return LinuxSCSIModel(self._get_sysfs(), self._previous_scsi_model, self.get_connectivity_factory())
+
+    def refresh_incrementally(self):
+        """Refreshes the model, but keeps the SCSI device objects whose HCTL, sg and sd devices did not change.
+        Returns a `infi.storagemodel.linux.sysfs.SysfsDelta` of the HCTLs that were added, removed or changed.
+        The multipath, disk and mount layers are built again, like they are in `refresh`"""
+        self._previous_sysfs, self._previous_scsi_model = self._get_sysfs(), self.get_scsi()
+        try:
+            self.refresh()
+            delta = self._get_sysfs().get_delta()
+            self.get_scsi()
+        finally:
+            self._previous_sysfs = self._previous_scsi_model = None
+        return delta
 
     def _create_native_multipath_model(self):
         from .native_multipath import LinuxNativeMultipathModel
-        return LinuxNativeMultipathModel(self._get_sysfs())
+        return LinuxNativeMultipathModel(self._get_sysfs(), self.get_multipathd_client(),
+                                         self.multipathd_poll_changed_maps, self.native_multipath_backend,
+                                         self.get_connectivity_factory())
 
     def _create_veritas_multipath_model(self):
         from .veritas_multipath import LinuxVeritasMultipathModel
-        return LinuxVeritasMultipathModel(self._get_sysfs(), self.get_scsi())
+        return LinuxVeritasMultipathModel(self._get_sysfs(), self.get_scsi(), self.get_connectivity_factory())
 
     def _create_disk_model(self):
         from .disk import LinuxDiskModel
@@ -32,8 +87,18 @@ class LinuxStorageModel(UnixStorageModel):
         from .mount import LinuxMountRepository
         return LinuxMountRepository()
 
-    def rescan_method(self):
+    def _create_device_change_listener(self):
+        from .uevent import create_uevent_listener
+        return create_uevent_listener()
+
+    def rescan_method(self, scope=None):
+        """Returns the `infi.storagemodel.linux.rescan_scsi_bus.report.RescanReport` of the rescan, or None if it
+        failed"""
         from .rescan_scsi_bus import main
         from .iscsi import iscsi_rescan
-        iscsi_rescan()
-        return main(timeout=max(self.rescan_subprocess_timeout-10, 10))
+        if scope is None:
+            # with a scope, the iSCSI hosts in it are scanned like any other host
+            iscsi_rescan()
+        return main(timeout=max(self.rescan_subprocess_timeout-10, 10), scope=scope,
+                    concurrency=self.rescan_target_scan_concurrency,
+                    concurrency_per_host=self.rescan_target_scan_concurrency_per_host)
@@ -0,0 +1,119 @@
+"""Reads the FC and iSCSI topology from sysfs, for `infi.storagemodel.connectivity`.
+
+The FC mapping is built from /sys/class/fc_host/hostN/port_name and /sys/class/fc_remote_ports/rport-H:C-N/{port_name,
+scsi_target_id}. The iSCSI mapping is built from /sys/class/iscsi_session/sessionN/{targetname,initiatorname} and the
+targetH:C:T entries next to the session in /sys/devices. Neither runs a process, nor goes through the HBA API.
+"""
+import os
+import re
+from infi.pyutils.lazy import cached_method
+from ..connectivity import CachedConnectivityFactoryImpl
+from .sysfs import SYSFS_ROOT, _sysfs_path, _sysfs_read_field, _list_links, _list_names
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+SYSFS_CLASS_FC_HOST_PATH = "/sys/class/fc_host"
+SYSFS_CLASS_FC_REMOTE_PORTS_PATH = "/sys/class/fc_remote_ports"
+SYSFS_CLASS_ISCSI_SESSION_PATH = "/sys/class/iscsi_session"
+ISCSI_INITIATOR_NAME_PATH = "/etc/iscsi/initiatorname.iscsi"
+
+FC_HOST_NAME_PATTERN = re.compile(r"^host(?P<host>\d+)$")
+FC_REMOTE_PORT_NAME_PATTERN = re.compile(r"^rport-(?P<host>\d+):(?P<channel>\d+)-\d+$")
+ISCSI_TARGET_NAME_PATTERN = re.compile(r"^target(?P<host>\d+):(?P<channel>\d+):(?P<target>\d+)$")
+
+
+def _read_attribute(path, attribute):
+    """Returns the stripped value of the attribute, or None if it's missing or unset"""
+    try:
+        value = _sysfs_read_field(path, attribute).strip()
+    except (IOError, OSError):
+        return None
+    return None if value in ("", "(null)") else value
+
+
+def get_fc_hctl_mappings(sysfs_root=SYSFS_ROOT):
+    """Returns a dict of (host, channel, target) -> (local port WWN, remote port WWN) of the FC targets"""
+    fc_host_path = _sysfs_path(sysfs_root, SYSFS_CLASS_FC_HOST_PATH)
+    local_ports = dict()
+    for name in _list_names(fc_host_path):
+        match = FC_HOST_NAME_PATTERN.match(name)
+        port_name = _read_attribute(os.path.join(fc_host_path, name), "port_name") if match else None
+        if port_name is not None:
+            local_ports[int(match.group("host"))] = port_name
+    result = dict()
+    remote_ports_path = _sysfs_path(sysfs_root, SYSFS_CLASS_FC_REMOTE_PORTS_PATH)
+    for name in _list_names(remote_ports_path):
+        match = FC_REMOTE_PORT_NAME_PATTERN.match(name)
+        if match is None or int(match.group("host")) not in local_ports:
+            continue
+        path = os.path.join(remote_ports_path, name)
+        port_name, target = _read_attribute(path, "port_name"), _read_attribute(path, "scsi_target_id")
+        # remote ports that are not SCSI targets (or are gone) have a target id of -1
+        if port_name is None or target is None or int(target) < 0:
+            continue
+        host = int(match.group("host"))
+        result[(host, int(match.group("channel")), int(target))] = (local_ports[host], port_name)
+    return result
+
+
+def _get_default_initiator_name():
+    try:
+        with open(ISCSI_INITIATOR_NAME_PATH) as fd:
+            for line in fd:
+                if line.strip().startswith("InitiatorName="):
+                    return line.strip().split("=", 1)[1]
+    except (IOError, OSError):
+        pass
+    return None
+
+
+def get_iscsi_hctl_mappings(sysfs_root=SYSFS_ROOT):
+    """Returns a dict of (host, channel, target) -> (initiator IQN, target IQN) of the iSCSI sessions"""
+    result = dict()
+    default_initiator_name = None
+    for name, path in _list_links(_sysfs_path(sysfs_root, SYSFS_CLASS_ISCSI_SESSION_PATH)).items():
+        target_name = _read_attribute(path, "targetname")
+        if target_name is None:
+            continue
+        initiator_name = _read_attribute(path, "initiatorname")
+        if initiator_name is None:
+            # older kernels do not have the initiatorname attribute
+            default_initiator_name = default_initiator_name or _get_default_initiator_name()
+            initiator_name = default_initiator_name
+        # .../hostH/sessionN/iscsi_session/sessionN -> .../hostH/sessionN/targetH:C:T
+        session_path = os.path.dirname(os.path.dirname(path))
+        for entry in _list_names(session_path):
+            match = ISCSI_TARGET_NAME_PATTERN.match(entry)
+            if match is not None:
+                hct = (int(match.group("host")), int(match.group("channel")), int(match.group("target")))
+                result[hct] = (initiator_name, target_name)
+    return result
+
+
+class LinuxConnectivityMixin(object):
+    """Linux devices and paths get their connectivity from the factory of the model that created them, or from the
+    global `infi.storagemodel.connectivity.ConnectivityFactory` if it did not give them one"""
+    _connectivity_factory = None
+
+    @cached_method
+    def get_connectivity(self):
+        from ..connectivity import ConnectivityFactory
+        return (self._connectivity_factory or ConnectivityFactory).get_by_device_with_hctl(self)
+
+
+class LinuxConnectivityFactoryImpl(CachedConnectivityFactoryImpl):
+    """A `infi.storagemodel.connectivity.CachedConnectivityFactoryImpl` that reads the FC and iSCSI mappings from
+    sysfs, instead of from `infi.hbaapi` and `infi.iscsiapi`"""
+
+    def __init__(self, sysfs_root=SYSFS_ROOT):
+        super(LinuxConnectivityFactoryImpl, self).__init__()
+        self.sysfs_root = sysfs_root
+
+    @cached_method
+    def get_fc_hctl_mappings(self):
+        return get_fc_hctl_mappings(self.sysfs_root)
+
+    @cached_method
+    def get_iscsi_hctl_mappings(self):
+        return get_iscsi_hctl_mappings(self.sysfs_root)
@@ -0,0 +1,76 @@
+"""Reads the multipath maps from the device-mapper attributes in sysfs, without asking multipathd.
+
+Each multipath map is a /sys/block/dm-N device whose dm/uuid starts with "mpath-", its name is in dm/name and its
+paths are the sd devices in its slaves/ directory. The state of a path is the state of its SCSI device
+(/sys/block/sdX/device/state).
+
+sysfs does not tell how the paths are grouped, nor their priorities, nor if device-mapper failed a path: all the
+paths of a map are in a single path group, with priority 0, and a path is active as long as its SCSI device is
+running.
+"""
+import os
+from infi.multipathtools.dtypes import MultipathDevice, Path, PathGroup
+from .sysfs import _sysfs_read_field, _list_names
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+MULTIPATH_UUID_PREFIX = "mpath-"
+
+
+class DeviceMapperMultipathDevice(MultipathDevice):
+    """A `infi.multipathtools.dtypes.MultipathDevice` that takes its major:minor from sysfs, instead of reading it
+    from /sys/block/<dm>/dev"""
+
+    def __init__(self, id, device_name, dm_name, major_minor):
+        super(MultipathDevice, self).__init__()
+        self.path_groups = []
+        self.id = id
+        self.device_name = device_name
+        self.dm_name = dm_name
+        self.major_minor = major_minor
+
+
+def _get_path_state(sysfs_device):
+    try:
+        state = _sysfs_read_field(sysfs_device.get_sysfs_dev_path(), "state").strip()
+    except (IOError, OSError):
+        return "undef"
+    return "active" if state == "running" else "failed"
+
+
+def _create_multipath_device(sysfs, block_device):
+    path = block_device.sysfs_block_device_path
+    try:
+        uuid = _sysfs_read_field(path, "dm/uuid").strip()
+        if not uuid.startswith(MULTIPATH_UUID_PREFIX):
+            return None
+        name = _sysfs_read_field(path, "dm/name").strip()
+    except (IOError, OSError):
+        return None
+    wwid = uuid[len(MULTIPATH_UUID_PREFIX):]
+    multipath = DeviceMapperMultipathDevice(wwid, name or wwid, block_device.get_block_device_name(),
+                                            block_device.get_block_devno())
+    path_group = PathGroup("active", 0)
+    for slave_name in sorted(_list_names(os.path.join(path, "slaves"))):
+        slave = sysfs.find_device_by_name(slave_name)
+        if slave is None or not hasattr(slave, "get_hctl"):
+            logger.debug("slave {} of {} is not a SCSI disk, skipping it".format(slave_name, name))
+            continue
+        path_group.paths.append(Path(slave_name, slave_name, "{}:{}".format(*slave.get_block_devno()),
+                                     _get_path_state(slave), 0, str(slave.get_hctl())))
+    multipath.path_groups.append(path_group)
+    return multipath
+
+
+def get_list_of_multipath_devices_from_sysfs(sysfs):
+    """Returns a list of `infi.multipathtools.dtypes.MultipathDevice` of the device-mapper multipath maps in the
+    `infi.storagemodel.linux.sysfs.Sysfs` snapshot"""
+    result = []
+    for block_device in sysfs.get_all_block_devices():
+        if not block_device.get_block_device_name().startswith("dm-"):
+            continue
+        multipath = _create_multipath_device(sysfs, block_device)
+        if multipath is not None:
+            result.append(multipath)
+    return result
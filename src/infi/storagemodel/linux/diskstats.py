@@ -0,0 +1,41 @@
+"""I/O statistics of Linux block devices, see https://www.kernel.org/doc/Documentation/block/stat.txt
+
+/proc/diskstats has a line of statistics for every block device: its major, minor and name, and then the same fields
+that are in /sys/block/<name>/stat. Reading it once is much cheaper than opening the stat file of every device.
+"""
+from infi.storagemodel.base.multipath import PathStatistics
+
+PROC_DISKSTATS_PATH = "/proc/diskstats"
+
+# a sector is always 512 bytes in these files, whatever the sector size of the device is
+SECTOR_SIZE = 512
+NUMBER_OF_STAT_FIELDS = 11
+
+
+def get_path_statistics_from_stat_fields(fields):
+    """Returns a `infi.storagemodel.base.multipath.PathStatistics` from the fields of a stat file (integers, or
+    strings of integers). Newer kernels append discard and flush fields, which are ignored"""
+    read_ios, _, read_sectors, read_time, write_ios, _, write_sectors, write_time, in_flight, io_ticks, \
+        time_in_queue = [int(field) for field in fields[:NUMBER_OF_STAT_FIELDS]]
+    return PathStatistics(read_sectors * SECTOR_SIZE, write_sectors * SECTOR_SIZE, read_ios, write_ios,
+                          in_flight, io_ticks, time_in_queue, read_time, write_time)
+
+
+def read_stat_file(path):
+    """Returns the `infi.storagemodel.base.multipath.PathStatistics` of a /sys/block/<name>/stat file"""
+    with open(path, "rb") as fd:
+        return get_path_statistics_from_stat_fields(fd.read().split())
+
+
+def get_diskstats(path=None):
+    """Returns a dict of block device name -> `infi.storagemodel.base.multipath.PathStatistics`, from one read of
+    /proc/diskstats. Partitions on old kernels have fewer fields, and are skipped"""
+    with open(path or PROC_DISKSTATS_PATH, "rb") as fd:
+        lines = fd.read().decode("ascii", "replace").splitlines()
+    result = dict()
+    for line in lines:
+        fields = line.split()
+        if len(fields) < NUMBER_OF_STAT_FIELDS + 3:
+            continue
+        result[fields[2]] = get_path_statistics_from_stat_fields(fields[3:])
+    return result
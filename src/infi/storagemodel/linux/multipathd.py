@@ -0,0 +1,199 @@
+"""A long-lived client to multipathd.
+
+`infi.multipathtools.MultipathClient` connects to multipathd for every command it sends. The client here keeps a
+small pool of open connections and reuses them across commands and across refreshes of the storage model, and it
+reconnects if multipathd closed a connection (e.g. it was restarted).
+
+It can also poll multipathd for changes: `poll_list_of_multipath_devices` asks for a short listing of the maps and
+their paths, and gets the full topology only if that listing changed since the last time. And it can get a single
+map: `get_multipath_device` asks only for the topology of that map.
+"""
+from collections import deque
+from contextlib import contextmanager
+from infi.multipathtools import MultipathClient
+from infi.multipathtools.connection import UnixDomainSocket, MessageLength
+from infi.multipathtools.errors import ConnectionError
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEFAULT_TIMEOUT = 120
+DEFAULT_POOL_SIZE = 4
+
+# these change when maps or paths are added, removed or change state or priority (e.g. on an ALUA transition), and
+# are much shorter than the topology. multipathd has no wildcard for the state of a path group, so the maps listing
+# has the number of path group switches (%1) instead
+MAPS_SIGNATURE_COMMAND = 'show maps format "%w %n %d %N %t %1"'
+PATHS_SIGNATURE_COMMAND = 'show paths format "%w %i %d %D %t %T %o %p"'
+
+
+def _get_path_states_from_topology(maps_topology):
+    """Returns a dict of path major:minor -> path state (active/failed/undef), as listed in the topology"""
+    from re import compile, MULTILINE
+    from infi.multipathtools.model import HCTL, DEV, DEV_T
+    pattern = compile(r"{} +{} +(?P<dev_t>{}) +\[?(?P<dm_st>active|failed|undef)\b".format(HCTL, DEV, DEV_T), MULTILINE)
+    return dict((match.group("dev_t"), match.group("dm_st")) for match in pattern.finditer(maps_topology))
+
+
+def get_list_of_multipath_devices_from_topology(maps_topology):
+    """Returns a list of `infi.multipathtools.dtypes.MultipathDevice` like
+    `infi.multipathtools.model.get_list_of_multipath_devices_from_multipathd_output` does, but from the topology
+    alone, without the table of all the paths: the states of the paths are taken from the topology, and their
+    priority is the priority of their path group"""
+    from infi.multipathtools.dtypes import MultipathDevice, Path, PathGroup
+    from infi.multipathtools.model import parse_multipaths_topology
+    path_states = _get_path_states_from_topology(maps_topology)
+    result = []
+    for mpath_dict in parse_multipaths_topology(maps_topology):
+        try:
+            multipath = MultipathDevice(mpath_dict['wwid'], mpath_dict['alias'] or mpath_dict['wwid'], mpath_dict['dm'])
+        except IOError as error:
+            logger.debug("MultipathDevice disappeared: {}".format(error))
+            continue
+        for pathgroup_dict in mpath_dict['path_groups']:
+            path_group = PathGroup(pathgroup_dict['state'], pathgroup_dict['prio'])
+            for path_dict in pathgroup_dict['paths']:
+                state = path_states.get(path_dict['dev_t'], 'undef')
+                path_group.paths.append(Path(path_dict['dev'], path_dict['dev'], path_dict['dev_t'], state,
+                                             pathgroup_dict['prio'], path_dict['hctl']))
+            multipath.path_groups.append(path_group)
+        result.append(multipath)
+    return result
+
+
+class MultipathdSocket(UnixDomainSocket):
+    """A `UnixDomainSocket` that can tell if multipathd closed it, and that raises `ConnectionError` instead of
+    waiting forever when multipathd closes it in the middle of a response"""
+
+    def _receive(self, expected_length):
+        received_string = b''
+        while len(received_string) < expected_length:
+            data = self._socket.recv(min(expected_length - len(received_string), 2 ** 16))
+            if not data:
+                raise ConnectionError("multipathd closed the connection")
+            received_string += data
+        return received_string
+
+    def is_connected(self):
+        """Returns False if the socket is closed, or if multipathd closed its end (then the socket is readable)"""
+        from select import select
+        if self._socket is None:
+            return False
+        try:
+            readable, _, _ = select([self._socket], [], [], 0)
+        except (ValueError, EnvironmentError):
+            return False
+        return not readable
+
+
+class MultipathdConnectionPool(object):
+    """Keeps up to `size` idle connections open. `connection()` is a context that yields an idle connection, or a new
+    one if there are none, and puts it back in the pool when done, unless an error was raised while it was used"""
+
+    def __init__(self, create_connection, size=DEFAULT_POOL_SIZE):
+        super(MultipathdConnectionPool, self).__init__()
+        self._create_connection = create_connection
+        self._size = size
+        self._idle = deque()
+
+    def _get_connection(self):
+        while True:
+            try:
+                connection = self._idle.pop()
+            except IndexError:
+                break
+            if connection.is_connected():
+                return connection
+            logger.debug("multipathd closed an idle connection, discarding it")
+            connection.disconnect()
+        connection = self._create_connection()
+        connection.connect()
+        return connection
+
+    @contextmanager
+    def connection(self):
+        connection = self._get_connection()
+        try:
+            yield connection
+        except:
+            connection.disconnect()
+            raise
+        if len(self._idle) < self._size:
+            self._idle.append(connection)
+        else:
+            connection.disconnect()
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().disconnect()
+
+
+class PooledMultipathClient(MultipathClient):
+    """A `infi.multipathtools.MultipathClient` that sends its commands over pooled, persistent connections"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, address=None, pool_size=DEFAULT_POOL_SIZE):
+        super(PooledMultipathClient, self).__init__(MultipathdSocket(timeout, address))
+        self._pool = MultipathdConnectionPool(lambda: MultipathdSocket(timeout, address), pool_size)
+        self._last_signature = None
+        self._last_devices = None
+
+    def is_running(self):
+        try:
+            with self._pool.connection():
+                pass
+            return True
+        except ConnectionError:
+            return False
+
+    def _send_and_receive_on(self, connection, message):
+        from infi.multipathtools.model import strip_ansi_colors
+        message = "%s\n" % message
+        connection.send(self._get_message_size_as_string(message))
+        connection.send(message.encode("ascii"))
+        stream = connection.receive(MessageLength.min_max_sizeof().max)
+        expected_length = self._get_expected_message_size_from_string(stream)
+        response = connection.receive(expected_length).decode("ascii")
+        return strip_ansi_colors(response.strip('\x00\n'))
+
+    def _send_and_receive(self, message):
+        from time import sleep
+        while True:
+            try:
+                with self._pool.connection() as connection:
+                    response = self._send_and_receive_on(connection, message)
+            except ConnectionError:
+                # the connection we took from the pool may have been closed since it was checked, a new one is tried
+                # once; if multipathd is down, connecting raises again
+                logger.debug("multipathd connection error, reconnecting", exc_info=True)
+                with self._pool.connection() as connection:
+                    response = self._send_and_receive_on(connection, message)
+            if response != 'timeout':
+                return response
+            sleep(1)
+
+    def get_multipath_device(self, map_name):
+        """Returns the `infi.multipathtools.dtypes.MultipathDevice` of a single map (by its alias, WWID or dm-N name),
+        or None if there is no such map. Only the topology of this map is sent by multipathd"""
+        devices = get_list_of_multipath_devices_from_topology(
+            self._send_and_receive("show map {} topology".format(map_name)))
+        return devices[0] if devices else None
+
+    def get_signature(self):
+        """Returns a short listing of the maps and their paths, that changes when they are added, removed or change
+        state"""
+        return "{}\n{}".format(self._send_and_receive(MAPS_SIGNATURE_COMMAND),
+                               self._send_and_receive(PATHS_SIGNATURE_COMMAND))
+
+    def poll_list_of_multipath_devices(self):
+        """Returns the list of multipath devices like `get_list_of_multipath_devices` does, but if the maps and their
+        paths did not change since the last call, the list of the last call is returned without getting the topology"""
+        signature = self.get_signature()
+        if signature != self._last_signature or self._last_devices is None:
+            logger.debug("multipath maps changed, getting their topology")
+            self._last_devices = self.get_list_of_multipath_devices()
+            self._last_signature = signature
+        return self._last_devices
+
+    def close(self):
+        self._pool.close()
+        self._last_signature = self._last_devices = None
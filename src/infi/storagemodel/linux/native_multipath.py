@@ -1,20 +1,23 @@
 from contextlib import contextmanager
-from infi.storagemodel.unix.multipath import UnixPathMixin
+from infi.storagemodel.unix.multipath import UnixPathMixin, UnixMultipathBlockDeviceMixin
 from infi.storagemodel.base import multipath, gevent_wrapper
 from infi.storagemodel.errors import StorageModelFindError, MultipathDaemonTimeoutError
 from infi.pyutils.lazy import cached_method
 from .block import LinuxBlockDeviceMixin
+from .connectivity import LinuxConnectivityMixin
 import itertools
 
 from logging import getLogger
 logger = getLogger(__name__)
 
-class LinuxNativeMultipathBlockDevice(LinuxBlockDeviceMixin, multipath.MultipathBlockDevice):
-    def __init__(self, sysfs, sysfs_device, multipath_object):
+class LinuxNativeMultipathBlockDevice(LinuxBlockDeviceMixin, UnixMultipathBlockDeviceMixin,
+                                      multipath.MultipathBlockDevice):
+    def __init__(self, sysfs, sysfs_device, multipath_object, connectivity_factory=None):
         super(LinuxNativeMultipathBlockDevice, self).__init__()
         self.sysfs = sysfs
         self.sysfs_device = sysfs_device
         self.multipath_object = multipath_object
+        self.connectivity_factory = connectivity_factory
 
     @contextmanager
     def asi_context(self):
@@ -30,6 +33,14 @@ class LinuxNativeMultipathBlockDevice(LinuxBlockDeviceMixin, multipath.Multipath
         finally:
             handle.close()
 
+    def _get_cached_inquiry_buffer(self, page_code):
+        from .scsi import get_sysfs_inquiry_buffer
+        paths = self.get_paths()
+        buffer = get_sysfs_inquiry_buffer(paths[0].sysfs_device, page_code) if paths else None
+        if buffer is not None:
+            return buffer
+        return super(LinuxNativeMultipathBlockDevice, self)._get_cached_inquiry_buffer(page_code)
+
     def _is_there_atleast_one_path_up(self):
         return any(path.get_state() == "up" for path in self.get_paths())
 
@@ -50,7 +61,7 @@ class LinuxNativeMultipathBlockDevice(LinuxBlockDeviceMixin, multipath.Multipath
         paths = list()
         for path in itertools.chain.from_iterable(group.paths for group in self.multipath_object.path_groups):
             try:
-                paths.append(LinuxPath(self.sysfs, path))
+                paths.append(LinuxPath(self.sysfs, path, self))
             except ValueError:
                 logger.debug("LinuxPath sysfs device disappeared for {}".format(path))
         return paths
@@ -84,10 +95,12 @@ class LinuxNativeMultipathBlockDevice(LinuxBlockDeviceMixin, multipath.Multipath
 class LinuxRoundRobin(multipath.RoundRobin):
     pass
 
-class LinuxPath(UnixPathMixin, multipath.Path):
-    def __init__(self, sysfs, multipath_object_path):
+class LinuxPath(LinuxConnectivityMixin, UnixPathMixin, multipath.Path):
+    def __init__(self, sysfs, multipath_object_path, multipath_device=None):
         from infi.dtypes.hctl import HCTL
         self.multipath_object_path = multipath_object_path
+        self._multipath_device = multipath_device
+        self._connectivity_factory = getattr(multipath_device, "connectivity_factory", None)
         self.hctl = HCTL(*self.multipath_object_path.hctl)
         self.sysfs_device = sysfs.find_scsi_disk_by_hctl(self.hctl)
 
@@ -109,6 +122,14 @@ class LinuxPath(UnixPathMixin, multipath.Path):
     def get_path_id(self):
         return self.multipath_object_path.device_name
 
+    def _get_cached_device_identification_buffer(self):
+        from .scsi import get_sysfs_inquiry_buffer
+        return get_sysfs_inquiry_buffer(self.sysfs_device, 0x83)
+
+    def _get_known_alua_state(self):
+        from .scsi import get_sysfs_alua_state
+        return get_sysfs_alua_state(self.sysfs_device)
+
     def get_hctl(self):
         return self.hctl
 
@@ -117,21 +138,35 @@ class LinuxPath(UnixPathMixin, multipath.Path):
         return "up" if self.multipath_object_path.state == "active" else "down"
 
     def get_io_statistics(self):
-        # http://www.kernel.org/doc/Documentation/block/stat.txt
-        stat_file_path = "/sys/block/{}/stat".format(self.get_path_id())
-        with open(stat_file_path, "rb") as fd:
-            stat_data = fd.read()
-            stat_values = [int(val) for val in stat_data.split()]
-            read_ios, _, read_sectors, _, write_ios, _, write_sectors = stat_values[:7]
-            # sector = always 512 bytes, not disk-dependent
-            bytes_read = read_sectors * 512
-            bytes_written = write_sectors * 512
-            return multipath.PathStatistics(bytes_read, bytes_written, read_ios, write_ios)
+        from .diskstats import read_stat_file
+        return read_stat_file("/sys/block/{}/stat".format(self.get_path_id()))
+
+MULTIPATH_BACKEND_MULTIPATHD = "multipathd"
+MULTIPATH_BACKEND_SYSFS = "sysfs"
+
 
 class LinuxNativeMultipathModel(multipath.NativeMultipathModel):
-    def __init__(self, sysfs):
+    def __init__(self, sysfs, client=None, poll_changed_maps=False, backend=MULTIPATH_BACKEND_MULTIPATHD,
+                 connectivity_factory=None):
+        """`backend` is where the maps are read from: MULTIPATH_BACKEND_MULTIPATHD asks multipathd, and
+        MULTIPATH_BACKEND_SYSFS reads the device-mapper attributes in sysfs (see
+        `infi.storagemodel.linux.device_mapper`).
+        `connectivity_factory` is where the paths get their connectivity from (see `LinuxConnectivityMixin`)"""
         super(LinuxNativeMultipathModel, self).__init__()
         self.sysfs = sysfs
+        self.client = client
+        self.poll_changed_maps = poll_changed_maps
+        self.backend = backend
+        self.connectivity_factory = connectivity_factory
+        # set once get_all_multipath_block_devices fetched all the maps. the storage model creates a new multipath
+        # model on refresh, so it starts over
+        self._all_devices_fetched = False
+
+    def _get_client(self):
+        from .multipathd import PooledMultipathClient
+        if self.client is None:
+            self.client = PooledMultipathClient()
+        return self.client
 
     def _is_device_active(self, multipath_device):
         return any(any(path.state == 'active' for path in group.paths) for group in multipath_device.path_groups)
@@ -140,7 +175,10 @@ class LinuxNativeMultipathModel(multipath.NativeMultipathModel):
         from infi.multipathtools.errors import ConnectionError, TimeoutExpired
         from infi.exceptools import chain
         try:
-            all_devices = client.get_list_of_multipath_devices()
+            if self.poll_changed_maps:
+                all_devices = client.poll_list_of_multipath_devices()
+            else:
+                all_devices = client.get_list_of_multipath_devices()
             device_gen = (repr(device) for device in all_devices)
             logger.debug("all mulitpath devices =")
             for device_repr in device_gen:
@@ -154,24 +192,79 @@ class LinuxNativeMultipathModel(multipath.NativeMultipathModel):
             return []
         return active_devices
 
+    def _create_living_block_devices(self, mpath_devices):
+        result = []
+        for mpath_device in mpath_devices:
+            block_dev = self.sysfs.find_block_device_by_devno(mpath_device.major_minor)
+            if block_dev is not None:
+                result.append(LinuxNativeMultipathBlockDevice(self.sysfs, block_dev, mpath_device,
+                                                              self.connectivity_factory))
+        return [device for device in result if device._is_there_atleast_one_path_up()]
+
+    def _get_list_of_active_devices_from_sysfs(self):
+        from .device_mapper import get_list_of_multipath_devices_from_sysfs
+        return [device for device in get_list_of_multipath_devices_from_sysfs(self.sysfs)
+                if self._is_device_active(device)]
+
     @cached_method
     def get_all_multipath_block_devices(self):
-        from infi.multipathtools import MultipathClient
-        from infi.multipathtools.connection import UnixDomainSocket
-        client = MultipathClient(UnixDomainSocket(timeout=120))
+        self._all_devices_fetched = True
+        if self.backend == MULTIPATH_BACKEND_SYSFS:
+            devices = self._get_list_of_active_devices_from_sysfs()
+            logger.debug("Got {} devices from device-mapper sysfs".format(len(devices)))
+            return self._create_living_block_devices(devices)
+        client = self._get_client()
         if not client.is_running():
             logger.warning("multipathd is not running")
             return []
 
         devices = self._get_list_of_active_devices(client)
-        result = []
         logger.debug("Got {} devices from multipath client".format(len(devices)))
-        for mpath_device in devices:
-            block_dev = self.sysfs.find_block_device_by_devno(mpath_device.major_minor)
-            if block_dev is not None:
-                result.append(LinuxNativeMultipathBlockDevice(self.sysfs, block_dev, mpath_device))
-        living_devices = [device for device in result if device._is_there_atleast_one_path_up()]
-        return living_devices
+        return self._create_living_block_devices(devices)
+
+    @cached_method
+    def _find_multipath_device_by_map_name(self, map_name):
+        """Returns the multipath block device of the map, or None. Only this map is fetched from multipathd"""
+        from infi.multipathtools.errors import ConnectionError, TimeoutExpired
+        try:
+            mpath_device = self._get_client().get_multipath_device(map_name)
+        except TimeoutExpired:
+            logger.error("communication with multipathd timed out")
+            return None
+        except ConnectionError:
+            logger.error("communication error with multipathd")
+            return None
+        if mpath_device is None or not self._is_device_active(mpath_device):
+            return None
+        devices = self._create_living_block_devices([mpath_device])
+        return devices[0] if devices else None
+
+    def find_multipath_device_by_block_access_path(self, path):
+        """Returns the `infi.storagemodel.linux.native_multipath.LinuxNativeMultipathBlockDevice` of a
+        /dev/mapper/<name> or /dev/dm-N path. If the list of all the multipath devices was not fetched yet, only the
+        map of this path is fetched from multipathd.
+
+        Raises `KeyError` if no such device is found."""
+        from os.path import basename, dirname
+        map_name = basename(path)
+        is_map_path = dirname(path) == "/dev/mapper" or (dirname(path) == "/dev" and map_name.startswith("dm-"))
+        if self.backend == MULTIPATH_BACKEND_SYSFS or self._all_devices_fetched or not is_map_path:
+            return super(LinuxNativeMultipathModel, self).find_multipath_device_by_block_access_path(path)
+        device = self._find_multipath_device_by_map_name(map_name)
+        if device is None or path not in (device.get_block_access_path(), device.get_device_mapper_access_path()):
+            raise KeyError(path)
+        return device
+
+    def get_io_statistics_for_all_paths(self):
+        """Returns a dict of path ID (sdX) and device-mapper name (dm-N) ->
+        `infi.storagemodel.base.multipath.PathStatistics` of all the paths and multipath block devices, from a single
+        read of /proc/diskstats"""
+        from .diskstats import get_diskstats
+        devices = self.get_all_multipath_block_devices()
+        names = set(path.get_path_id() for device in devices for path in device.get_paths())
+        names.update(device.multipath_object.dm_name for device in devices)
+        diskstats = get_diskstats()
+        return dict((name, diskstats[name]) for name in names if name in diskstats)
 
     @cached_method
     def get_all_multipath_storage_controller_devices(self):
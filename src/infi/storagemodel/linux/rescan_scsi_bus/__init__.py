@@ -11,15 +11,15 @@ logger = getLogger(__name__)
 
 @traceback_decorator
 @func_logger
-def main(timeout=None):
+def main(timeout=None, scope=None, **scan_kwargs):
+    """Returns the `infi.storagemodel.linux.rescan_scsi_bus.report.RescanReport` of the rescan, or None if it failed"""
     from infi.storagemodel.base.gevent_wrapper import reinit
     reinit()
     try:
-        rescan_scsi_hosts(timeout=timeout)
-        return 0
+        return rescan_scsi_hosts(timeout=timeout, scope=scope, **scan_kwargs)
     except Exception as err:
         logger.exception("{} Unhandled exception in rescan_scsi_bus: {}".format(getpid(), err))
-        return 1
+        return None
 
 
 @func_logger
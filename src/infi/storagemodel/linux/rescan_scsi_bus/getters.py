@@ -39,29 +39,80 @@ def get_hosts():
             dirpath in glob("/sys/class/scsi_host/host*") if
             should_scan_scsi_host(dirpath)]
 
+class SCSITopology(object):
+    """host -> channel -> target -> luns, built from a single listing of /sys/class/scsi_device.
+    A rescan pass passes one around instead of listing sysfs for every lookup, and invalidates it after writing to
+    a scan or delete file, so the next lookup lists sysfs again"""
+
+    def __init__(self):
+        super(SCSITopology, self).__init__()
+        self._tree = None
+
+    def invalidate(self):
+        self._tree = None
+
+    def _get_tree(self):
+        if self._tree is None:
+            tree = dict()
+            for name in get_scsi_device_names_from_sysfs():
+                try:
+                    host, channel, target, lun = [int(item) for item in name.split(":")]
+                except ValueError:
+                    continue
+                tree.setdefault(host, dict()).setdefault(channel, dict()).setdefault(target, set()).add(lun)
+            self._tree = tree
+        return self._tree
+
+    def get_channels(self, host):
+        return set(self._get_tree().get(host, dict()))
+
+    def get_targets(self, host, channel):
+        return set(self._get_tree().get(host, dict()).get(channel, dict()))
+
+    def get_luns(self, host, channel, target):
+        return set(self._get_tree().get(host, dict()).get(channel, dict()).get(target, set()))
+
+    def __repr__(self):
+        return "<{}({})>".format(self.__class__.__name__, "stale" if self._tree is None else "listed")
+
+@func_logger
+def get_channels(host, topology=None):
+    return (topology or SCSITopology()).get_channels(host)
+
 @func_logger
-def get_channels(host):
-    matching_host = [item for item in get_scsi_device_names_from_sysfs()
-                     if item.startswith("{}:".format(host))]
-    channels = set([int(device.split(":")[1])
-                    for device in matching_host])
-    return channels
+def get_targets(host, channel, topology=None):
+    return (topology or SCSITopology()).get_targets(host, channel)
+
+@func_logger
+def get_luns(host, channel, target, topology=None):
+    return (topology or SCSITopology()).get_luns(host, channel, target)
+
+def _read_sysfs_attribute(dirpath, name):
+    try:
+        with open(path.join(dirpath, name)) as fd:
+            return fd.read().strip()
+    except (IOError, OSError):
+        return None
 
 @func_logger
-def get_targets(host, channel):
-    matching_host_and_channel = [item for item in get_scsi_device_names_from_sysfs()
-                                 if item.startswith("{}:{}:".format(host, channel))]
-    targets = set([int(device.split(":")[2])
-                    for device in matching_host_and_channel])
-    return targets
+def get_fc_host_port_name(host):
+    """returns the port WWN of the host (e.g. '0x21000024ff3e4f5a'), or None if it is not an FC host"""
+    return _read_sysfs_attribute("/sys/class/fc_host/host{}".format(host), "port_name")
 
 @func_logger
-def get_luns(host, channel, target):
-    matching_host_channel_and_target = [item for item in get_scsi_device_names_from_sysfs()
-                                        if item.startswith("{}:{}:{}:".format(host, channel, target))]
-    luns = set([int(device.split(":")[3])
-                for device in matching_host_channel_and_target])
-    return luns
+def get_fc_remote_targets(host):
+    """returns a dict of (channel, target) to the port WWN of the remote port, for the FC remote ports of the host
+    that are SCSI targets"""
+    result = dict()
+    for dirpath in glob("/sys/class/fc_remote_ports/rport-{}:*".format(host)):
+        # /sys/class/fc_remote_ports/rport-H:C-N
+        match = search(r"rport-\d+:(\d+)-\d+$", dirpath)
+        target = _read_sysfs_attribute(dirpath, "scsi_target_id")
+        port_name = _read_sysfs_attribute(dirpath, "port_name")
+        if match is None or target is None or port_name is None or int(target) < 0:
+            continue
+        result[(int(match.group(1)), int(target))] = port_name
+    return result
 
 @func_logger
 def is_hctl_written_in_proc_scsi_scsi(host, channel, target, lun):
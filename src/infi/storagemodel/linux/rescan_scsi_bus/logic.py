@@ -4,20 +4,26 @@ from .utils import func_logger, format_hctl, ScsiCommandFailed
 from .scsi import scsi_host_scan, scsi_add_single_device, remove_device_via_sysfs
 from .scsi import do_report_luns, do_standard_inquiry, do_test_unit_ready, execute_modprobe_sg
 from .getters import get_scsi_generic_device, is_sg_module_loaded
-from .getters import get_hosts, get_channels, get_targets, get_luns
+from .getters import get_hosts, get_channels, get_targets, get_luns, SCSITopology
+from .getters import get_fc_host_port_name, get_fc_remote_targets
 from .getters import is_there_a_bug_in_target_removal, is_there_a_bug_in_sysfs_async_scanning
+from .report import TargetScanReport, RescanReport
 
 logger = getLogger(__name__)
 
 DIRECT_ACCESS_BLOCK_DEVICE = 0
 STORAGE_ARRAY_CONTROLLER_DEVICE = 12
 
+# every target scan forks a process, these limit how many of them run at once
+DEFAULT_TARGET_SCAN_CONCURRENCY = 32
+DEFAULT_TARGET_SCAN_CONCURRENCY_PER_HOST = 8
+
 class SkipLunTypeException(Exception):
     pass
 
 @func_logger
-def get_luns_from_report_luns(host, channel, target):
-    for lun in sorted(get_luns(host, channel, target).union(set([0]))):
+def get_luns_from_report_luns(host, channel, target, topology=None):
+    for lun in sorted(get_luns(host, channel, target, topology).union(set([0]))):
         lun_type = get_lun_type(host, channel, target, lun)
         if lun_type is None:
             continue
@@ -65,7 +71,7 @@ def lun_scan(host, channel, target, lun):
 def handle_add_devices(host, channel, target, missing_luns):
     if is_there_a_bug_in_sysfs_async_scanning():
         return all(scsi_add_single_device(host, channel, target, lun) for lun in missing_luns)
-    return scsi_host_scan(host)
+    return scsi_host_scan(host, channel, target)
 
 @func_logger
 def handle_device_removal(host, channel, target, lun):
@@ -77,16 +83,20 @@ def handle_device_removal(host, channel, target, lun):
     return True
 
 @func_logger
-def target_scan(host, channel, target):
+def target_scan(host, channel, target, topology=None):
+    """Returns a `TargetScanReport`"""
+    topology = topology or SCSITopology()
+    report = TargetScanReport(host, channel, target)
     try:
-        array_luns = get_luns_from_report_luns(host, channel, target)
+        array_luns = get_luns_from_report_luns(host, channel, target, topology)
     except ScsiCommandFailed:
         logger.debug("report luns failed, ignoring target {}:{}:{}".format(host, channel, target))
-        return
+        report.error = "report luns failed"
+        return report
     except SkipLunTypeException:
         logger.info("No luns found for {}:{}:{}, ignoring target.".format(host, channel, target))
-        return
-    sysfs_luns = get_luns(host, channel, target)
+        return report
+    sysfs_luns = get_luns(host, channel, target, topology)
     logger.debug("{} array_luns: {}".format(getpid(), array_luns))
     logger.debug("{} sysfs_luns: {}".format(getpid(), sysfs_luns))
     missing_luns = array_luns - sysfs_luns
@@ -98,14 +108,22 @@ def target_scan(host, channel, target):
     if sysfs_luns and not array_luns:
         logger.debug("{} target {}:{}:{} was removed".format(getpid(), host, channel, target))
         if is_there_a_bug_in_target_removal():
-            return
+            return report
     if missing_luns:
-        handle_add_devices(host, channel, target, missing_luns)
+        if handle_add_devices(host, channel, target, missing_luns):
+            report.added.update(missing_luns)
+        else:
+            report.failed.update(missing_luns)
+        topology.invalidate()
     for lun in unmapped_luns:
-        handle_device_removal(host, channel, target, lun)
+        if handle_device_removal(host, channel, target, lun):
+            report.removed.add(lun)
+        else:
+            report.failed.add(lun)
+        topology.invalidate()
     if not array_luns:
         # STORAGEMODEL-371 for cases where the kernel gets stuck and doesn't create the devices for lun 0
-        return
+        return report
     first_lun = sorted(array_luns)[0]
     for lun in existing_luns:
         if lun == first_lun:
@@ -113,37 +131,93 @@ def target_scan(host, channel, target):
             # so it is redudtant to do it again
             continue
         lun_scan(host, channel, target, lun)
+    return report
 
-def try_target_scan(host, channel, target):
+def try_target_scan(host, channel, target, topology=None):
     try:
-        target_scan(host, channel, target)
-    except:
+        return target_scan(host, channel, target, topology)
+    except Exception as error:
         msg = "Failed to scan target: host={} channel={} target={}. Continuing"
         logger.exception(msg.format(host, channel, target))
+        return TargetScanReport(host, channel, target, error=repr(error))
 
-def block_target_scan(host, channel, target, timeout=None):
+def block_target_scan(host, channel, target, timeout=None, topology=None):
+    """Scans the target in a new process, giving up on it after `timeout` seconds. Returns a `TargetScanReport`"""
     from infi.storagemodel.base.gevent_wrapper import make_blocking
     try:
-        make_blocking(try_target_scan, timeout=timeout)(host, channel, target)
-    except:
+        return make_blocking(try_target_scan, timeout=timeout)(host, channel, target, topology)
+    except Exception as error:
         logger.exception("worker had an exception, did not shut down properly")
+        return TargetScanReport(host, channel, target, error=repr(error))
+
+def _interleave_by_host(targets):
+    """orders the (host, channel, target) tuples round-robin between the hosts, so the workers of the pool spread
+    between the hosts instead of waiting for the same one"""
+    from itertools import chain
+    from six.moves import zip_longest
+    by_host = dict()
+    for item in targets:
+        by_host.setdefault(item[0], []).append(item)
+    rounds = zip_longest(*[by_host[host] for host in sorted(by_host)])
+    return [item for item in chain.from_iterable(rounds) if item is not None]
+
+@func_logger
+def scan_targets(targets, timeout=None, topology=None, concurrency=DEFAULT_TARGET_SCAN_CONCURRENCY,
+                 concurrency_per_host=DEFAULT_TARGET_SCAN_CONCURRENCY_PER_HOST):
+    """Scans the (host, channel, target) tuples, with at most `concurrency` target scans running at once and at most
+    `concurrency_per_host` of them on the same host (None for no limit). Each target scan is given up on after
+    `timeout` seconds. Returns a `RescanReport`"""
+    from functools import partial
+    from infi.storagemodel.base.gevent_wrapper import run_concurrently, BoundedSemaphore
+    targets = _interleave_by_host(targets)
+    semaphores = dict((host, BoundedSemaphore(concurrency_per_host or len(targets))) for host, _, _ in targets)
+
+    def scan(host, channel, target):
+        with semaphores[host]:
+            return block_target_scan(host, channel, target, timeout, topology)
+
+    return RescanReport(run_concurrently([partial(scan, *item) for item in targets], concurrency))
+
+def is_host_in_scope(host, scope):
+    if scope is None:
+        return True
+    if not scope.includes_host(host):
+        return False
+    return scope.initiator_wwns is None or scope.includes_initiator_wwn(get_fc_host_port_name(host))
+
+def get_remote_targets_in_scope(host, scope):
+    return sorted(channel_and_target for channel_and_target, port_name in get_fc_remote_targets(host).items()
+                  if scope.includes_target_wwn(port_name))
+
+def get_targets_to_scan(host, scope=None, topology=None):
+    """Asks the kernel to scan the host (or only its remote ports in the scope), and returns the (host, channel, target)
+    tuples we should scan ourselves"""
+    topology = topology or SCSITopology()
+    if scope is not None and scope.target_wwns is not None:
+        # only the remote ports we were asked for, instead of every target the host sees
+        channels_and_targets = get_remote_targets_in_scope(host, scope)
+        if not is_there_a_bug_in_sysfs_async_scanning():
+            for channel, target in channels_and_targets:
+                scsi_host_scan(host, channel, target)
+            topology.invalidate()
+    else:
+        if not is_there_a_bug_in_sysfs_async_scanning():
+            scsi_host_scan(host)
+            topology.invalidate()
+        channels_and_targets = [(channel, target) for channel in get_channels(host, topology)
+                                for target in get_targets(host, channel, topology)]
+    return [(host, channel, target) for channel, target in channels_and_targets]
 
 @func_logger
-def rescan_scsi_host(host, timeout=None):
-    from infi.storagemodel.base.gevent_wrapper import spawn
-    channels = get_channels(host)
-    subprocesses = []
-    if not is_there_a_bug_in_sysfs_async_scanning():
-        scsi_host_scan(host)
-        channels = get_channels(host)
-    for channel in channels:
-        targets = get_targets(host, channel)
-        for target in targets:
-            subprocesses.append(spawn(block_target_scan, host, channel, target, timeout))
-    return subprocesses
+def rescan_scsi_host(host, timeout=None, scope=None, topology=None, **scan_kwargs):
+    """Returns a `RescanReport`. `scan_kwargs` are passed to `scan_targets`"""
+    topology = topology or SCSITopology()
+    return scan_targets(get_targets_to_scan(host, scope, topology), timeout, topology, **scan_kwargs)
 
 @func_logger
-def rescan_scsi_hosts(timeout=None):
+def rescan_scsi_hosts(timeout=None, scope=None, **scan_kwargs):
+    """Returns a `RescanReport`. `timeout` is the deadline of each target scan, and `scan_kwargs` are passed to
+    `scan_targets`"""
     if not is_sg_module_loaded():
         # our need the 'sg' module, which is no longer loaded during system boot on redhat-7.1
         # altough the module should've been loaded by LinuxScsiModel.__init__
@@ -153,9 +227,13 @@ def rescan_scsi_hosts(timeout=None):
         # /usr/bin/rescan-scsi-bus.sh modprobes sg as well and immediately proceeds with the rescan
         # so we do the same
         execute_modprobe_sg()
-    subprocesses = []
+    targets = []
+    topology = SCSITopology()
     for host_number in get_hosts():
-        subprocesses.extend(rescan_scsi_host(host_number, timeout))
-    for subprocess in subprocesses:
-        subprocess.join()
-
+        if not is_host_in_scope(host_number, scope):
+            logger.debug("{} host {} is not in the rescan scope {!r}".format(getpid(), host_number, scope))
+            continue
+        targets.extend(get_targets_to_scan(host_number, scope, topology))
+    report = scan_targets(targets, timeout, topology, **scan_kwargs)
+    logger.info("{} rescan finished: {!r}".format(getpid(), report))
+    return report
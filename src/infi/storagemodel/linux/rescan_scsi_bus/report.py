@@ -0,0 +1,54 @@
+from .utils import format_hctl
+
+
+class TargetScanReport(object):
+    """What a target scan did: the luns it added and removed, and the luns it failed to add or remove.
+    `error` is set if the target could not be scanned at all"""
+
+    def __init__(self, host, channel, target, error=None):
+        super(TargetScanReport, self).__init__()
+        self.host = host
+        self.channel = channel
+        self.target = target
+        self.added = set()
+        self.removed = set()
+        self.failed = set()
+        self.error = error
+
+    def __repr__(self):
+        _repr = "<{}({}:{}:{}, added={!r}, removed={!r}, failed={!r}, error={!r})>"
+        return _repr.format(self.__class__.__name__, self.host, self.channel, self.target, sorted(self.added),
+                            sorted(self.removed), sorted(self.failed), self.error)
+
+
+class RescanReport(object):
+    """The `TargetScanReport` of every target scanned in a rescan"""
+
+    def __init__(self, targets):
+        super(RescanReport, self).__init__()
+        self.targets = list(targets)
+
+    def _get_hctls(self, attribute):
+        return sorted(format_hctl(report.host, report.channel, report.target, lun)
+                      for report in self.targets for lun in getattr(report, attribute))
+
+    def get_added(self):
+        """Returns the H:C:T:L strings of the luns that were added"""
+        return self._get_hctls("added")
+
+    def get_removed(self):
+        """Returns the H:C:T:L strings of the luns that were removed"""
+        return self._get_hctls("removed")
+
+    def get_failed(self):
+        """Returns the H:C:T:L strings of the luns that could not be added or removed"""
+        return self._get_hctls("failed")
+
+    def get_failed_targets(self):
+        """Returns the reports of the targets that could not be scanned"""
+        return [report for report in self.targets if report.error is not None]
+
+    def __repr__(self):
+        _repr = "<{}(targets={}, added={!r}, removed={!r}, failed={!r}, failed_targets={!r})>"
+        return _repr.format(self.__class__.__name__, len(self.targets), self.get_added(), self.get_removed(),
+                            self.get_failed(), self.get_failed_targets())
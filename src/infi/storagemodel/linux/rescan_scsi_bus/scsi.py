@@ -25,17 +25,18 @@ def scsi_remove_single_device(host, channel, target, lun):
     return write_to_proc_scsi_scsi("scsi remove-single-device {} {} {} {}".format(host, channel, target, lun))
 
 @func_logger
-def scsi_host_scan(host):
-    return write_to_scsi_host(host)
+def scsi_host_scan(host, channel='-', target='-'):
+    return write_to_scsi_host(host, channel, target)
 
-def write_to_scsi_host(host):
+def write_to_scsi_host(host, channel='-', target='-'):
     scan_file = "/sys/class/scsi_host/host{}/scan".format(host)
+    line = "{} {} -".format(channel, target)
     if path.exists(scan_file):
         try:
             with open(scan_file, "w") as fd:
-                fd.write("- - -\n")
+                fd.write("{}\n".format(line))
         except IOError as err:
-            logger.exception("{} IOError {} when writing '- - -' to {}".format(getpid(), err, scan_file))
+            logger.exception("{} IOError {} when writing {!r} to {}".format(getpid(), err, line, scan_file))
             return False
         return True
     logger.debug("{} scan file {} does not exist".format(getpid(), scan_file))
@@ -1,8 +1,9 @@
 from contextlib import contextmanager
 from ..base import scsi, gevent_wrapper
 from ..errors import StorageModelFindError
-from infi.pyutils.lazy import cached_method
+from infi.pyutils.lazy import cached_method, clear_cached_entry
 from .block import LinuxBlockDeviceMixin
+from .connectivity import LinuxConnectivityMixin
 from infi.storagemodel.base.scsi import SCSIBlockDevice
 from infi.storagemodel.base.inquiry import InquiryInformationMixin
 from infi.exceptools import chain
@@ -20,7 +21,33 @@ SG_TIMEOUT_IN_MS = SG_TIMEOUT_IN_SEC * MS
 logger = getLogger(__name__)
 
 
-class LinuxSCSIDeviceMixin(object):
+def get_sysfs_inquiry_buffer(sysfs_device, page_code):
+    """Returns the standard inquiry or VPD page buffer the kernel read when it scanned the device, or None if it isn't
+    exposed in sysfs. Reading them doesn't send anything to the device"""
+    from ..base.inquiry_cache import STANDARD_INQUIRY_PAGE_CODE
+    if page_code != STANDARD_INQUIRY_PAGE_CODE:
+        return sysfs_device.get_vpd_page_buffer(page_code)
+    buffer = sysfs_device.get_inquiry_buffer()
+    # some kernels keep only the first 36 bytes, we want the whole thing
+    if buffer is None or len(buffer) < 5 or len(buffer) < bytearray(buffer)[4] + 5:
+        return None
+    return buffer
+
+
+# /sys/class/scsi_device/H:C:T:L/device/access_state, when a device handler (e.g. scsi_dh_alua) is attached
+ACCESS_STATES = {"active/optimized": 0x0, "active/non-optimized": 0x1, "standby": 0x2, "unavailable": 0x3,
+                 "lba-dependent": 0x4, "offline": 0xe, "transitioning": 0xf}
+
+
+def get_sysfs_alua_state(sysfs_device):
+    """Returns the (ALUA state, preferred) the kernel keeps for the device, or None if it doesn't keep them"""
+    state = sysfs_device.get_access_state()
+    if state not in ACCESS_STATES:
+        return None
+    return ACCESS_STATES[state], sysfs_device.get_preferred_path() == "1"
+
+
+class LinuxSCSIDeviceMixin(LinuxConnectivityMixin):
     @contextmanager
     def asi_context(self):
         from infi.asi import create_platform_command_executer, create_os_file
@@ -49,6 +76,26 @@ class LinuxSCSIDeviceMixin(object):
     def get_linux_scsi_generic_devno(self):
         return self.sysfs_device.get_scsi_generic_devno()
 
+    def _get_cached_inquiry_buffer(self, page_code):
+        buffer = get_sysfs_inquiry_buffer(self.sysfs_device, page_code)
+        if buffer is not None:
+            return buffer
+        return super(LinuxSCSIDeviceMixin, self)._get_cached_inquiry_buffer(page_code)
+
+    @cached_method
+    def _get_inquiry_cache_key(self):
+        try:
+            wwid = self.sysfs_device.get_wwid()
+            generation = self.sysfs_device.get_inquiry_generation()
+            if not wwid and not generation.strip(','):
+                # old kernels: nothing tells a remapped LUN apart from the previous one, so we don't cache at all
+                return None
+            identity = "{}:{}/{}/{}".format(*(self.get_linux_scsi_generic_devno() + (self.get_hctl(), wwid or '')))
+            return identity, generation
+        except (IOError, OSError):
+            logger.debug("failed to get the inquiry cache key of {!r}".format(self), exc_info=True)
+            return None
+
     @cached_method
     def get_scsi_vendor_id(self):
         try:
@@ -122,12 +169,29 @@ class LinuxSCSIEnclosure(LinuxSCSIDeviceMixin, scsi.SCSIEnclosure):
 
 
 class LinuxSCSIModel(scsi.SCSIModel):
-    def __init__(self, sysfs):
+    def __init__(self, sysfs, previous=None, connectivity_factory=None):
+        """if `previous` is a LinuxSCSIModel, the device objects of sysfs devices that were taken from its Sysfs object
+        are taken from it as well, along with everything they cached.
+        `connectivity_factory` is where the devices get their connectivity from (see `LinuxConnectivityMixin`)"""
         self.sysfs = sysfs
+        self.connectivity_factory = connectivity_factory
+        self._devices_by_sysfs_device = dict()
+        self._previous_devices_by_sysfs_device = dict() if previous is None else previous._devices_by_sysfs_device
         # our need the 'sg' module, which is no longer loaded during system boot on redhat-7.1
         if not is_sg_module_loaded():
             execute_modprobe_sg()
 
+    def _get_device(self, device_class, sysfs_device):
+        device = self._previous_devices_by_sysfs_device.get(sysfs_device)
+        if device is None:
+            device = device_class(sysfs_device)
+            device._connectivity_factory = self.connectivity_factory
+        elif isinstance(device, SCSIBlockDevice):
+            # the size of a volume can change without its sg or sd devices changing
+            clear_cached_entry(device.get_size_in_bytes)
+        self._devices_by_sysfs_device[sysfs_device] = device
+        return device
+
     @cached_method
     def get_all_scsi_block_devices(self):
         devices = [item for item in self.get_all_linux_scsi_generic_disk_devices() if
@@ -136,15 +200,17 @@ class LinuxSCSIModel(scsi.SCSIModel):
 
     @cached_method
     def get_all_storage_controller_devices(self):
-        return [LinuxSCSIStorageController(sysfs_dev) for sysfs_dev in self.sysfs.get_all_scsi_storage_controllers()]
+        return [self._get_device(LinuxSCSIStorageController, sysfs_dev)
+                for sysfs_dev in self.sysfs.get_all_scsi_storage_controllers()]
 
     @cached_method
     def get_all_enclosure_devices(self):
-        return [LinuxSCSIEnclosure(sysfs_dev) for sysfs_dev in self.sysfs.get_all_enclosures()]
+        return [self._get_device(LinuxSCSIEnclosure, sysfs_dev) for sysfs_dev in self.sysfs.get_all_enclosures()]
 
     @cached_method
     def get_all_linux_scsi_generic_disk_devices(self):
         """Linux specific: returns a list of ScsiDisk objects that do not rely on SD"""
         from .sysfs import SysfsSDDisk
-        return [LinuxSCSIBlockDevice(disk) if isinstance(disk, SysfsSDDisk) else LinuxSCSIGenericDevice(disk)
+        return [self._get_device(LinuxSCSIBlockDevice if isinstance(disk, SysfsSDDisk) else LinuxSCSIGenericDevice,
+                                 disk)
                 for disk in self.sysfs.get_all_sg_disks()]
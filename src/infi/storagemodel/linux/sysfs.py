@@ -1,19 +1,30 @@
 import os
+import re
 import glob
+from collections import namedtuple
 from infi.dtypes.hctl import HCTL
 from infi.pyutils.lazy import cached_method
 from ..errors import DeviceError
-from infi.sgutils.sg_map import get_hctl_for_sd_device
 
+try:
+    from os import scandir
+except ImportError:     # python 2
+    scandir = None
+
+SYSFS_ROOT = "/sys"
 SYSFS_CLASS_SCSI_DEVICE_PATH = "/sys/class/scsi_device"
+SYSFS_CLASS_SCSI_GENERIC_PATH = "/sys/class/scsi_generic"
 SYSFS_CLASS_BLOCK_DEVICE_PATH = "/sys/class/block"
 SYSFS_CLASS_ENCLOSURE_DEVICE_PATH = "/sys/class/enclosure"
-SYSFS_CLASS_ALL_DEVICE_PATH = "/dev"
+SYSFS_BLOCK_PATH = "/sys/block"
+SYSFS_DEV_BLOCK_PATH = "/sys/dev/block"
 
 SCSI_TYPE_DISK = 0x00
 SCSI_TYPE_STORAGE_CONTROLLER = 0x0C
 SCSI_TYPE_ENCLOSURE = 0x0D
 
+INQUIRY_ATTRIBUTES = ("inquiry", "vpd_pg80", "vpd_pg83")
+
 
 from logging import getLogger
 log = getLogger(__name__)
@@ -24,15 +35,188 @@ def _sysfs_read_field(device_path, field):
         return f.read()
 
 
+def _sysfs_read_binary_field(device_path, field):
+    """Returns the contents of a binary attribute, or None if the attribute does not exist or can't be read"""
+    try:
+        with open(os.path.join(device_path, field), "rb") as f:
+            return f.read() or None
+    except (IOError, OSError):
+        return None
+
+
+def _sysfs_read_wwid(device_path):
+    try:
+        return _sysfs_read_field(device_path, "wwid").strip()
+    except (IOError, OSError):
+        return None
+
+
+def _sysfs_get_inquiry_generation(device_path):
+    mtimes = []
+    for attribute in INQUIRY_ATTRIBUTES:
+        try:
+            mtimes.append(repr(os.stat(os.path.join(device_path, attribute)).st_mtime))
+        except OSError:
+            mtimes.append('')
+    return ','.join(mtimes)
+
+
 def _sysfs_read_devno(device_path):
-    return tuple([int(n) for n in _sysfs_read_field(device_path, "dev").strip().split(":")])
+    return _parse_devno(_sysfs_read_field(device_path, "dev"))
+
+
+def _parse_devno(string):
+    return tuple([int(n) for n in string.strip().split(":")])
+
+
+def _sysfs_path(sysfs_root, absolute_path):
+    """translates one of the /sys/... constants to a path under sysfs_root"""
+    return os.path.join(sysfs_root, os.path.relpath(absolute_path, SYSFS_ROOT))
+
+
+def _list_links(dirpath):
+    """Returns a dict of entry name to the absolute, normalized path its symlink points to.
+    Entries that are not symlinks are not returned. A missing directory yields an empty dict."""
+    result = {}
+    try:
+        if scandir is None:
+            names = [name for name in os.listdir(dirpath) if os.path.islink(os.path.join(dirpath, name))]
+        else:
+            names = [entry.name for entry in scandir(dirpath) if entry.is_symlink()]
+    except (IOError, OSError):
+        return result
+    for name in names:
+        try:
+            target = os.readlink(os.path.join(dirpath, name))
+        except (IOError, OSError):
+            continue
+        result[name] = os.path.normpath(os.path.join(dirpath, target))
+    return result
+
+
+def _read_link_basename(path):
+    try:
+        return os.path.basename(os.readlink(path))
+    except (IOError, OSError):
+        return None
+
+
+def _list_names(dirpath):
+    try:
+        if scandir is None:
+            return os.listdir(dirpath)
+        return [entry.name for entry in scandir(dirpath)]
+    except (IOError, OSError):
+        return []
+
+
+HCTL_STRING_PATTERN = re.compile(r"^\d+:\d+:\d+:\d+$")
+
+
+def _get_hctl_string_of_child(path, subsystem):
+    """for a path like .../H:C:T:L/block/sdX (or .../H:C:T:L/scsi_generic/sgN) returns "H:C:T:L" """
+    parent, _ = os.path.split(path)
+    grandparent, parent_name = os.path.split(parent)
+    hctl_str = os.path.basename(grandparent)
+    if parent_name == subsystem and HCTL_STRING_PATTERN.match(hctl_str):
+        return hctl_str
+    return None
+
+
+SysfsSnapshotSCSIDevice = namedtuple("SysfsSnapshotSCSIDevice",
+                                     ["hctl_str", "scsi_type", "sysfs_dev_path",
+                                      "scsi_generic_device_name", "block_device_name"])
+SysfsSnapshotBlockDevice = namedtuple("SysfsSnapshotBlockDevice", ["name", "sysfs_path", "devno"])
+SysfsDelta = namedtuple("SysfsDelta", ["added", "removed", "changed"])
+
+
+class SysfsSnapshot(object):
+    """An immutable view of the SCSI devices and block devices in sysfs.
+
+    The snapshot is taken in a single pass over /sys/class/scsi_device, /sys/class/scsi_generic and /sys/dev/block
+    (falling back to /sys/block): the HCTL <-> sd <-> sg relations are resolved from the sysfs symlinks, so no device
+    node is opened. The only files read are the SCSI device types."""
+
+    def __init__(self, scsi_devices, block_devices):
+        super(SysfsSnapshot, self).__init__()
+        self._scsi_devices = tuple(scsi_devices)
+        self._block_devices = tuple(block_devices)
+
+    @property
+    def scsi_devices(self):
+        """a tuple of `SysfsSnapshotSCSIDevice` items, one per /sys/class/scsi_device entry"""
+        return self._scsi_devices
+
+    @property
+    def block_devices(self):
+        """a tuple of `SysfsSnapshotBlockDevice` items, one per /sys/block entry"""
+        return self._block_devices
+
+    @classmethod
+    def take(cls, sysfs_root=SYSFS_ROOT):
+        block_devices = cls._get_block_devices(sysfs_root)
+        sd_names = dict()   # hctl_str : sd name
+        for device in block_devices:
+            hctl_str = _get_hctl_string_of_child(device.sysfs_path, "block")
+            if hctl_str is None and device.name.startswith("sd"):
+                # deprecated sysfs layouts (.../H:C:T:L/block:sdX) still have a device link
+                hctl_str = _read_link_basename(os.path.join(device.sysfs_path, "device"))
+            if hctl_str:
+                sd_names[hctl_str] = device.name
+        sg_names = dict()   # hctl_str : sg name
+        for name, path in _list_links(_sysfs_path(sysfs_root, SYSFS_CLASS_SCSI_GENERIC_PATH)).items():
+            hctl_str = _get_hctl_string_of_child(path, "scsi_generic")
+            if hctl_str is not None:
+                sg_names[hctl_str] = name
+
+        scsi_devices = []
+        class_scsi_device_path = _sysfs_path(sysfs_root, SYSFS_CLASS_SCSI_DEVICE_PATH)
+        for hctl_str in _list_names(class_scsi_device_path):
+            dev_path = os.path.join(class_scsi_device_path, hctl_str, "device")
+            try:
+                scsi_type = int(_sysfs_read_field(dev_path, "type"))
+            except (IOError, OSError, ValueError):
+                log.debug("no device type for hctl {}".format(hctl_str))
+                continue
+            scsi_devices.append(SysfsSnapshotSCSIDevice(hctl_str, scsi_type, dev_path,
+                                                        sg_names.get(hctl_str), sd_names.get(hctl_str)))
+        return cls(scsi_devices, block_devices)
+
+    @classmethod
+    def _get_block_devices(cls, sysfs_root):
+        #  /sys/dev/block/8:0 -> ../../devices/pci0000:00/0000:00:15.0/0000:03:00.0/host2/target2:0:0/2:0:0:0/block/sda
+        # not every block device is under a block directory (e.g. .../nvme/nvme0/nvme0n1), so the partitions are told
+        # apart by not being listed in /sys/block
+        block_path = _sysfs_path(sysfs_root, SYSFS_BLOCK_PATH)
+        dev_block_links = _list_links(_sysfs_path(sysfs_root, SYSFS_DEV_BLOCK_PATH))
+        if dev_block_links:
+            block_names = set(_list_names(block_path))
+            return [SysfsSnapshotBlockDevice(os.path.basename(path), path, _parse_devno(devno))
+                    for devno, path in sorted(dev_block_links.items()) if os.path.basename(path) in block_names]
+        # older kernels do not have /sys/dev, so we have to read the "dev" file of each block device
+        result = []
+        for name in _list_names(block_path):
+            path = os.path.join(block_path, name)
+            if os.path.islink(path):
+                path = os.path.normpath(os.path.join(block_path, os.readlink(path)))
+            try:
+                devno = _sysfs_read_devno(path)
+            except (IOError, OSError, ValueError):
+                log.debug("no devno for block device {}".format(name))
+                continue
+            result.append(SysfsSnapshotBlockDevice(name, path, devno))
+        return result
 
 
 class SysfsBlockDeviceMixin(object):
+    block_devno = None
+
     def get_block_device_name(self):
         return self.block_device_name
 
     def get_block_devno(self):
+        if self.block_devno is not None:
+            return self.block_devno
         return _sysfs_read_devno(self.sysfs_block_device_path)
 
     def get_size_in_bytes(self):
@@ -40,9 +224,10 @@ class SysfsBlockDeviceMixin(object):
 
 
 class SysfsBlockDevice(SysfsBlockDeviceMixin):
-    def __init__(self, block_device_name, block_device_path):
+    def __init__(self, block_device_name, block_device_path, block_devno=None):
         self.block_device_name = block_device_name
         self.sysfs_block_device_path = block_device_path
+        self.block_devno = block_devno
 
     def __repr__(self):
         _repr = "<{}(block_device_name={!r}, block_device_path={!r}>"
@@ -50,21 +235,23 @@ class SysfsBlockDevice(SysfsBlockDeviceMixin):
 
 
 class SysfsSCSIDevice(object):
-    def __init__(self, sysfs_dev_path, hctl):
+    def __init__(self, sysfs_dev_path, hctl, scsi_generic_device_name=None):
         super(SysfsSCSIDevice, self).__init__()
         self.sysfs_dev_path = sysfs_dev_path
         self.hctl = hctl
-        # on ubuntu: /sys/class/scsi_device/0:0:1:0/device/scsi_generic/sg1
-        # on redhat: /sys/class/scsi_device/0:0:1:0/device/scsi_generic:sg1
-        basepath = os.path.join(self.sysfs_dev_path, "scsi_generic")
-        if os.path.exists(basepath):
-            sg_dev_names = os.listdir(basepath)
-        else:
-            sg_dev_names = glob.glob(os.path.join(self.sysfs_dev_path, "scsi_generic*"))
-        if len(sg_dev_names) != 1:
-            msg = "{} doesn't have a single device/scsi_generic/sg* path ({!r})"
-            raise DeviceError(msg.format(self.sysfs_dev_path, sg_dev_names))
-        self.scsi_generic_device_name = sg_dev_names[0].split(':')[-1]
+        if scsi_generic_device_name is None:
+            # on ubuntu: /sys/class/scsi_device/0:0:1:0/device/scsi_generic/sg1
+            # on redhat: /sys/class/scsi_device/0:0:1:0/device/scsi_generic:sg1
+            basepath = os.path.join(self.sysfs_dev_path, "scsi_generic")
+            if os.path.exists(basepath):
+                sg_dev_names = os.listdir(basepath)
+            else:
+                sg_dev_names = glob.glob(os.path.join(self.sysfs_dev_path, "scsi_generic*"))
+            if len(sg_dev_names) != 1:
+                msg = "{} doesn't have a single device/scsi_generic/sg* path ({!r})"
+                raise DeviceError(msg.format(self.sysfs_dev_path, sg_dev_names))
+            scsi_generic_device_name = sg_dev_names[0].split(':')[-1]
+        self.scsi_generic_device_name = scsi_generic_device_name
         self.sysfs_scsi_generic_device_path = os.path.join(self.sysfs_dev_path, "scsi_generic",
                                                            self.scsi_generic_device_name)
 
@@ -95,6 +282,37 @@ class SysfsSCSIDevice(object):
     def get_scsi_generic_devno(self):
         return _sysfs_read_devno(self.sysfs_scsi_generic_device_path)
 
+    def get_inquiry_buffer(self):
+        """Returns the standard inquiry data the kernel read when it scanned the device, or None"""
+        return _sysfs_read_binary_field(self.sysfs_dev_path, "inquiry")
+
+    def get_vpd_page_buffer(self, page_code):
+        """Returns the VPD page the kernel read when it scanned the device, or None if it's not exposed"""
+        return _sysfs_read_binary_field(self.sysfs_dev_path, "vpd_pg{:x}".format(page_code))
+
+    def get_wwid(self):
+        """Returns the device identifier the kernel read from page 0x83, or None on kernels without the wwid
+        attribute"""
+        return _sysfs_read_wwid(self.sysfs_dev_path)
+
+    def get_access_state(self):
+        """Returns the ALUA access state the kernel keeps (e.g. "active/optimized"), or None if no device handler
+        keeps it"""
+        try:
+            return _sysfs_read_field(self.sysfs_dev_path, "access_state").strip()
+        except (IOError, OSError):
+            return None
+
+    def get_preferred_path(self):
+        try:
+            return _sysfs_read_field(self.sysfs_dev_path, "preferred_path").strip()
+        except (IOError, OSError):
+            return None
+
+    def get_inquiry_generation(self):
+        """Returns the modification times of the inquiry attributes, which change when the kernel re-creates them"""
+        return _sysfs_get_inquiry_generation(self.sysfs_dev_path)
+
     def __repr__(self):
         _repr = "<{}(sysfs_dev_path={!r}, hctl={!r})>"
         return _repr.format(self.__class__.__name__, self.sysfs_dev_path, self.hctl)
@@ -104,14 +322,18 @@ class SysfsSCSIDevice(object):
 
 
 class SysfsSDDisk(SysfsBlockDeviceMixin, SysfsSCSIDevice):
-    def __init__(self, sysfs_dev_path, hctl, block_dev_names):
-        super(SysfsSDDisk, self).__init__(sysfs_dev_path, hctl)
+    def __init__(self, sysfs_dev_path, hctl, block_dev_names, scsi_generic_device_name=None,
+                 sysfs_block_device_path=None, block_devno=None):
+        super(SysfsSDDisk, self).__init__(sysfs_dev_path, hctl, scsi_generic_device_name)
         # on ubuntu: /sys/class/scsi_device/0:0:1:0/device/block/sdb/
         # on redhat: /sys/class/scsi_device/0:0:1:0/device/block:sdb/
         self.block_device_name = block_dev_names[0].split(':')[-1]
         log.debug("block_device_name = {!r}".format(self.block_device_name))
-        self.sysfs_block_device_path = os.path.join(os.path.sep, 'sys', 'block', self.block_device_name)
+        if sysfs_block_device_path is None:
+            sysfs_block_device_path = os.path.join(SYSFS_BLOCK_PATH, self.block_device_name)
+        self.sysfs_block_device_path = sysfs_block_device_path
         log.debug("sysfs_block_device_path = {!r}".format(self.sysfs_block_device_path))
+        self.block_devno = block_devno
 
     def __repr__(self):
         _repr = "<{}(sysfs_dev_path={!r}, hctl={!r})>"
@@ -119,8 +341,8 @@ class SysfsSDDisk(SysfsBlockDeviceMixin, SysfsSCSIDevice):
 
 
 class SysfsEnclosureDevice(SysfsSCSIDevice):
-    def __init__(self, sysfs_dev_path, hctl):
-        super(SysfsEnclosureDevice, self).__init__(sysfs_dev_path, hctl)
+    def __init__(self, sysfs_dev_path, hctl, scsi_generic_device_name=None):
+        super(SysfsEnclosureDevice, self).__init__(sysfs_dev_path, hctl, scsi_generic_device_name)
         # /sys/class/scsi_device/h:c:t:l/device/enclosure/h:c:t:l
         self._basepath = os.path.join(self.sysfs_dev_path, 'enclosure', str(hctl))
 
@@ -148,82 +370,133 @@ class SysfsEnclosureDevice(SysfsSCSIDevice):
         return None
 
 
+def _is_same_device_key(previous_key, key):
+    """The identities are compared only if both are known: the previous Sysfs object may not have read them"""
+    (previous_names, previous_identity), (names, identity) = previous_key, key
+    if previous_names != names:
+        return False
+    return previous_identity is None or identity is None or previous_identity == identity
+
+
 class Sysfs(object):
-    def __init__(self):
+    def __init__(self, sysfs_root=SYSFS_ROOT, previous=None):
+        """if `previous` is a Sysfs object, devices that did not change since it was populated are taken from it
+        instead of being created again"""
+        self.sysfs_root = sysfs_root
         self.sg_disks = []
         self.sd_disks = []
         self.controllers = []
         self.enclosures = []
         self.block_devices = []
         self.block_devno_to_device = dict()
+        self.hctl_to_sd_disk = dict()
+        self.hctl_to_device = dict()
+        self.name_to_device = dict()
+        self.hctl_to_device_key = dict()
+        self._previous_hctl_to_device = dict()
+        self._previous_hctl_to_device_key = None
+        if previous is not None:
+            previous._populate()
+            self._previous_hctl_to_device = dict(previous.hctl_to_device)
+            self._previous_hctl_to_device_key = previous.hctl_to_device_key
 
     @cached_method
-    def _populate(self):
-        self._sd_structures = {} # hctl_str : list of device paths
+    def get_snapshot(self):
+        """Returns the `SysfsSnapshot` this object was populated from"""
+        return SysfsSnapshot.take(self.sysfs_root)
 
-        for d in os.listdir(SYSFS_CLASS_ALL_DEVICE_PATH):
-            # listdir returns /dev/sda and /dev/sda1
-            if not d.startswith("sd") or d[-1].isdigit():
-                continue
-
-            dev_path = os.path.join(SYSFS_CLASS_ALL_DEVICE_PATH, d)
-            try:
-                hctl = get_hctl_for_sd_device(dev_path)
-            except (IOError, OSError):
-                log.debug("no hctl for sd device {}".format(dev_path))
-                continue
-            self._sd_structures.setdefault(hctl, []).append(d)
+    @cached_method
+    def _populate(self):
+        snapshot = self.get_snapshot()
+        block_devices_by_name = dict((device.name, device) for device in snapshot.block_devices)
 
-        for hctl_str in os.listdir(SYSFS_CLASS_SCSI_DEVICE_PATH):
-            dev_path = os.path.join(SYSFS_CLASS_SCSI_DEVICE_PATH, hctl_str, "device")
+        for scsi_device in snapshot.scsi_devices:
             try:
-                scsi_type = int(_sysfs_read_field(dev_path, "type"))
-                self._append_device_by_type(hctl_str, dev_path, scsi_type)
+                self._append_device_by_type(scsi_device, block_devices_by_name.get(scsi_device.block_device_name))
             except (IOError, OSError):
-                log.debug("no device type for hctl {}".format(hctl_str))
+                log.debug("no device type for hctl {}".format(scsi_device.hctl_str))
             except (DeviceError):
-                log.debug("device for hctl {} is dangling, skipping it".format(hctl_str))
-
-        for name, path in self._get_sysfs_block_devices_pathnames().items():
-            dev = SysfsBlockDevice(name, path)
-            try:
-                devno = dev.get_block_devno()
-                if devno not in self.block_devno_to_device:
-                    self.block_devno_to_device[devno] = dev
-                    self.block_devices.append(dev)
-            except (IOError, OSError):
-                log.debug("no device for {}".format(dev))
+                log.debug("device for hctl {} is dangling, skipping it".format(scsi_device.hctl_str))
+
+        for block_device in snapshot.block_devices:
+            if block_device.devno not in self.block_devno_to_device:
+                dev = SysfsBlockDevice(block_device.name, block_device.sysfs_path, block_device.devno)
+                self.block_devno_to_device[block_device.devno] = dev
+                self.block_devices.append(dev)
+                self.name_to_device.setdefault(block_device.name, dev)
+        # we don't need the previous devices anymore, and we don't want to keep the removed ones alive
+        self._previous_hctl_to_device = dict()
+
+    def _create_device(self, scsi_device, block_device, hctl):
+        dev_path, scsi_type = scsi_device.sysfs_dev_path, scsi_device.scsi_type
+        sg_name = scsi_device.scsi_generic_device_name
+        if scsi_type == SCSI_TYPE_STORAGE_CONTROLLER:
+            return SysfsSCSIDevice(dev_path, hctl, sg_name)
+        elif scsi_type == SCSI_TYPE_ENCLOSURE:
+            return SysfsEnclosureDevice(dev_path, hctl, sg_name)
+        elif scsi_type == SCSI_TYPE_DISK:
+            if block_device is None:
+                return SysfsSCSIDevice(dev_path, hctl, sg_name)
+            return SysfsSDDisk(dev_path, hctl, [block_device.name], sg_name,
+                               block_device.sysfs_path, block_device.devno)
+        return None
 
-    def _append_device_by_type(self, hctl_str, dev_path, scsi_type):
+    def _get_device_key(self, scsi_device, block_device, hctl):
+        """Returns a (names, identity) tuple of the device at `hctl`. A device is the same device as long as its
+        type, sg and sd (the names) and the volume behind it did not change. A LUN that is remapped to another volume
+        usually gets the same names, so we tell them apart by the wwid and inquiry attributes, which the kernel
+        re-creates when it scans the new device. Reading them costs a few file operations per device, so they are
+        read only when there is a previous Sysfs object to compare with (identity is None otherwise)"""
+        names = (scsi_device.scsi_type, scsi_device.scsi_generic_device_name,
+                 None if block_device is None else (block_device.name, block_device.devno))
+        if self._previous_hctl_to_device_key is None:
+            return names, None
+        previous_key = self._previous_hctl_to_device_key.get(hctl)
+        if previous_key is not None and previous_key[0] != names:
+            return names, None
+        # the names match, or the device is new and we need its identity for the next comparison
+        return names, (_sysfs_read_wwid(scsi_device.sysfs_dev_path),
+                       _sysfs_get_inquiry_generation(scsi_device.sysfs_dev_path))
+
+    def _append_device_by_type(self, scsi_device, block_device):
+        hctl = HCTL.from_string(scsi_device.hctl_str)
+        scsi_type = scsi_device.scsi_type
+        device_key = self._get_device_key(scsi_device, block_device, hctl)
+        previous_key = (self._previous_hctl_to_device_key or dict()).get(hctl)
+        if previous_key is not None and _is_same_device_key(previous_key, device_key):
+            device = self._previous_hctl_to_device[hctl]
+        else:
+            device = self._create_device(scsi_device, block_device, hctl)
+        if device is None:
+            return
         if scsi_type == SCSI_TYPE_STORAGE_CONTROLLER:
-            self.controllers.append(SysfsSCSIDevice(dev_path, HCTL.from_string(hctl_str)))
+            self.controllers.append(device)
         elif scsi_type == SCSI_TYPE_ENCLOSURE:
-            self.enclosures.append(SysfsEnclosureDevice(dev_path, HCTL.from_string(hctl_str)))
+            self.enclosures.append(device)
         elif scsi_type == SCSI_TYPE_DISK:
-            block_dev_names = self._sd_structures.get(hctl_str)
-            if not block_dev_names:
-                self.sg_disks.append(SysfsSCSIDevice(dev_path, HCTL.from_string(hctl_str)))
+            if block_device is None:
+                self.sg_disks.append(device)
             else:
-                sd_disk = SysfsSDDisk(dev_path, HCTL.from_string(hctl_str), block_dev_names)
-                self.sd_disks.append(sd_disk)
-                self.sg_disks.append(sd_disk)
-                self.block_devices.append(sd_disk)
-                self.block_devno_to_device[sd_disk.get_block_devno()] = sd_disk
-
-    def _get_sysfs_block_devices_pathnames(self):
-        """ Returns a dict of name:path """
-        for base in ["/sys/block", ]:
-            if os.path.exists(base):
-                #  /sys/class/block/sda ->
-                #     ../../devices/pci0000:00/0000:00:15.0/0000:03:00.0/host2/target2:0:0/2:0:0:0/block/sda
-                def readlink(src):
-                    if os.path.islink(src):
-                        try:
-                            return os.path.abspath(os.path.join(base, os.readlink(os.path.join(base, src))))
-                        except (OSError, IOError):
-                            return os.path.join(base, src)
-                    return os.path.join(base, src)
-                return {link: readlink(link) for link in os.listdir(base)}
+                self.sd_disks.append(device)
+                self.sg_disks.append(device)
+                self.block_devices.append(device)
+                self.block_devno_to_device[device.get_block_devno()] = device
+                self.hctl_to_sd_disk[hctl] = device
+                self.name_to_device[block_device.name] = device
+        self.hctl_to_device[hctl] = device
+        self.hctl_to_device_key[hctl] = device_key
+        self.name_to_device[device.get_scsi_generic_device_name()] = device
+
+    def get_delta(self):
+        """Returns a `SysfsDelta` of the HCTLs of the SCSI devices that were added, removed or changed (their sg or sd
+        device, or the volume behind them, is a different one) since the Sysfs object this one was created from"""
+        self._populate()
+        previous = self._previous_hctl_to_device_key or dict()
+        current = self.hctl_to_device_key
+        return SysfsDelta(added=sorted(hctl for hctl in current if hctl not in previous),
+                          removed=sorted(hctl for hctl in previous if hctl not in current),
+                          changed=sorted(hctl for hctl in current if hctl in previous and
+                                         not _is_same_device_key(previous[hctl], current[hctl])))
 
     @cached_method
     def get_all_sd_disks(self):
@@ -256,10 +529,20 @@ class Sysfs(object):
 
     def find_scsi_disk_by_hctl(self, hctl):
         self._populate()
-        disk = [disk for disk in self.sd_disks if disk.get_hctl() == hctl]
-        if len(disk) != 1:
+        try:
+            return self.hctl_to_sd_disk[hctl]
+        except KeyError:
             raise ValueError("cannot find a disk with HCTL %s" % (str(hctl),))
-        return disk[0]
+
+    def find_scsi_device_by_hctl(self, hctl):
+        """Returns the disk, storage controller or enclosure with the given HCTL, or None"""
+        self._populate()
+        return self.hctl_to_device.get(hctl, None)
+
+    def find_device_by_name(self, name):
+        """Returns the device with the given sg or block device name (e.g. sg3, sdb or dm-0), or None"""
+        self._populate()
+        return self.name_to_device.get(name, None)
 
     def __repr__(self):
         _repr = ("<{}: sg_disks={!r}, sd_disks={!r}, controllers={!r}, block_devices={!r}, " +
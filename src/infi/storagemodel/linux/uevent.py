@@ -0,0 +1,124 @@
+"""Listens to the kernel uevents (NETLINK_KOBJECT_UEVENT), so `rescan_and_wait_for` can re-evaluate its predicate as
+soon as devices are added, removed or changed, instead of polling.
+
+A kernel uevent is a single datagram of NUL-separated strings:
+
+    add@/devices/pci0000:00/.../host3/target3:0:0/3:0:0:1/block/sdb\\0ACTION=add\\0DEVPATH=...\\0SUBSYSTEM=block\\0...
+"""
+import socket
+from time import time
+from logging import getLogger
+
+try:
+    from gevent.select import select
+except ImportError:
+    from select import select
+
+logger = getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+KERNEL_UEVENT_GROUP = 1
+UEVENT_BUFFER_SIZE = 64 * 1024
+
+RELEVANT_SUBSYSTEMS = frozenset(['scsi', 'scsi_device', 'scsi_disk', 'scsi_generic', 'block'])
+RELEVANT_ACTIONS = frozenset(['add', 'remove', 'change', 'bind', 'unbind'])
+
+# a new LUN generates a burst of events (scsi, scsi_device, scsi_disk, scsi_generic, block, and dm for multipath);
+# once the first one arrives we keep reading until the burst is over
+DEFAULT_SETTLE_TIME_IN_SECONDS = 0.1
+MAX_SETTLE_TIME_IN_SECONDS = 1
+
+
+def parse_uevent(data):
+    """Returns a dict of the uevent's environment (ACTION, DEVPATH, SUBSYSTEM, ...), or None if it's not a kernel uevent
+    (for example, the messages udev re-broadcasts start with 'libudev')"""
+    fields = data.split(b'\0')
+    if b'@' not in fields[0]:
+        return None
+    result = dict()
+    for field in fields[1:]:
+        key, sep, value = field.partition(b'=')
+        if sep:
+            result[key.decode('ascii', 'replace')] = value.decode('ascii', 'replace')
+    return result
+
+
+def is_relevant_uevent(uevent):
+    return uevent.get('ACTION') in RELEVANT_ACTIONS and uevent.get('SUBSYSTEM') in RELEVANT_SUBSYSTEMS
+
+
+class NetlinkUeventSource(object):
+    """A netlink socket subscribed to the kernel uevents"""
+
+    def __init__(self):
+        super(NetlinkUeventSource, self).__init__()
+        self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        try:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UEVENT_BUFFER_SIZE * 16)
+            # port id 0 lets the kernel assign a unique one, so other netlink listeners in this process don't collide
+            self._socket.bind((0, KERNEL_UEVENT_GROUP))
+        except:
+            self._socket.close()
+            raise
+
+    def fileno(self):
+        return self._socket.fileno()
+
+    def receive(self):
+        return self._socket.recv(UEVENT_BUFFER_SIZE)
+
+    def close(self):
+        self._socket.close()
+
+
+class UeventListener(object):
+    def __init__(self, source):
+        super(UeventListener, self).__init__()
+        self.source = source
+
+    def _read_relevant_uevent(self, timeout):
+        """Returns a relevant uevent, False if an irrelevant one was read, or None if nothing was read in time"""
+        readable, _, _ = select([self.source], [], [], max(timeout, 0))
+        if not readable:
+            return None
+        uevent = parse_uevent(self.source.receive())
+        if uevent is None or not is_relevant_uevent(uevent):
+            return False
+        return uevent
+
+    def wait_for_change(self, timeout, settle_time=DEFAULT_SETTLE_TIME_IN_SECONDS):
+        """Waits up to `timeout` seconds for a uevent of a SCSI or block device.
+        After the first one, it keeps reading events until none arrive for `settle_time` seconds.
+        Returns the list of relevant uevents, which is empty if the timeout expired"""
+        deadline = time() + timeout
+        uevents = []
+        while time() < deadline:
+            uevent = self._read_relevant_uevent(deadline - time())
+            if uevent is None:
+                return uevents
+            if uevent:
+                uevents.append(uevent)
+                break
+        settle_deadline = time() + MAX_SETTLE_TIME_IN_SECONDS
+        while uevents and time() < settle_deadline:
+            uevent = self._read_relevant_uevent(min(settle_time, settle_deadline - time()))
+            if uevent is None:
+                break
+            if uevent:
+                uevents.append(uevent)
+        logger.debug("got {} uevents: {!r}".format(len(uevents), [(uevent.get('ACTION'), uevent.get('DEVPATH'))
+                                                                  for uevent in uevents]))
+        return uevents
+
+    def close(self):
+        self.source.close()
+
+
+def create_uevent_listener():
+    """Returns a `UeventListener` of the kernel uevents, or None if we can't listen to them"""
+    try:
+        return UeventListener(NetlinkUeventSource())
+    except (AttributeError, socket.error, OSError):
+        # AttributeError: no AF_NETLINK on this platform
+        logger.debug("cannot listen to kernel uevents", exc_info=True)
+        return None
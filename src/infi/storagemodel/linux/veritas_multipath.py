@@ -1,19 +1,21 @@
 from infi.storagemodel.unix.veritas_multipath import VeritasMultipathClient
-from infi.storagemodel.unix.multipath import UnixPathMixin
+from infi.storagemodel.unix.multipath import UnixPathMixin, UnixMultipathBlockDeviceMixin
 from infi.storagemodel.base import multipath, gevent_wrapper
 from infi.pyutils.lazy import cached_method
 from contextlib import contextmanager
+from .connectivity import LinuxConnectivityMixin
 
 from logging import getLogger
 logger = getLogger(__name__)
 
 
-class LinuxVeritasMultipathBlockDevice(multipath.MultipathBlockDevice):
-    def __init__(self, sysfs, scsi, multipath_object):
+class LinuxVeritasMultipathBlockDevice(UnixMultipathBlockDeviceMixin, multipath.MultipathBlockDevice):
+    def __init__(self, sysfs, scsi, multipath_object, connectivity_factory=None):
         super(LinuxVeritasMultipathBlockDevice, self).__init__()
         self.multipath_object = multipath_object
         self._sysfs = sysfs
         self._scsi = scsi
+        self.connectivity_factory = connectivity_factory
 
     def _is_there_atleast_one_path_up(self):
         return any(path.get_state() == "up" for path in self.get_paths())
@@ -31,7 +33,7 @@ class LinuxVeritasMultipathBlockDevice(multipath.MultipathBlockDevice):
         paths = list()
         for path in self.multipath_object.paths:
             try:
-                paths.append(VeritasPath(self._sysfs, self._scsi, path))
+                paths.append(VeritasPath(self._sysfs, self._scsi, path, self))
             except (ValueError, KeyError):
                 logger.debug("VeritasPath sysfs device disappeared for {}".format(path))
         return paths
@@ -89,11 +91,13 @@ class LinuxVeritasMultipathBlockDevice(multipath.MultipathBlockDevice):
         return unpack('L', size)[0]
 
 
-class VeritasPath(UnixPathMixin, multipath.Path):
-    def __init__(self, sysfs, scsi_model, multipath_object_path):
+class VeritasPath(LinuxConnectivityMixin, UnixPathMixin, multipath.Path):
+    def __init__(self, sysfs, scsi_model, multipath_object_path, multipath_device=None):
         self._sysfs = sysfs
         self._scsi_model = scsi_model
         self.multipath_object_path = multipath_object_path
+        self._multipath_device = multipath_device
+        self._connectivity_factory = getattr(multipath_device, "connectivity_factory", None)
         block_access_path = '/dev/{}'.format(self.multipath_object_path.sd_device_name)
         self.hctl = self._scsi_model.find_scsi_block_device_by_block_access_path(block_access_path).get_hctl()
         self.sysfs_device = sysfs.find_scsi_disk_by_hctl(self.hctl)
@@ -102,6 +106,14 @@ class VeritasPath(UnixPathMixin, multipath.Path):
     def get_path_id(self):
         return self.multipath_object_path.sd_device_name
 
+    def _get_cached_device_identification_buffer(self):
+        from .scsi import get_sysfs_inquiry_buffer
+        return get_sysfs_inquiry_buffer(self.sysfs_device, 0x83)
+
+    def _get_known_alua_state(self):
+        from .scsi import get_sysfs_alua_state
+        return get_sysfs_alua_state(self.sysfs_device)
+
     def get_hctl(self):
         return self.hctl
 
@@ -110,16 +122,8 @@ class VeritasPath(UnixPathMixin, multipath.Path):
         return "up" if "enabled" in self.multipath_object_path.state else "down"
 
     def get_io_statistics(self):
-        # http://www.kernel.org/doc/Documentation/block/stat.txt
-        stat_file_path = "/sys/block/{}/stat".format(self.get_path_id())
-        with open(stat_file_path, "rb") as fd:
-            stat_data = fd.read()
-            stat_values = [int(val) for val in stat_data.split()]
-            read_ios, _, read_sectors, _, write_ios, _, write_sectors, _, _, _, _ = stat_values
-            # sector = always 512 bytes, not disk-dependent
-            bytes_read = read_sectors * 512
-            bytes_written = write_sectors * 512
-            return multipath.PathStatistics(bytes_read, bytes_written, read_ios, write_ios)
+        from .diskstats import read_stat_file
+        return read_stat_file("/sys/block/{}/stat".format(self.get_path_id()))
 
     @contextmanager
     def asi_context(self):
@@ -137,10 +141,11 @@ class VeritasPath(UnixPathMixin, multipath.Path):
 
 
 class LinuxVeritasMultipathModel(multipath.VeritasMultipathModel):
-    def __init__(self, sysfs, scsi):
+    def __init__(self, sysfs, scsi, connectivity_factory=None):
         super(LinuxVeritasMultipathModel, self).__init__()
         self._sysfs = sysfs
         self._scsi = scsi
+        self.connectivity_factory = connectivity_factory
 
     def _is_device_active(self, multipath_device):
         return any('enabled' in path.state for path in multipath_device.paths)
@@ -159,9 +164,19 @@ class LinuxVeritasMultipathModel(multipath.VeritasMultipathModel):
         client = VeritasMultipathClient()
         devices = self._get_list_of_active_devices(client)
         logger.debug("Got {} devices from multipath client".format(len(devices)))
-        result = [LinuxVeritasMultipathBlockDevice(self._sysfs, self._scsi, d) for d in devices]
+        result = [LinuxVeritasMultipathBlockDevice(self._sysfs, self._scsi, d, self.connectivity_factory)
+                  for d in devices]
         return [d for d in result if d._is_there_atleast_one_path_up()]
 
+    def get_io_statistics_for_all_paths(self):
+        """Returns a dict of path ID (sdX) -> `infi.storagemodel.base.multipath.PathStatistics` of all the paths, from
+        a single read of /proc/diskstats"""
+        from .diskstats import get_diskstats
+        names = set(path.get_path_id() for device in self.get_all_multipath_block_devices()
+                    for path in device.get_paths())
+        diskstats = get_diskstats()
+        return dict((name, diskstats[name]) for name in names if name in diskstats)
+
     @cached_method
     def get_all_multipath_storage_controller_devices(self):
         return []
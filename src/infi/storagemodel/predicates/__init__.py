@@ -8,6 +8,8 @@ __all__ = [
     'PredicateList',
     'DiskExists',
     'DiskNotExists',
+    'DisksExist',
+    'DisksNotExist',
     'MultipleFiberChannelMappingExist',
     'FiberChannelMappingExists',
     'MultipleFiberChannelMappingNotExist',
@@ -17,26 +19,116 @@ __all__ = [
     'MultipathDevicesAreReady'
 ]
 
+# PredicateList evaluates this many predicates at once. without gevent they run on real threads, and the caches of the
+# model they share are not thread-safe, so by default they are evaluated one after the other
+DEFAULT_PREDICATE_CONCURRENCY = 1
+
+# the predicates send TEST UNIT READY to many devices at once, and give up on a device that did not respond after
+# TEST_UNIT_READY_DEVICE_TIMEOUT_IN_SECONDS, or on all of them after TEST_UNIT_READY_TIMEOUT_IN_SECONDS. the commands
+# are sent with a timeout of 3 seconds (e.g. SG_TIMEOUT_IN_SEC on Linux), so a device that did not respond by then is
+# stuck in error handling, and we don't wait for it
+TEST_UNIT_READY_DEVICE_TIMEOUT_IN_SECONDS = 3
+TEST_UNIT_READY_TIMEOUT_IN_SECONDS = 30
+
+
 class PredicateList(object):
-    """Returns True if all predicates in a given list return True"""
-    def __init__(self, list_of_predicates):
+    """Returns True if all predicates in a given list return True.
+
+    Predicates that can be merged (e.g. several `DiskExists`) are merged into one that looks them all up at once.
+    Once one of them returns False, the ones that did not start are skipped. With a `concurrency` greater than 1,
+    up to that many predicates are evaluated at once, which is safe only if they don't share a model that is not
+    populated yet (or if gevent is installed)"""
+    def __init__(self, list_of_predicates, concurrency=DEFAULT_PREDICATE_CONCURRENCY):
         super(PredicateList, self).__init__()
         self._list_of_predicates = list_of_predicates
+        self._concurrency = concurrency
 
-    def __call__(self):
+    def _get_merged_predicates(self):
+        """Predicates whose `get_merge_key` methods return the same key are merged by the `merge_predicates` method of
+        the first of them"""
+        groups = []
+        group_by_key = dict()
         for predicate in self._list_of_predicates:
+            get_merge_key = getattr(predicate, "get_merge_key", None)
+            key = None if get_merge_key is None else get_merge_key()
+            if key is None:
+                groups.append([predicate])
+            elif key in group_by_key:
+                group_by_key[key].append(predicate)
+            else:
+                group_by_key[key] = [predicate]
+                groups.append(group_by_key[key])
+        return [group[0] if len(group) == 1 else group[0].merge_predicates(group) for group in groups]
+
+    def __call__(self):
+        from functools import partial
+        from ..base.gevent_wrapper import run_concurrently
+        results = []
+
+        def evaluate(predicate):
+            if False in results:
+                return
             result = predicate()
             logger.debug("Predicate {!r} returned {}".format(predicate, result))
-            if not result:
-                logger.debug("Returning False")
-                return False
+            results.append(bool(result))
+
+        try:
+            run_concurrently([partial(evaluate, predicate) for predicate in self._get_merged_predicates()],
+                             self._concurrency)
+        except Exception:
+            if False not in results:
+                raise
+            logger.debug("A predicate raised an exception, but another one returned False", exc_info=True)
+        if False in results:
+            logger.debug("Returning False")
+            return False
         logger.debug("Returning True")
         return True
 
+    def get_rescan_scope(self):
+        """Returns the union of the rescan scopes of the predicates, or None if any of them doesn't have one"""
+        from ..base.rescan_scope import get_rescan_scope
+        scopes = [get_rescan_scope(predicate) for predicate in self._list_of_predicates]
+        if not scopes or None in scopes:
+            return None
+        result = scopes[0]
+        for scope in scopes[1:]:
+            result = result.union(scope)
+        return result
+
     def __repr__(self):
         return "<PredicateList: {!r}>".format(self._list_of_predicates)
 
 
+def send_test_unit_ready(devices):
+    """Sends TEST UNIT READY to the devices concurrently and returns a dict of device -> True/False, or None if the
+    device did not respond in time. See `infi.storagemodel.base.inquiry.sweep_test_unit_ready`"""
+    from ..base.inquiry import sweep_test_unit_ready
+    readiness = sweep_test_unit_ready(devices, TEST_UNIT_READY_DEVICE_TIMEOUT_IN_SECONDS,
+                                      TEST_UNIT_READY_TIMEOUT_IN_SECONDS)
+    not_responding = [device for device, ready in readiness.items() if ready is None]
+    if not_responding:
+        logger.debug("Devices did not respond to TEST UNIT READY in time: {!r}".format(not_responding))
+    return readiness
+
+
+def _get_ready_devices_by_serial(model, serial_numbers):
+    """Returns a dict of serial number -> devices of the given serial numbers that exist, after sending TEST UNIT READY
+    to those devices only"""
+    serial_dict = model.get_device_index().get_serial_dict()
+    result = dict((serial, serial_dict[serial]) for serial in serial_numbers if serial in serial_dict)
+    send_test_unit_ready([device for devices in result.values() for device in devices])
+    return result
+
+
+def _merge_disk_predicates(predicates):
+    existing, missing = [], []
+    for predicate in predicates:
+        existing.extend(predicate._get_existing_serial_numbers())
+        missing.extend(predicate._get_missing_serial_numbers())
+    return DisksExist(existing, missing)
+
+
 class DiskExists(object):
     """Returns True if a disk was discovered with the given scsi_serial_number"""
 
@@ -46,15 +138,20 @@ class DiskExists(object):
 
     def __call__(self):
         from .. import get_storage_model
-        model = get_storage_model()
-        block_devices = model.get_scsi().get_all_scsi_block_devices()
-        mp_devices = model.get_native_multipath().get_all_multipath_block_devices()
-        non_mp_devices = list(model.get_native_multipath().filter_non_multipath_scsi_block_devices(block_devices))
-        devices = mp_devices + non_mp_devices
-        for device in devices:
-            device.get_scsi_test_unit_ready()
-        return any(device.get_scsi_serial_number() == self.scsi_serial_number
-                   for device in devices)
+        return bool(_get_ready_devices_by_serial(get_storage_model(), [self.scsi_serial_number]))
+
+    def _get_existing_serial_numbers(self):
+        return [self.scsi_serial_number]
+
+    def _get_missing_serial_numbers(self):
+        return []
+
+    def get_merge_key(self):
+        # subclasses may check something else, so only our own classes are merged
+        return "disks" if type(self) in (DiskExists, DiskNotExists) else None
+
+    def merge_predicates(self, predicates):
+        return _merge_disk_predicates(predicates)
 
     def __repr__(self):
         return "<{}: {}>".format(self.__class__.__name__, self.scsi_serial_number)
@@ -66,6 +163,51 @@ class DiskNotExists(DiskExists):
     def __call__(self):
         return not super(DiskNotExists, self).__call__()
 
+    def _get_existing_serial_numbers(self):
+        return []
+
+    def _get_missing_serial_numbers(self):
+        return [self.scsi_serial_number]
+
+
+class DisksExist(object):
+    """Returns True if disks were discovered with all of the given serial numbers, and none of the disks has one of
+    the `missing_scsi_serial_numbers`. The serial numbers are looked up in the model's device index"""
+
+    def __init__(self, scsi_serial_numbers, missing_scsi_serial_numbers=()):
+        super(DisksExist, self).__init__()
+        self.scsi_serial_numbers = frozenset(scsi_serial_numbers)
+        self.missing_scsi_serial_numbers = frozenset(missing_scsi_serial_numbers)
+
+    def __call__(self):
+        from .. import get_storage_model
+        serial_numbers = self.scsi_serial_numbers.union(self.missing_scsi_serial_numbers)
+        existing = set(_get_ready_devices_by_serial(get_storage_model(), serial_numbers))
+        return self.scsi_serial_numbers.issubset(existing) and existing.isdisjoint(self.missing_scsi_serial_numbers)
+
+    def _get_existing_serial_numbers(self):
+        return self.scsi_serial_numbers
+
+    def _get_missing_serial_numbers(self):
+        return self.missing_scsi_serial_numbers
+
+    def get_merge_key(self):
+        return "disks" if type(self) in (DisksExist, DisksNotExist) else None
+
+    def merge_predicates(self, predicates):
+        return _merge_disk_predicates(predicates)
+
+    def __repr__(self):
+        return "<{}: {!r}, missing={!r}>".format(self.__class__.__name__, sorted(self.scsi_serial_numbers),
+                                                 sorted(self.missing_scsi_serial_numbers))
+
+
+class DisksNotExist(DisksExist):
+    """Returns True if none of the disks has one of the given serial numbers"""
+
+    def __init__(self, scsi_serial_numbers):
+        super(DisksNotExist, self).__init__((), scsi_serial_numbers)
+
 
 def build_connectivity_object_from_wwn(initiator_wwn, target_wwn):
     """Returns a `infi.storagemodel.connectivity.FCConnectivity` instance for the given WWNs"""
@@ -138,6 +280,11 @@ class MultipleFiberChannelMappingExist(object):
         logger.debug("Found all expected mappings")
         return True
 
+    def get_rescan_scope(self):
+        """Only the remote ports of the targets, on the hosts of the initiators, need to be rescanned"""
+        from ..base.rescan_scope import RescanScope
+        return RescanScope(initiator_wwns=self._initiators, target_wwns=self._targets)
+
     def __repr__(self):
         text = "<{} (initiators={!r}, targets={!r}, luns={!r})>"
         return text.format(self.__class__.__name__, self._initiators, self._targets, self._lun_numbers)
@@ -200,8 +347,7 @@ class ScsiDevicesAreReady(object):
         from infi.storagemodel import get_storage_model
         model = get_storage_model()
         scsi = model.get_scsi()
-        [device.get_scsi_test_unit_ready() for device in scsi.get_all_storage_controller_devices()]
-        [device.get_scsi_test_unit_ready() for device in scsi.get_all_scsi_block_devices()]
+        send_test_unit_ready(scsi.get_all_storage_controller_devices() + scsi.get_all_scsi_block_devices())
         return True
 
     def __repr__(self):
@@ -215,8 +361,8 @@ class MultipathDevicesAreReady(object):
         from infi.storagemodel import get_storage_model
         model = get_storage_model()
         multipath = model.get_native_multipath()
-        [device.get_scsi_test_unit_ready() for device in multipath.get_all_multipath_block_devices()]
-        [device.get_scsi_test_unit_ready() for device in multipath.get_all_multipath_storage_controller_devices()]
+        send_test_unit_ready(multipath.get_all_multipath_block_devices() +
+                             multipath.get_all_multipath_storage_controller_devices())
         return True
 
     def __repr__(self):
@@ -69,6 +69,7 @@ class Disk(object):
         return self.connectivity
 
     def get_scsi_test_unit_ready(self):
+        self.test_unit_ready_count = getattr(self, 'test_unit_ready_count', 0) + 1
         return None
 
 
@@ -112,27 +113,144 @@ class PredicateTestCase(unittest.TestCase):
         self.assertFalse(PredicateList([self.false, self.true])())
         self.assertFalse(PredicateList([self.false, self.false])())
 
+    def test__predicate_list__stops_at_first_false(self):
+        from . import PredicateList
+        called = []
+
+        def predicate(result):
+            def func():
+                called.append(result)
+                return result
+            return func
+
+        self.assertFalse(PredicateList([predicate(True), predicate(False), predicate(True)], concurrency=1)())
+        self.assertEqual([True, False], called)
+        del called[:]
+        self.assertTrue(PredicateList([predicate(True)] * 3)())
+        self.assertEqual([True] * 3, called)
+
+    def test__predicate_list__serial_by_default(self):
+        from time import sleep
+        from . import PredicateList
+        running, most_running = [0], [0]
+
+        def predicate():
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+            sleep(0.01)
+            running[0] -= 1
+            return True
+
+        self.assertTrue(PredicateList([predicate] * 4)())
+        self.assertEqual(1, most_running[0])
+
+    def test__predicate_list__false_wins_over_errors(self):
+        from . import PredicateList
+
+        def error():
+            raise ValueError()
+
+        self.assertFalse(PredicateList([self.false, error], concurrency=1)())
+        self.assertRaises(ValueError, PredicateList([self.true, error]))
+
+    def test__predicate_list__merges_disk_predicates(self):
+        from . import PredicateList, DiskExists, DiskNotExists, DisksExist, FiberChannelMappingExists
+        fc_predicate = FiberChannelMappingExists(":".join(["01"] * 8), ":".join(["02"] * 8), 1)
+        predicates = PredicateList([DiskExists("1"), fc_predicate, DiskNotExists("3"), DisksExist(["2"])])
+        merged = predicates._get_merged_predicates()
+        self.assertEqual(2, len(merged))
+        self.assertEqual((frozenset(["1", "2"]), frozenset(["3"])),
+                         (merged[0].scsi_serial_numbers, merged[0].missing_scsi_serial_numbers))
+        self.assertIs(fc_predicate, merged[1])
+
+        class MyDiskExists(DiskExists):
+            pass
+
+        mine = MyDiskExists("2")
+        merged = PredicateList([DiskExists("1"), mine, DiskExists("3")])._get_merged_predicates()
+        self.assertEqual([frozenset(["1", "3"]), mine], [merged[0].scsi_serial_numbers, merged[1]])
+
+    @mock.patch("infi.storagemodel.get_storage_model")
+    def test__disks_exist(self, get_storage_model):
+        from . import PredicateList, DiskExists, DiskNotExists, DisksNotExist
+        get_storage_model.return_value = MockModel()
+        SCSIModel._devices = [Disk(str(index)) for index in range(5)]
+        try:
+            predicates = PredicateList([DiskExists(str(index)) for index in range(5)] + [DiskNotExists("7")])
+            self.assertTrue(predicates())
+            self.assertEqual([1] * 5, [disk.test_unit_ready_count for disk in SCSIModel._devices])
+            self.assertFalse(PredicateList([DiskExists("1"), DiskExists("8")])())
+            self.assertFalse(PredicateList([DiskExists("1"), DiskNotExists("2")])())
+            self.assertTrue(DisksNotExist(["8", "9"])())
+        finally:
+            SCSIModel._devices = []
+
+    @mock.patch("infi.storagemodel.get_storage_model")
+    def test__disk_exists__uses_device_index(self, get_storage_model):
+        from . import DiskExists
+        model = get_storage_model.return_value = MockModel()
+        SCSIModel._devices = [Disk(str(index)) for index in range(5)]
+        try:
+            self.assertTrue(DiskExists("2")())
+            self.assertTrue(DiskExists("3")())
+            self.assertEqual([0, 0, 1, 1, 0], [getattr(disk, 'test_unit_ready_count', 0)
+                                               for disk in SCSIModel._devices])
+            self.assertIs(SCSIModel._devices[4], model.get_device_by_serial("4"))
+            self.assertRaises(KeyError, model.get_device_by_serial, "5")
+            self.assertEqual([], model.get_devices_by_volume(1, 2))
+        finally:
+            SCSIModel._devices = []
+
+    @mock.patch("infi.storagemodel.get_storage_model")
+    def test__devices_by_volume(self, get_storage_model):
+        model = get_storage_model.return_value = MockModel()
+
+        class Vendor(object):
+            def __init__(self, keys):
+                self.keys = keys
+
+            def get_volume_index_keys(self):
+                if self.keys is None:
+                    raise ValueError()
+                return self.keys
+
+        SCSIModel._devices = [Disk("1"), Disk("2"), Disk("3"), Disk("4")]
+        vendors = [Vendor([(1, 10)]), Vendor([(1, 10), (2, 20)]), Vendor(None), None]
+        for disk, vendor in zip(SCSIModel._devices, vendors):
+            disk.get_vendor = lambda vendor=vendor: vendor
+        try:
+            self.assertEqual(SCSIModel._devices[:2], model.get_devices_by_volume(1, 10))
+            self.assertEqual(SCSIModel._devices[1:2], model.get_devices_by_volume(2, 20))
+            self.assertEqual([], model.get_devices_by_volume(2, 10))
+            self.assertEqual(SCSIModel._devices[2:3], model.get_device_index().get_unindexed_volume_devices())
+        finally:
+            SCSIModel._devices = []
+
     @mock.patch("infi.storagemodel.get_storage_model")
     def test__disk_appeared(self, get_storage_model):
         from . import DiskExists
-        get_storage_model.return_value = MockModel()
+        model = get_storage_model.return_value = MockModel()
         self.assertFalse(DiskExists("12345678")())
         SCSIModel._devices = [Disk("12345678")]
+        model.refresh()
         self.assertTrue(DiskExists("12345678")())
         SCSIModel._devices = []
         MultipathModel._devices = [Disk("12345678")]
+        model.refresh()
         self.assertTrue(DiskExists("12345678")())
         MultipathModel._devices = []
 
     @mock.patch("infi.storagemodel.get_storage_model")
     def test__disk_gone(self, get_storage_model):
         from . import DiskNotExists
-        get_storage_model.return_value = MockModel()
+        model = get_storage_model.return_value = MockModel()
         self.assertTrue(DiskNotExists("12345678")())
         SCSIModel._devices = [Disk("12345678")]
+        model.refresh()
         self.assertFalse(DiskNotExists("12345678")())
         SCSIModel._devices = []
         MultipathModel._devices = [Disk("12345678")]
+        model.refresh()
         self.assertFalse(DiskNotExists("12345678")())
         MultipathModel._devices = []
 
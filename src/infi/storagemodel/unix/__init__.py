@@ -10,6 +10,9 @@ logger = getLogger(__name__)
 
 class UnixStorageModel(StorageModel):
     rescan_subprocess_timeout = 30
+    # what the rescan method returned in the last rescan that finished (on Linux, a RescanReport of the targets it
+    # scanned), or None if it failed
+    last_rescan_report = None
 
     def __init__(self):
         super(UnixStorageModel, self).__init__()
@@ -38,14 +41,18 @@ class UnixStorageModel(StorageModel):
         # platform specific
         raise NotImplementedError()
 
-    def block_on_rescan_process(self, event):
+    def block_on_rescan_process(self, event, scope=None):
         from infi.storagemodel.base import gevent_wrapper
         try:
             with gevent_wrapper.blocking_context(None) as server_and_worker:
                 model_without_cache = self.__class__()
-                call_method, call_args = server_and_worker[1].prepare(model_without_cache.rescan_method)
+                kwargs = None if scope is None else dict(scope=scope)
+                call_method, call_args = server_and_worker[1].prepare(model_without_cache.rescan_method, kwargs=kwargs)
                 self.server_and_worker = server_and_worker
-                return server_and_worker[1].call(call_method, call_args, timeout=self.rescan_subprocess_timeout)
+                self.last_rescan_report = None
+                self.last_rescan_report = server_and_worker[1].call(call_method, call_args,
+                                                                    timeout=self.rescan_subprocess_timeout)
+                return self.last_rescan_report
         except:
             logger.exception('rescan method raised exception')
         finally:
@@ -58,14 +65,14 @@ class UnixStorageModel(StorageModel):
             rescan_process.join()
         self.terminate_rescan_process()
 
-    def _initiate_rescan(self, wait_for_completion=True, raise_error=False):
+    def _initiate_rescan(self, wait_for_completion=True, raise_error=False, scope=None):
         from infi.storagemodel.base import gevent_wrapper
 
         if self.rescan_process_start_time:
             if (datetime.now() - self.rescan_process_start_time).total_seconds() > self.rescan_subprocess_timeout:
                 logger.debug("rescan process timed out, killing it")
                 self.terminate_rescan_process()
-                return self._initiate_rescan(wait_for_completion, raise_error)
+                return self._initiate_rescan(wait_for_completion, raise_error, scope)
             else:
                 logger.debug("previous rescan process is still running")
                 if wait_for_completion:
@@ -73,7 +80,7 @@ class UnixStorageModel(StorageModel):
         else:
             self.terminate_rescan_process()
             event = gevent_wrapper.Event()
-            rescan_process = gevent_wrapper.spawn(self.block_on_rescan_process, event)
+            rescan_process = gevent_wrapper.spawn(self.block_on_rescan_process, event, scope)
             event.wait()
             self.rescan_process = rescan_process
             logger.debug("rescan process started")
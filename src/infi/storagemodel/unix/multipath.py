@@ -1,18 +1,100 @@
-from infi.storagemodel.errors import check_for_scsi_errors
+from infi.storagemodel.errors import check_for_scsi_errors, StorageModelError
+from infi.pyutils.lazy import cached_method
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+DEVICE_IDENTIFICATION_PAGE_CODE = 0x83
+
+
+def _get_target_port_group(device_identification_page):
+    designators = [designator for designator in device_identification_page.designators_list
+                   if getattr(designator, "target_port_group", None) is not None]
+    if not designators:
+        raise StorageModelError("the device identification page has no target port group designator")
+    return designators[-1].target_port_group
+
 
 class UnixPathMixin(object):
+    # platforms whose paths know their multipath device set this, so the port groups are asked for once per device
+    _multipath_device = None
+
+    def _get_cached_device_identification_buffer(self):
+        """Returns the device identification VPD page the operating system already read, or None"""
+        return None
 
+    def _get_known_alua_state(self):
+        """Returns the (ALUA state, preferred) of the path if the operating system knows them, or None"""
+        return None
+
+    @cached_method
     @check_for_scsi_errors
-    def get_alua_state(self):
-        from infi.asi.cdb.rtpg import RTPGCommand
+    def get_target_port_group(self):
+        """Returns the target port group of the target port of this path"""
         from infi.asi.cdb.inquiry.vpd_pages.device_identification import DeviceIdentificationVPDPageCommand
         from infi.asi.coroutines.sync_adapter import sync_wait
-        rtpg_command = RTPGCommand()
-        device_identification_command = DeviceIdentificationVPDPageCommand()
+        from infi.storagemodel.base.inquiry import _unpack_vpd_page
+        buffer = self._get_cached_device_identification_buffer()
+        if buffer is not None:
+            return _get_target_port_group(_unpack_vpd_page(DEVICE_IDENTIFICATION_PAGE_CODE, buffer))
+        with self.asi_context() as asi:
+            return _get_target_port_group(sync_wait(DeviceIdentificationVPDPageCommand().execute(asi)))
+
+    @check_for_scsi_errors
+    def get_target_port_groups(self):
+        """Sends REPORT TARGET PORT GROUPS down this path, and returns a dict of target port group -> (ALUA state,
+        preferred) of all the port groups of the logical unit"""
+        from infi.asi.cdb.rtpg import RTPGCommand
+        from infi.asi.coroutines.sync_adapter import sync_wait
         with self.asi_context() as asi:
-            rtpg_result = sync_wait(rtpg_command.execute(asi))
-            device_identification_result = sync_wait(device_identification_command.execute(asi))
-        target_port_group = device_identification_result.designators_list[-1].target_port_group
-        [device_alua_state] = [descriptor.asymetric_access_state for descriptor in rtpg_result.descriptor_list
-                               if descriptor.target_port_group == target_port_group]
-        return device_alua_state
+            rtpg_result = sync_wait(RTPGCommand().execute(asi))
+        return dict((descriptor.target_port_group, (descriptor.asymetric_access_state, bool(descriptor.pref)))
+                    for descriptor in rtpg_result.descriptor_list)
+
+    def _get_alua_state_and_preference(self, get_target_port_groups=None):
+        """`get_target_port_groups` returns the port groups of the logical unit, so the multipath device can share
+        them between its paths"""
+        known = self._get_known_alua_state()
+        if known is not None:
+            return known
+        if get_target_port_groups is None:
+            if self._multipath_device is not None:
+                get_target_port_groups = self._multipath_device.get_target_port_groups
+            else:
+                get_target_port_groups = self.get_target_port_groups
+        return get_target_port_groups()[self.get_target_port_group()]
+
+    def get_alua_state(self):
+        return self._get_alua_state_and_preference()[0]
+
+    def is_alua_preferred(self):
+        """Returns True if the target port group of this path is a preferred one"""
+        return self._get_alua_state_and_preference()[1]
+
+
+class UnixMultipathBlockDeviceMixin(object):
+    def get_target_port_groups(self):
+        """Returns a dict of target port group -> (ALUA state, preferred) of the logical unit, from a single REPORT
+        TARGET PORT GROUPS sent down the first path that answers it"""
+        from infi.exceptools import InfiException
+        paths = sorted(self.get_paths(), key=lambda path: path.get_state() != "up")
+        for index, path in enumerate(paths):
+            try:
+                return path.get_target_port_groups()
+            except (InfiException, EnvironmentError):
+                if index == len(paths) - 1:
+                    raise
+                logger.debug("failed to get the target port groups through {!r}".format(path), exc_info=True)
+        return dict()
+
+    def get_alua_states(self):
+        """Returns a dict of path ID -> ALUA state of all the paths. The states change, so nothing is cached, but
+        REPORT TARGET PORT GROUPS is sent only once for all the paths"""
+        target_port_groups = []
+
+        def get_target_port_groups():
+            if not target_port_groups:
+                target_port_groups.append(self.get_target_port_groups())
+            return target_port_groups[0]
+        return dict((path.get_path_id(), path._get_alua_state_and_preference(get_target_port_groups)[0])
+                    for path in self.get_paths())
@@ -0,0 +1,99 @@
+"""Benchmarks resolving the connectivity of many paths against a fake HBA and iSCSI inventory.
+
+Run directly to resolve 8,000 paths (half over FC, half over iSCSI):
+
+    python tests/benchmark_connectivity.py [number_of_paths] [luns_per_target]
+"""
+from __future__ import print_function
+from contextlib import contextmanager
+from time import time
+from mock import patch
+from infi.dtypes.hctl import HCT, HCTL
+
+
+class FakePortsGenerator(object):
+    def __init__(self, ports):
+        super(FakePortsGenerator, self).__init__()
+        self.ports = ports
+
+    def iter_ports(self):
+        return iter(self.ports)
+
+
+class FakeISCSIApi(object):
+    def __init__(self, sessions):
+        super(FakeISCSIApi, self).__init__()
+        self.sessions = sessions
+
+    def get_sessions(self):
+        return self.sessions
+
+
+def build_fake_inventory(fc_hosts, iscsi_hosts, targets_per_host):
+    """Returns the FC ports and the iSCSI sessions of fc_hosts FC HBA ports and iscsi_hosts iSCSI hosts, each with
+    targets_per_host targets. The FC hosts are numbered first"""
+    from infi.hbaapi import Port
+    from infi.iscsiapi.base import Session, Target
+    ports = []
+    for host in range(fc_hosts):
+        local_port = Port()
+        local_port.port_wwn = "10:00:00:00:c9:00:00:{:02x}".format(host)
+        local_port.hct = (host, -1, -1)
+        for target in range(targets_per_host):
+            remote_port = Port()
+            remote_port.port_wwn = "57:42:b0:f0:00:00:{:02x}:{:02x}".format(host, target)
+            remote_port.hct = (host, 0, target)
+            local_port.discovered_ports.append(remote_port)
+        ports.append(local_port)
+    sessions = []
+    for host in range(fc_hosts, fc_hosts + iscsi_hosts):
+        for target in range(targets_per_host):
+            iscsi_target = Target([], None, "iqn.2009-11.com.infinidat:storage:infinibox-sn-{}".format(target))
+            sessions.append(Session(iscsi_target, None, None, "iqn.1994-05.com.redhat:host", None,
+                                    HCT(host, 0, target)))
+    return ports, sessions
+
+
+@contextmanager
+def fake_inventory(ports, sessions):
+    """Patches infi.hbaapi and infi.iscsiapi to return the given ports and sessions, yields the two patched getters"""
+    with patch("infi.hbaapi.get_ports_generator", return_value=FakePortsGenerator(ports)) as get_ports_generator, \
+            patch("infi.iscsiapi.get_iscsiapi", return_value=FakeISCSIApi(sessions)) as get_iscsiapi:
+        yield get_ports_generator, get_iscsiapi
+
+
+class Path(object):
+    def __init__(self, hctl):
+        super(Path, self).__init__()
+        self.hctl = hctl
+
+    def get_hctl(self):
+        return self.hctl
+
+
+def build_paths(fc_hosts, iscsi_hosts, targets_per_host, luns_per_target):
+    return [Path(HCTL(host, 0, target, lun)) for host in range(fc_hosts + iscsi_hosts)
+            for target in range(targets_per_host) for lun in range(luns_per_target)]
+
+
+def benchmark_connectivity(factory, paths):
+    return [factory.get_by_device_with_hctl(path) for path in paths]
+
+
+def main(number_of_paths=8000, luns_per_target=100):
+    from infi.storagemodel.connectivity import ConnectivityFactoryImpl, CachedConnectivityFactoryImpl
+    fc_hosts = iscsi_hosts = 2
+    targets_per_host = max(number_of_paths // ((fc_hosts + iscsi_hosts) * luns_per_target), 1)
+    ports, sessions = build_fake_inventory(fc_hosts, iscsi_hosts, targets_per_host)
+    paths = build_paths(fc_hosts, iscsi_hosts, targets_per_host, luns_per_target)
+    with fake_inventory(ports, sessions):
+        for factory in (ConnectivityFactoryImpl(), CachedConnectivityFactoryImpl()):
+            start = time()
+            benchmark_connectivity(factory, paths)
+            print("{}: resolved the connectivity of {} paths in {:.3f}s".format(
+                factory.__class__.__name__, len(paths), time() - start))
+
+
+if __name__ == '__main__':
+    import sys
+    main(*[int(arg) for arg in sys.argv[1:]])
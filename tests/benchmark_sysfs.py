@@ -0,0 +1,58 @@
+"""Benchmarks the Linux sysfs discovery against a synthetic sysfs tree.
+
+Run directly to measure a 10k-device tree, and reading 1,000 multipath maps from device-mapper sysfs:
+
+    python tests/benchmark_sysfs.py [number_of_devices] [number_of_maps]
+"""
+from __future__ import print_function
+from time import time
+from fake_sysfs import build_fake_sysfs, build_fake_multipath_sysfs
+
+
+def benchmark_sysfs_populate(sysfs_root):
+    from infi.storagemodel.linux.sysfs import Sysfs
+    sysfs = Sysfs(sysfs_root)
+    sysfs.get_all_sg_disks()
+    return sysfs
+
+
+def benchmark_device_mapper_multipath(sysfs_root):
+    from infi.storagemodel.linux.sysfs import Sysfs
+    from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathModel, MULTIPATH_BACKEND_SYSFS
+    model = LinuxNativeMultipathModel(Sysfs(sysfs_root), backend=MULTIPATH_BACKEND_SYSFS)
+    model.get_all_multipath_block_devices()
+    return model
+
+
+def main(number_of_devices=10000, number_of_maps=1000):
+    start = time()
+    fake = build_fake_sysfs(number_of_devices)
+    print("built a fake sysfs tree with {} devices in {:.2f}s".format(number_of_devices, time() - start))
+    try:
+        start = time()
+        sysfs = benchmark_sysfs_populate(fake.root)
+        elapsed = time() - start
+        print("populated {} sd disks in {:.3f}s".format(len(sysfs.get_all_sd_disks()), elapsed))
+        start = time()
+        for disk in sysfs.get_all_sd_disks():
+            sysfs.find_scsi_disk_by_hctl(disk.get_hctl())
+        print("found every sd disk by its hctl in {:.3f}s".format(time() - start))
+    finally:
+        fake.cleanup()
+
+    start = time()
+    fake = build_fake_multipath_sysfs(number_of_maps)
+    print("built a fake sysfs tree with {} multipath maps in {:.2f}s".format(number_of_maps, time() - start))
+    try:
+        start = time()
+        model = benchmark_device_mapper_multipath(fake.root)
+        elapsed = time() - start
+        print("read {} multipath maps from device-mapper sysfs in {:.3f}s".format(
+            len(model.get_all_multipath_block_devices()), elapsed))
+    finally:
+        fake.cleanup()
+
+
+if __name__ == '__main__':
+    import sys
+    main(*[int(arg) for arg in sys.argv[1:]])
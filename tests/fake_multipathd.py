@@ -0,0 +1,86 @@
+"""A fake multipathd, listening on a unix socket in a temporary directory and speaking the multipathd protocol: each
+message, in both directions, is a native size_t length followed by the text."""
+import os
+import socket
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
+from infi.multipathtools.connection import MessageLength
+
+
+def _receive_exactly(connection, length):
+    data = b''
+    while len(data) < length:
+        chunk = connection.recv(length - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+class FakeMultipathd(object):
+    def __init__(self, responses):
+        super(FakeMultipathd, self).__init__()
+        self.responses = responses
+        self.commands = []
+        self.connection_count = 0
+        self._connections = []
+        self._directory = mkdtemp()
+        self.address = os.path.join(self._directory, "multipathd.sock")
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.address)
+        self._server.listen(16)
+        self._start(self._accept)
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except (socket.error, OSError):
+                return
+            self.connection_count += 1
+            self._connections.append(connection)
+            self._start(self._serve, connection)
+
+    def _serve(self, connection):
+        header_size = MessageLength.min_max_sizeof().max
+        try:
+            while True:
+                header = _receive_exactly(connection, header_size)
+                if header is None:
+                    return
+                message = _receive_exactly(connection, MessageLength.create_from_string(header).length)
+                if message is None:
+                    return
+                command = message.decode("ascii").strip("\x00\n")
+                self.commands.append(command)
+                response = (self.responses.get(command, "fail") + "\n").encode("ascii")
+                length = MessageLength()
+                length.length = len(response)
+                connection.sendall(MessageLength.write_to_string(length) + response)
+        except (socket.error, OSError):
+            return
+
+    def drop_connections(self):
+        """Closes the connections of the clients, like multipathd does when it restarts"""
+        while self._connections:
+            connection = self._connections.pop()
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except (socket.error, OSError):
+                pass
+            connection.close()
+
+    def close(self):
+        self.drop_connections()
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)
+        except (socket.error, OSError):
+            pass
+        self._server.close()
+        rmtree(self._directory, ignore_errors=True)
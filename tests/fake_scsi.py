@@ -0,0 +1,120 @@
+"""Fake SCSI devices that answer CDBs from canned buffers, for testing the inquiry mixins without real devices."""
+import struct
+import threading
+from contextlib import contextmanager
+from infi.storagemodel.base.inquiry import SCSICommandInformationMixin
+
+INQUIRY_OPCODE = 0x12
+TEST_UNIT_READY_OPCODE = 0x00
+
+ILLEGAL_REQUEST = 0x05
+UNIT_ATTENTION = 0x06
+INVALID_FIELD_IN_CDB = (0x24, 0x00)
+INQUIRY_DATA_HAS_CHANGED = (0x3f, 0x03)
+
+
+def standard_inquiry_buffer(vendor='NFINIDAT', product='InfiniBox', revision='0', device_type=0):
+    data = struct.pack('>BBBBB', device_type, 0, 6, 2, 91) + b'\x00' * 3
+    data += vendor.ljust(8).encode('ascii') + product.ljust(16).encode('ascii') + revision.ljust(4).encode('ascii')
+    return data.ljust(96, b'\x00')
+
+
+def vpd_page_buffer(page_code, payload, device_type=0):
+    return struct.pack('>BBH', device_type, page_code, len(payload)) + payload
+
+
+def supported_pages_buffer(page_codes):
+    return vpd_page_buffer(0x00, bytes(bytearray(sorted(set([0x00] + list(page_codes))))))
+
+
+def serial_number_buffer(serial):
+    payload = serial.encode('ascii')
+    return struct.pack('>BBBB', 0, 0x80, 0, len(payload)) + payload
+
+
+def fixed_sense_buffer(sense_key, additional_sense_code):
+    asc, ascq = additional_sense_code
+    return struct.pack('>BBBIB4xBB4x', 0x70, 0, sense_key, 0, 10, asc, ascq)
+
+
+def check_condition(sense_key, additional_sense_code):
+    from infi.asi import AsiCheckConditionError
+    from infi.asi.sense import get_sense_object_from_buffer
+    sense_buffer = fixed_sense_buffer(sense_key, additional_sense_code)
+    return AsiCheckConditionError(sense_buffer, get_sense_object_from_buffer(sense_buffer))
+
+
+def device_identification_buffer(naa_hex):
+    """a device identification page with a single logical unit NAA designator"""
+    naa = bytes(bytearray.fromhex(naa_hex))
+    designator = struct.pack('>BBBB', 0x01, 0x03, 0, len(naa)) + naa
+    return vpd_page_buffer(0x83, designator)
+
+
+class FakeSCSITarget(object):
+    """Holds the canned responses of a logical unit and counts the CDBs and opens it got"""
+
+    def __init__(self, serial='1234', naa_hex='6742b0f000004e4f0000000000000ace', pages=None, **standard_inquiry):
+        super(FakeSCSITarget, self).__init__()
+        self.standard_inquiry = standard_inquiry_buffer(**standard_inquiry)
+        self.pages = {0x80: serial_number_buffer(serial), 0x83: device_identification_buffer(naa_hex)}
+        self.pages.update(pages or {})
+        self.pages[0x00] = supported_pages_buffer(self.pages.keys())
+        self.cdbs = []
+        self.opens = 0
+        self.ready = True
+        self.check_conditions = {}  # page code (or None for the standard inquiry) -> (sense key, (asc, ascq))
+        self.test_unit_ready_check_condition = None
+        self._lock = threading.Lock()
+
+    def respond(self, cdb, max_response_length):
+        cdb = bytearray(cdb)
+        with self._lock:
+            self.cdbs.append(bytes(cdb))
+        if cdb[0] == INQUIRY_OPCODE and (cdb[2] if cdb[1] & 0x01 else None) in self.check_conditions:
+            raise check_condition(*self.check_conditions[cdb[2] if cdb[1] & 0x01 else None])
+        if cdb[0] == INQUIRY_OPCODE and cdb[1] & 0x01:
+            return self.pages[cdb[2]][:max_response_length]
+        if cdb[0] == INQUIRY_OPCODE:
+            return self.standard_inquiry[:max_response_length]
+        if cdb[0] == TEST_UNIT_READY_OPCODE and self.test_unit_ready_check_condition:
+            raise check_condition(*self.test_unit_ready_check_condition)
+        if cdb[0] == TEST_UNIT_READY_OPCODE:
+            return b''
+        raise NotImplementedError("CDB opcode 0x{:02x}".format(cdb[0]))
+
+    def count_cdbs(self, opcode=None, page_code=None):
+        return len([cdb for cdb in self.cdbs if (opcode is None or bytearray(cdb)[0] == opcode) and
+                    (page_code is None or (bytearray(cdb)[1] & 0x01 and bytearray(cdb)[2] == page_code))])
+
+
+class FakeExecuter(object):
+    def __init__(self, target):
+        super(FakeExecuter, self).__init__()
+        self.target = target
+
+    def call(self, command):
+        return self.target.respond(command.command, getattr(command, 'max_response_length', 0))
+
+
+class FakeSCSIDevice(SCSICommandInformationMixin):
+    def __init__(self, target=None, name='sg0', inquiry_cache_key=None):
+        super(FakeSCSIDevice, self).__init__()
+        self.target = target or FakeSCSITarget()
+        self.name = name
+        self.inquiry_cache_key = inquiry_cache_key
+
+    def _get_inquiry_cache_key(self):
+        return self.inquiry_cache_key
+
+    @contextmanager
+    def asi_context(self):
+        with self.target._lock:
+            self.target.opens += 1
+        yield FakeExecuter(self.target)
+
+    def get_display_name(self):
+        return self.name
+
+    def __repr__(self):
+        return "<FakeSCSIDevice {}>".format(self.name)
@@ -0,0 +1,197 @@
+"""Builds a fake sysfs tree in a temporary directory, laid out the way the Linux kernel lays out /sys.
+
+Tests point `infi.storagemodel.linux.sysfs.Sysfs(sysfs_root=...)` (and friends) at `FakeSysfs.root`.
+"""
+import os
+import shutil
+import tempfile
+
+SD_MAJOR = 8
+SG_MAJOR = 21
+DM_MAJOR = 253
+
+
+def sd_name_by_index(index):
+    """0 -> sda, 25 -> sdz, 26 -> sdaa, like the sd driver names its disks"""
+    name = ''
+    index += 1
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        name = chr(ord('a') + remainder) + name
+    return 'sd' + name
+
+
+class FakeSysfs(object):
+    def __init__(self):
+        super(FakeSysfs, self).__init__()
+        self.root = tempfile.mkdtemp(prefix='fake_sysfs_')
+        for dirname in ('class/scsi_device', 'class/scsi_generic', 'class/scsi_host', 'block', 'dev/block',
+                        'dev/char', 'devices/virtual/block'):
+            self._makedirs(dirname)
+
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _makedirs(self, relative_path):
+        path = self.path(relative_path)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        return path
+
+    def write(self, relative_path, content):
+        path = self.path(relative_path)
+        self._makedirs(os.path.dirname(relative_path))
+        with open(path, 'wb' if isinstance(content, bytes) else 'w') as fd:
+            fd.write(content)
+
+    def symlink(self, relative_link, relative_target):
+        link = self.path(relative_link)
+        self._makedirs(os.path.dirname(relative_link))
+        os.symlink(os.path.relpath(self.path(relative_target), os.path.dirname(link)), link)
+
+    def scsi_device_path(self, hctl):
+        host = hctl.split(':')[0]
+        target = hctl.rsplit(':', 1)[0]
+        return 'devices/pci0000:00/0000:00:15.0/host{}/target{}/{}'.format(host, target, hctl)
+
+    def add_scsi_host(self, host):
+        host_path = 'devices/pci0000:00/0000:00:15.0/host{}'.format(host)
+        self._makedirs(host_path + '/scsi_host/host{}'.format(host))
+        self.symlink('class/scsi_host/host{}'.format(host), host_path + '/scsi_host/host{}'.format(host))
+
+    def add_scsi_device(self, hctl, scsi_type=0, sg_name=None, sg_devno=None, sd_name=None, sd_devno=None,
+                        vendor='NFINIDAT', model='InfiniBox', rev='0', queue_depth=32, size=2097152, attributes=None):
+        """adds /sys/class/scsi_device/<hctl> and, optionally, its scsi_generic and sd children"""
+        device_path = self.scsi_device_path(hctl)
+        fields = dict(type=scsi_type, vendor=vendor, model=model, rev=rev, queue_depth=queue_depth, state='running')
+        fields.update(attributes or {})
+        for key, value in fields.items():
+            self.write('{}/{}'.format(device_path, key), value if isinstance(value, bytes) else str(value))
+        self._makedirs('{}/scsi_device/{}'.format(device_path, hctl))
+        self.symlink('{}/scsi_device/{}/device'.format(device_path, hctl), device_path)
+        self.symlink('class/scsi_device/{}'.format(hctl), '{}/scsi_device/{}'.format(device_path, hctl))
+        if sg_name is not None:
+            sg_path = '{}/scsi_generic/{}'.format(device_path, sg_name)
+            self.write(sg_path + '/dev', '{}:{}\n'.format(*sg_devno))
+            self.symlink(sg_path + '/device', device_path)
+            self.symlink('{}/generic'.format(device_path), sg_path)
+            self.symlink('class/scsi_generic/{}'.format(sg_name), sg_path)
+            self.symlink('dev/char/{}:{}'.format(*sg_devno), sg_path)
+        if sd_name is not None:
+            sd_path = '{}/block/{}'.format(device_path, sd_name)
+            self.add_block_device(sd_name, sd_devno, sd_path, size)
+            self.symlink(sd_path + '/device', device_path)
+        return device_path
+
+    def remove_scsi_device(self, hctl):
+        """removes what add_scsi_device added, like the kernel does when a device is deleted"""
+        device_path = self.scsi_device_path(hctl)
+        for directory in ('class/scsi_generic', 'block', 'dev/block', 'dev/char'):
+            for name in os.listdir(self.path(directory)):
+                link = self.path(directory, name)
+                if os.path.realpath(link).startswith(os.path.realpath(self.path(device_path)) + os.sep):
+                    os.remove(link)
+        os.remove(self.path('class/scsi_device', hctl))
+        shutil.rmtree(self.path(device_path))
+
+    def add_block_device(self, name, devno, device_path=None, size=2097152):
+        """adds /sys/block/<name> and /sys/dev/block/<devno>"""
+        device_path = device_path or 'devices/virtual/block/{}'.format(name)
+        self.write(device_path + '/dev', '{}:{}\n'.format(*devno))
+        self.write(device_path + '/size', '{}\n'.format(size))
+        self.write(device_path + '/stat', ' '.join(['0'] * 11) + '\n')
+        self.symlink('block/{}'.format(name), device_path)
+        self.symlink('dev/block/{}:{}'.format(*devno), device_path)
+        return device_path
+
+    def add_partition(self, disk_name, number, devno):
+        """adds a partition under the block device `disk_name`, which is in /sys/dev/block but not in /sys/block"""
+        disk_path = os.path.relpath(os.path.realpath(self.path('block', disk_name)), os.path.realpath(self.root))
+        # like the kernel names them: sda1, but nvme0n1p1
+        device_path = '{}/{}{}{}'.format(disk_path, disk_name, 'p' if disk_name[-1].isdigit() else '', number)
+        self.write(device_path + '/dev', '{}:{}\n'.format(*devno))
+        self.write(device_path + '/partition', '{}\n'.format(number))
+        self.symlink('dev/block/{}:{}'.format(*devno), device_path)
+        return device_path
+
+    def add_nvme_namespace(self, controller, namespace, devno):
+        """adds an NVMe namespace, whose sysfs parent is its controller and not a block directory"""
+        name = 'nvme{}n{}'.format(controller, namespace)
+        device_path = 'devices/pci0000:00/0000:00:1d.0/nvme/nvme{}/{}'.format(controller, name)
+        return self.add_block_device(name, devno, device_path)
+
+    def add_disk(self, index, hctl, **kwargs):
+        """adds a SCSI disk with an sd and an sg child, numbered by index"""
+        return self.add_scsi_device(hctl, scsi_type=0, sg_name='sg{}'.format(index), sg_devno=(SG_MAJOR, index),
+                                    sd_name=sd_name_by_index(index), sd_devno=(SD_MAJOR, index * 16), **kwargs)
+
+    def add_multipath_device(self, index, name, wwid, slaves):
+        """adds a device-mapper multipath map dm-<index> over the given sd block device names"""
+        device_path = self.add_block_device('dm-{}'.format(index), (DM_MAJOR, index))
+        self.write(device_path + '/dm/name', name + '\n')
+        self.write(device_path + '/dm/uuid', 'mpath-{}\n'.format(wwid))
+        self._makedirs(device_path + '/slaves')
+        for slave in slaves:
+            self.symlink('{}/slaves/{}'.format(device_path, slave), os.path.relpath(
+                os.path.realpath(self.path('block', slave)), os.path.realpath(self.root)))
+        return device_path
+
+    def add_fc_host(self, host, port_name):
+        host_path = 'devices/pci0000:00/0000:00:15.0/host{}'.format(host)
+        self.write(host_path + '/fc_host/host{}/port_name'.format(host), port_name + '\n')
+        self.symlink('class/fc_host/host{}'.format(host), host_path + '/fc_host/host{}'.format(host))
+
+    def add_fc_remote_port(self, host, channel, number, port_name, scsi_target_id):
+        name = 'rport-{}:{}-{}'.format(host, channel, number)
+        rport_path = 'devices/pci0000:00/0000:00:15.0/host{}/{}/fc_remote_ports/{}'.format(host, name, name)
+        self.write(rport_path + '/port_name', port_name + '\n')
+        self.write(rport_path + '/scsi_target_id', '{}\n'.format(scsi_target_id))
+        self.symlink('class/fc_remote_ports/{}'.format(name), rport_path)
+
+    def add_iscsi_session(self, host, session, target_name, initiator_name=None, targets=(0,)):
+        session_path = 'devices/platform/host{}/session{}'.format(host, session)
+        class_path = session_path + '/iscsi_session/session{}'.format(session)
+        self.write(class_path + '/targetname', target_name + '\n')
+        if initiator_name is not None:
+            self.write(class_path + '/initiatorname', initiator_name + '\n')
+        for target in targets:
+            self._makedirs(session_path + '/target{}:0:{}'.format(host, target))
+        self.symlink('class/iscsi_session/session{}'.format(session), class_path)
+
+    def add_controller(self, index, hctl, **kwargs):
+        return self.add_scsi_device(hctl, scsi_type=0x0C, sg_name='sg{}'.format(index),
+                                    sg_devno=(SG_MAJOR, index), **kwargs)
+
+
+def build_fake_sysfs(number_of_devices, luns_per_target=16, targets_per_host=32):
+    """Returns a `FakeSysfs` with number_of_devices SCSI disks spread across hosts and targets"""
+    fake = FakeSysfs()
+    for index in range(number_of_devices):
+        target_index, lun = divmod(index, luns_per_target)
+        host, target = divmod(target_index, targets_per_host)
+        fake.add_disk(index, '{}:0:{}:{}'.format(host, target, lun))
+    return fake
+
+
+def build_fake_multipath_sysfs(number_of_maps, paths_per_map=4):
+    """Returns a `FakeSysfs` with number_of_maps multipath maps, each over paths_per_map SCSI disks on as many
+    hosts"""
+    fake = FakeSysfs()
+    for index in range(number_of_maps):
+        target, lun = divmod(index, 256)
+        slaves = []
+        for host in range(paths_per_map):
+            disk_index = index * paths_per_map + host
+            fake.add_disk(disk_index, '{}:0:{}:{}'.format(host, target, lun))
+            slaves.append(sd_name_by_index(disk_index))
+        fake.add_multipath_device(index, 'mpath{}'.format(index), '36742b0f0000004d2{:015x}'.format(index), slaves)
+    return fake
@@ -0,0 +1,36 @@
+"""A fake kernel uevent source, for testing the uevent listener without root privileges or real devices."""
+import socket
+
+
+def format_uevent(action, devpath, subsystem, **environment):
+    """Returns the datagram the kernel sends for a uevent"""
+    fields = ['{}@{}'.format(action, devpath), 'ACTION={}'.format(action), 'DEVPATH={}'.format(devpath),
+              'SUBSYSTEM={}'.format(subsystem)]
+    fields.extend('{}={}'.format(key, value) for key, value in sorted(environment.items()))
+    return '\0'.join(fields).encode('ascii')
+
+
+class FakeUeventSource(object):
+    """Works like `infi.storagemodel.linux.uevent.NetlinkUeventSource`, but over a socket pair we write to"""
+
+    def __init__(self):
+        super(FakeUeventSource, self).__init__()
+        self._receiver, self._sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.closed = False
+
+    def send(self, action, devpath, subsystem, **environment):
+        self._sender.send(format_uevent(action, devpath, subsystem, **environment))
+
+    def send_raw(self, data):
+        self._sender.send(data)
+
+    def fileno(self):
+        return self._receiver.fileno()
+
+    def receive(self):
+        return self._receiver.recv(64 * 1024)
+
+    def close(self):
+        self.closed = True
+        self._receiver.close()
+        self._sender.close()
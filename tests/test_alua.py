@@ -0,0 +1,98 @@
+from unittest import TestCase, SkipTest
+from os import name
+from mock import patch
+from fake_sysfs import FakeSysfs, sd_name_by_index
+
+WWID = '36742b0f0000004d2000000000000b001'
+
+
+def device_identification_page(target_port_group):
+    # a single designator: binary code set, target port association, target port group type
+    return bytearray([0x00, 0x83, 0x00, 0x08, 0x01, 0x15, 0x00, 0x04, 0x00, 0x00, 0x00, target_port_group])
+
+
+class ALUATestCase(TestCase):
+    def setUp(self):
+        if name == "nt":
+            raise SkipTest
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+
+    def _get_device(self, *disks_attributes):
+        from infi.storagemodel.linux.sysfs import Sysfs
+        from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathModel, MULTIPATH_BACKEND_SYSFS
+        for index, attributes in enumerate(disks_attributes):
+            self.fake.add_disk(index, '{}:0:0:1'.format(index + 1), attributes=attributes)
+        self.fake.add_multipath_device(0, 'mpatha', WWID, [sd_name_by_index(index)
+                                                           for index in range(len(disks_attributes))])
+        model = LinuxNativeMultipathModel(Sysfs(self.fake.root), backend=MULTIPATH_BACKEND_SYSFS)
+        [device] = model.get_all_multipath_block_devices()
+        return device
+
+    def test_target_port_group_from_sysfs(self):
+        from infi.storagemodel.linux.native_multipath import LinuxPath
+        device = self._get_device(dict(vpd_pg83=bytes(device_identification_page(2))))
+        with patch.object(LinuxPath, "asi_context", side_effect=AssertionError("no CDBs should be sent")):
+            self.assertEqual(2, device.get_paths()[0].get_target_port_group())
+
+    def test_states_from_sysfs(self):
+        from infi.storagemodel.base.multipath import ALUAState
+        from infi.storagemodel.linux.native_multipath import LinuxPath
+        device = self._get_device(dict(access_state='active/optimized', preferred_path='1'),
+                                  dict(access_state='active/non-optimized', preferred_path='0'),
+                                  dict(access_state='standby', preferred_path='0'))
+        with patch.object(LinuxPath, "asi_context", side_effect=AssertionError("no CDBs should be sent")):
+            self.assertEqual({'sda': ALUAState.ACTIVE_OPTIMIZED, 'sdb': ALUAState.ACTIVE_NON_OPTIMIZED,
+                              'sdc': ALUAState.STANDBY}, device.get_alua_states())
+            self.assertEqual([True, False, False], [path.is_alua_preferred() for path in device.get_paths()])
+
+    def test_one_rtpg_per_logical_unit(self):
+        from infi.storagemodel.base.multipath import ALUAState
+        from infi.storagemodel.errors import DeviceError
+        from infi.storagemodel.linux.native_multipath import LinuxPath
+        device = self._get_device(None, None, None, None)
+        port_groups = {1: (ALUAState.ACTIVE_OPTIMIZED, True), 2: (ALUAState.ACTIVE_NON_OPTIMIZED, False)}
+        rtpg_paths = []
+
+        def get_target_port_groups(path):
+            rtpg_paths.append(path.get_path_id())
+            if path.get_path_id() == 'sda':
+                raise DeviceError("sda is gone")
+            return port_groups
+
+        with patch.object(LinuxPath, "get_target_port_groups", get_target_port_groups), \
+                patch.object(LinuxPath, "get_target_port_group", lambda path: path.get_hctl().get_host() % 2 + 1):
+            states = device.get_alua_states()
+        self.assertEqual({'sda': ALUAState.ACTIVE_NON_OPTIMIZED, 'sdb': ALUAState.ACTIVE_OPTIMIZED,
+                          'sdc': ALUAState.ACTIVE_NON_OPTIMIZED, 'sdd': ALUAState.ACTIVE_OPTIMIZED}, states)
+        self.assertEqual(['sda', 'sdb'], rtpg_paths)
+
+    def test_states_are_not_cached(self):
+        from infi.storagemodel.base.multipath import ALUAState
+        from infi.storagemodel.linux.native_multipath import LinuxPath
+        device = self._get_device(None, None)
+        port_groups = {1: (ALUAState.ACTIVE_OPTIMIZED, True)}
+        rtpg_paths = []
+
+        def get_target_port_groups(path):
+            rtpg_paths.append(path.get_path_id())
+            return dict(port_groups)
+
+        with patch.object(LinuxPath, "get_target_port_groups", get_target_port_groups), \
+                patch.object(LinuxPath, "get_target_port_group", lambda path: 1):
+            self.assertEqual({'sda': ALUAState.ACTIVE_OPTIMIZED, 'sdb': ALUAState.ACTIVE_OPTIMIZED},
+                             device.get_alua_states())
+            port_groups[1] = (ALUAState.STANDBY, False)
+            self.assertEqual({'sda': ALUAState.STANDBY, 'sdb': ALUAState.STANDBY}, device.get_alua_states())
+            self.assertEqual(['sda', 'sda'], rtpg_paths)
+            port_groups[1] = (ALUAState.UNAVAILABLE, False)
+            self.assertEqual(ALUAState.UNAVAILABLE, device.get_paths()[1].get_alua_state())
+
+    def test_no_target_port_group_designator(self):
+        from infi.storagemodel.linux.native_multipath import LinuxPath
+        from infi.storagemodel.errors import StorageModelError
+        # a single designator: binary code set, logical unit association, NAA (IEEE registered) type
+        page = bytearray([0x00, 0x83, 0x00, 0x0c, 0x01, 0x03, 0x00, 0x08, 0x57, 0x42, 0xb0, 0xf0, 0, 0, 0x04, 0xd2])
+        device = self._get_device(dict(vpd_pg83=bytes(page)))
+        with patch.object(LinuxPath, "asi_context", side_effect=AssertionError("no CDBs should be sent")):
+            self.assertRaises(StorageModelError, device.get_paths()[0].get_target_port_group)
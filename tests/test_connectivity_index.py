@@ -0,0 +1,118 @@
+from unittest import TestCase
+from mock import patch
+from infi.dtypes.wwn import WWN
+from infi.dtypes.iqn import IQN
+from benchmark_connectivity import build_fake_inventory, build_paths, fake_inventory, benchmark_connectivity
+
+
+class ConnectivityIndexTestCase(TestCase):
+    def setUp(self):
+        from infi.storagemodel.connectivity import CachedConnectivityFactoryImpl
+        self.ports, self.sessions = build_fake_inventory(fc_hosts=1, iscsi_hosts=1, targets_per_host=2)
+        self.paths = build_paths(fc_hosts=1, iscsi_hosts=1, targets_per_host=2, luns_per_target=3)
+        self.factory = CachedConnectivityFactoryImpl()
+
+    def test_connectivity(self):
+        from infi.storagemodel.connectivity import FCConnectivity, ISCSIConnectivity, LocalConnectivity
+        from infi.dtypes.hctl import HCTL
+        from benchmark_connectivity import Path
+        with fake_inventory(self.ports, self.sessions):
+            fc = self.factory.get_by_device_with_hctl(Path(HCTL(0, 0, 1, 2)))
+            iscsi = self.factory.get_by_device_with_hctl(Path(HCTL(1, 0, 1, 0)))
+            local = self.factory.get_by_device_with_hctl(Path(HCTL(2, 0, 0, 0)))
+        self.assertIsInstance(fc, FCConnectivity)
+        self.assertEqual(WWN("10:00:00:00:c9:00:00:00"), fc.get_initiator_wwn())
+        self.assertEqual(WWN("57:42:b0:f0:00:00:00:01"), fc.get_target_wwn())
+        self.assertIsInstance(iscsi, ISCSIConnectivity)
+        self.assertEqual(IQN("iqn.2009-11.com.infinidat:storage:infinibox-sn-1"), iscsi.get_target_iqn())
+        self.assertIsInstance(local, LocalConnectivity)
+
+    def test_index_is_built_once_and_shared(self):
+        from infi.pyutils.lazy import clear_cache
+        with fake_inventory(self.ports, self.sessions) as (get_ports_generator, get_iscsiapi):
+            connectivities = benchmark_connectivity(self.factory, self.paths)
+            self.assertEqual(1, get_ports_generator.call_count)
+            self.assertEqual(1, get_iscsiapi.call_count)
+            self.assertEqual(4, len(set(id(connectivity) for connectivity in connectivities)))
+            self.assertIs(connectivities[0], connectivities[2])
+            clear_cache(self.factory)
+            benchmark_connectivity(self.factory, self.paths)
+            self.assertEqual(2, get_ports_generator.call_count)
+
+    def test_uncached_factory_does_not_build_the_index(self):
+        from infi.dtypes.hctl import HCTL
+        from infi.storagemodel.connectivity import ConnectivityFactoryImpl, FCConnectivity
+        from benchmark_connectivity import Path
+        factory = ConnectivityFactoryImpl()
+        path = Path(HCTL(0, 0, 1, 2))
+        with fake_inventory(self.ports, self.sessions), \
+                patch.object(ConnectivityFactoryImpl, "get_connectivity_index") as get_connectivity_index:
+            connectivity = factory.get_by_device_with_hctl(path)
+        self.assertFalse(get_connectivity_index.called)
+        self.assertIsInstance(connectivity, FCConnectivity)
+        self.assertEqual(WWN("57:42:b0:f0:00:00:00:01"), connectivity.get_target_wwn())
+
+
+class LinuxSysfsConnectivityTestCase(TestCase):
+    def setUp(self):
+        from fake_sysfs import FakeSysfs
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        self.fake.add_fc_host(1, '0x10000000c9000001')
+        self.fake.add_fc_remote_port(1, 0, 0, '0x5742b0f000000101', 0)
+        self.fake.add_fc_remote_port(1, 0, 1, '0x5742b0f000000102', 1)
+        # a port that is not a SCSI target, e.g. the fabric controller
+        self.fake.add_fc_remote_port(1, 0, 2, '0x20fe000dec000000', -1)
+        self.fake.add_iscsi_session(3, 1, 'iqn.2009-11.com.infinidat:storage:infinibox-sn-1',
+                                    'iqn.1994-05.com.redhat:host')
+        self.fake.add_iscsi_session(4, 2, 'iqn.2009-11.com.infinidat:storage:infinibox-sn-2', targets=(0, 1))
+
+    def test_mappings(self):
+        from infi.storagemodel.linux.connectivity import get_fc_hctl_mappings, get_iscsi_hctl_mappings
+        self.assertEqual({(1, 0, 0): ('0x10000000c9000001', '0x5742b0f000000101'),
+                          (1, 0, 1): ('0x10000000c9000001', '0x5742b0f000000102')},
+                         get_fc_hctl_mappings(self.fake.root))
+        with patch("infi.storagemodel.linux.connectivity.ISCSI_INITIATOR_NAME_PATH", self.fake.path("missing")):
+            mappings = get_iscsi_hctl_mappings(self.fake.root)
+        target_1, target_2 = ['iqn.2009-11.com.infinidat:storage:infinibox-sn-{}'.format(sn) for sn in (1, 2)]
+        self.assertEqual({(3, 0, 0): ('iqn.1994-05.com.redhat:host', target_1),
+                          (4, 0, 0): (None, target_2),
+                          (4, 0, 1): (None, target_2)}, mappings)
+
+    def test_factory(self):
+        from infi.dtypes.hctl import HCTL
+        from infi.storagemodel.linux.connectivity import LinuxConnectivityFactoryImpl
+        from benchmark_connectivity import Path
+        factory = LinuxConnectivityFactoryImpl(self.fake.root)
+        with patch("infi.hbaapi.get_ports_generator") as get_ports_generator, \
+                patch("infi.iscsiapi.get_iscsiapi") as get_iscsiapi:
+            fc = factory.get_by_device_with_hctl(Path(HCTL(1, 0, 1, 5)))
+            iscsi = factory.get_by_device_with_hctl(Path(HCTL(3, 0, 0, 1)))
+        self.assertEqual(WWN("57:42:b0:f0:00:00:01:02"), fc.get_target_wwn())
+        self.assertEqual(IQN("iqn.2009-11.com.infinidat:storage:infinibox-sn-1"), iscsi.get_target_iqn())
+        self.assertFalse(get_ports_generator.called or get_iscsiapi.called)
+
+    def test_storage_model_selects_the_factory(self):
+        from infi.storagemodel.connectivity import ConnectivityFactory
+        from infi.storagemodel.linux import LinuxStorageModel
+        from infi.storagemodel.linux.connectivity import LinuxConnectivityFactoryImpl
+        # the global factory goes through infi.hbaapi and infi.iscsiapi, which infi.storagemodel.vmware patches
+        self.assertNotIsInstance(ConnectivityFactory, LinuxConnectivityFactoryImpl)
+        self.assertIsInstance(LinuxStorageModel().get_connectivity_factory(), LinuxConnectivityFactoryImpl)
+        model = LinuxStorageModel()
+        model.connectivity_backend = "hbaapi"
+        self.assertIs(ConnectivityFactory, model.get_connectivity_factory())
+
+    def test_devices_use_the_factory_of_their_model(self):
+        from infi.dtypes.hctl import HCTL
+        from infi.storagemodel.linux.connectivity import LinuxConnectivityFactoryImpl, LinuxConnectivityMixin
+
+        class Path(LinuxConnectivityMixin):
+            def get_hctl(self):
+                return HCTL(1, 0, 1, 5)
+
+        path = Path()
+        path._connectivity_factory = LinuxConnectivityFactoryImpl(self.fake.root)
+        with patch("infi.hbaapi.get_ports_generator") as get_ports_generator:
+            self.assertEqual(WWN("57:42:b0:f0:00:00:01:02"), path.get_connectivity().get_target_wwn())
+        self.assertFalse(get_ports_generator.called)
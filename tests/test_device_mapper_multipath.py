@@ -0,0 +1,49 @@
+from unittest import TestCase, SkipTest
+from os import name
+from fake_sysfs import FakeSysfs, build_fake_multipath_sysfs
+
+
+class DeviceMapperMultipathTestCase(TestCase):
+    def setUp(self):
+        if name == "nt":
+            raise SkipTest
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        for index, hctl in enumerate(['1:0:0:1', '2:0:0:1', '1:0:0:2', '2:0:0:2']):
+            self.fake.add_disk(index, hctl)
+        self.fake.add_multipath_device(0, 'mpatha', '36742b0f0000004d2000000000000b001', ['sda', 'sdb'])
+        self.fake.add_multipath_device(1, 'mpathb', '36742b0f0000004d2000000000000b002', ['sdc', 'sdd'])
+        # an LVM volume is a device-mapper device too, but not a multipath map
+        self.fake.add_block_device('dm-2', (253, 2))
+        self.fake.write('devices/virtual/block/dm-2/dm/name', 'vg-lv\n')
+        self.fake.write('devices/virtual/block/dm-2/dm/uuid', 'LVM-abcdef\n')
+
+    def _get_model(self):
+        from infi.storagemodel.linux.sysfs import Sysfs
+        from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathModel, MULTIPATH_BACKEND_SYSFS
+        return LinuxNativeMultipathModel(Sysfs(self.fake.root), backend=MULTIPATH_BACKEND_SYSFS)
+
+    def test_maps_and_path_states(self):
+        self.fake.write(self.fake.scsi_device_path('2:0:0:1') + '/state', 'offline\n')
+        devices = self._get_model().get_all_multipath_block_devices()
+        self.assertEqual(["/dev/mapper/mpatha", "/dev/mapper/mpathb"],
+                         [device.get_block_access_path() for device in devices])
+        self.assertEqual([("sda", "1:0:0:1", "up"), ("sdb", "2:0:0:1", "down")],
+                         [(path.get_path_id(), str(path.get_hctl()), path.get_state())
+                          for path in devices[0].get_paths()])
+        self.assertEqual((253, 0), devices[0].sysfs_device.get_block_devno())
+
+    def test_map_without_running_paths_is_skipped(self):
+        for hctl in ['1:0:0:2', '2:0:0:2']:
+            self.fake.write(self.fake.scsi_device_path(hctl) + '/state', 'transport-offline\n')
+        model = self._get_model()
+        self.assertEqual(["mpatha"], [device.get_display_name() for device in model.get_all_multipath_block_devices()])
+        self.assertRaises(KeyError, model.find_multipath_device_by_block_access_path, "/dev/mapper/mpathb")
+
+    def test_benchmark_small(self):
+        from benchmark_sysfs import benchmark_device_mapper_multipath
+        fake = build_fake_multipath_sysfs(20)
+        self.addCleanup(fake.cleanup)
+        model = benchmark_device_mapper_multipath(fake.root)
+        self.assertEqual(20, len(model.get_all_multipath_block_devices()))
+        self.assertEqual(set([4]), set(len(device.get_paths()) for device in model.get_all_multipath_block_devices()))
@@ -0,0 +1,44 @@
+from unittest import TestCase
+from mock import patch
+from fake_sysfs import FakeSysfs
+
+DISKSTATS = """\
+   8       0 sda 100 5 800 40 200 10 1600 80 0 120 130
+   8       1 sda1 4 0 32 8
+   8      16 sdb 300 0 2400 90 400 0 3200 100 2 210 190 0 0 0 0 5 6
+   8      32 sdc 1 0 8 1 1 0 8 1 0 2 2
+ 253       0 dm-0 400 0 3200 130 600 0 4800 180 2 320 330 0 0 0 0
+"""
+
+
+class DiskstatsTestCase(TestCase):
+    def setUp(self):
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        self.fake.write('diskstats', DISKSTATS)
+        patcher = patch("infi.storagemodel.linux.diskstats.PROC_DISKSTATS_PATH", self.fake.path('diskstats'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_stats(self, statistics):
+        return (statistics.bytes_read, statistics.bytes_written, statistics.read_io_count,
+                statistics.write_io_count, statistics.in_flight, statistics.io_ticks, statistics.time_in_queue)
+
+    def test_get_diskstats(self):
+        from infi.storagemodel.linux.diskstats import get_diskstats
+        diskstats = get_diskstats(self.fake.path('diskstats'))
+        self.assertEqual(set(["sda", "sdb", "sdc", "dm-0"]), set(diskstats))
+        self.assertEqual((800 * 512, 1600 * 512, 100, 200, 0, 120, 130), self._get_stats(diskstats["sda"]))
+        self.assertEqual((2400 * 512, 3200 * 512, 300, 400, 2, 210, 190), self._get_stats(diskstats["sdb"]))
+
+    def test_io_statistics_for_all_paths(self):
+        from infi.storagemodel.linux.sysfs import Sysfs
+        from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathModel, MULTIPATH_BACKEND_SYSFS
+        self.fake.add_disk(0, '1:0:0:1')
+        self.fake.add_disk(1, '2:0:0:1')
+        self.fake.add_disk(2, '3:0:0:1')
+        self.fake.add_multipath_device(0, 'mpatha', '36742b0f0000004d2000000000000b001', ['sda', 'sdb'])
+        model = LinuxNativeMultipathModel(Sysfs(self.fake.root), backend=MULTIPATH_BACKEND_SYSFS)
+        statistics = model.get_io_statistics_for_all_paths()
+        self.assertEqual(set(["sda", "sdb", "dm-0"]), set(statistics))
+        self.assertEqual((3200 * 512, 4800 * 512, 400, 600, 2, 320, 330), self._get_stats(statistics["dm-0"]))
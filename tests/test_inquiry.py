@@ -0,0 +1,97 @@
+from unittest import TestCase
+from infi.storagemodel.base.scsi import SCSIModel
+from infi.storagemodel.base.gevent_wrapper import run_concurrently
+from fake_scsi import FakeSCSIDevice, FakeSCSITarget, vpd_page_buffer, INQUIRY_OPCODE
+from fake_scsi import ILLEGAL_REQUEST, INVALID_FIELD_IN_CDB
+
+
+class PrefetchInquiryTestCase(TestCase):
+    def _get_devices(self, count=10):
+        return [FakeSCSIDevice(FakeSCSITarget(serial='serial{}'.format(index)), 'sg{}'.format(index))
+                for index in range(count)]
+
+    def test_prefetch_fills_caches(self):
+        devices = self._get_devices()
+        SCSIModel().prefetch_inquiry(devices, pages=(0x00, 0x80, 0x83))
+        sent = [device.target.count_cdbs() for device in devices]
+        self.assertEqual([5] * len(devices), sent)
+        for index, device in enumerate(devices):
+            self.assertEqual('serial{}'.format(index), device.get_scsi_serial_number())
+            self.assertEqual('NFINIDAT', device.get_scsi_vendor_id())
+            device.get_scsi_inquiry_pages()[0x83]
+        self.assertEqual(sent, [device.target.count_cdbs() for device in devices])
+
+    def test_unsupported_pages_are_skipped(self):
+        [device] = self._get_devices(1)
+        SCSIModel().prefetch_inquiry([device, device], pages=(0x80, 0xc6))
+        self.assertEqual(0, device.target.count_cdbs(INQUIRY_OPCODE, 0xc6))
+        self.assertEqual(1, device.target.count_cdbs(INQUIRY_OPCODE, 0x80))
+
+    def test_errors_are_not_raised(self):
+        broken, device = self._get_devices(2)
+        del broken.target.pages[0x83]
+        SCSIModel().prefetch_inquiry([broken, device], concurrency=1)
+        self.assertEqual('serial1', device.get_scsi_serial_number())
+
+
+class FetchManyTestCase(TestCase):
+    def setUp(self):
+        vendor_pages = dict((page_code, vpd_page_buffer(page_code, b'{}')) for page_code in range(0xc5, 0xcd))
+        self.device = FakeSCSIDevice(FakeSCSITarget(pages=vendor_pages))
+
+    def test_single_open(self):
+        inquiry_pages = self.device.get_scsi_inquiry_pages()
+        inquiry_pages.fetch_many([0x83] + list(range(0xc5, 0xcd)) + [0xf0])
+        self.assertEqual(2, self.device.target.opens)
+        self.assertEqual(10, self.device.target.count_cdbs())
+        for page_code in range(0xc5, 0xcd):
+            self.assertEqual(page_code, inquiry_pages[page_code].page_code)
+        inquiry_pages.fetch_many([0x83, 0xc5])
+        self.assertEqual(2, self.device.target.opens)
+        self.assertEqual(10, self.device.target.count_cdbs())
+
+    def test_check_condition_leaves_page_unfetched(self):
+        from infi.asi import AsiCheckConditionError
+        self.device.target.check_conditions[0xc6] = (ILLEGAL_REQUEST, INVALID_FIELD_IN_CDB)
+        inquiry_pages = self.device.get_scsi_inquiry_pages()
+        inquiry_pages.fetch_many([0xc5, 0xc6, 0xc7])
+        self.assertEqual(0xc7, inquiry_pages[0xc7].page_code)
+        with self.assertRaises(AsiCheckConditionError):
+            inquiry_pages[0xc6]
+
+
+class InfiniBoxInquiryPagesTestCase(TestCase):
+    def setUp(self):
+        from infi.storagemodel.vendor.infinidat.infinibox.mixin.inquiry import InfiniBoxInquiryMixin
+        vendor_pages = dict((page_code, vpd_page_buffer(page_code, b'{}')) for page_code in range(0xc5, 0xcd))
+        self.target = FakeSCSITarget(pages=vendor_pages)
+        self.mixin = InfiniBoxInquiryMixin()
+        self.mixin.device = FakeSCSIDevice(self.target)
+
+    def test_single_page_sends_one_inquiry(self):
+        self.mixin.get_device_identification_page()
+        self.assertEqual(1, self.target.count_cdbs(INQUIRY_OPCODE, 0x83))
+        self.assertEqual(0, self.target.count_cdbs(INQUIRY_OPCODE, 0xc5))
+
+    def test_second_page_fetches_the_rest(self):
+        self.mixin.get_device_identification_page()
+        self.mixin.get_json_data(0xc5)
+        opens = self.target.opens
+        for page_code in range(0xc6, 0xcd):
+            self.mixin.get_json_data(page_code)
+        self.assertEqual(opens, self.target.opens)
+        self.assertEqual([1] * 9, [self.target.count_cdbs(INQUIRY_OPCODE, page_code)
+                                   for page_code in [0x83] + list(range(0xc5, 0xcd))])
+
+
+class RunConcurrentlyTestCase(TestCase):
+    def test_results_are_ordered(self):
+        self.assertEqual(list(range(20)), run_concurrently([lambda index=index: index for index in range(20)], 3))
+
+    def test_first_error_is_raised(self):
+        def fail():
+            raise KeyError()
+        calls = []
+        with self.assertRaises(KeyError):
+            run_concurrently([fail, lambda: calls.append(1)], 1)
+        self.assertEqual([1], calls)
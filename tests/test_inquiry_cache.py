@@ -0,0 +1,86 @@
+from unittest import TestCase, SkipTest
+from os import name, path
+from shutil import rmtree
+from tempfile import mkdtemp
+from infi.storagemodel.base.inquiry_cache import enable_persistent_inquiry_cache, disable_persistent_inquiry_cache
+from fake_scsi import FakeSCSIDevice, FakeSCSITarget, UNIT_ATTENTION, INQUIRY_DATA_HAS_CHANGED
+from fake_sysfs import FakeSysfs
+
+KEY = ('21:0/1:0:0:0/naa.6742b0f000004e4f0000000000000ace', '1.0,1.0,1.0')
+
+
+class PersistentInquiryCacheTestCase(TestCase):
+    def setUp(self):
+        self.dirname = mkdtemp()
+        self.addCleanup(rmtree, self.dirname, True)
+        self.addCleanup(disable_persistent_inquiry_cache)
+        self.cache = enable_persistent_inquiry_cache(path.join(self.dirname, 'cache', 'inquiry.sqlite'))
+
+    def _restart(self):
+        disable_persistent_inquiry_cache()
+        self.cache = enable_persistent_inquiry_cache(path.join(self.dirname, 'cache', 'inquiry.sqlite'))
+
+    def _read_everything(self, device):
+        return (device.get_scsi_vid_pid(), device.get_scsi_serial_number(),
+                device.get_scsi_inquiry_pages()[0x83].designators_list[0].pack())
+
+    def test_cold_start_sends_no_cdbs(self):
+        device = FakeSCSIDevice(inquiry_cache_key=KEY)
+        expected = self._read_everything(device)
+        self._restart()
+        self.assertEqual(1, len(self.cache))
+        device = FakeSCSIDevice(inquiry_cache_key=KEY)
+        self.assertEqual(expected, self._read_everything(device))
+        self.assertEqual(0, device.target.count_cdbs())
+
+    def test_generation_change(self):
+        self._read_everything(FakeSCSIDevice(inquiry_cache_key=KEY))
+        device = FakeSCSIDevice(FakeSCSITarget(serial='other'), inquiry_cache_key=(KEY[0], '2.0,2.0,2.0'))
+        self.assertEqual('other', device.get_scsi_serial_number())
+        self.assertEqual(2, device.target.count_cdbs())
+
+    def test_devices_without_key_are_not_cached(self):
+        self._read_everything(FakeSCSIDevice())
+        self.assertEqual(0, len(self.cache))
+
+    def test_inquiry_data_has_changed(self):
+        from infi.storagemodel.errors import RescanIsNeeded
+        device = FakeSCSIDevice(inquiry_cache_key=KEY)
+        self._read_everything(device)
+        device.target.test_unit_ready_check_condition = (UNIT_ATTENTION, INQUIRY_DATA_HAS_CHANGED)
+        with self.assertRaises(RescanIsNeeded):
+            device.get_scsi_test_unit_ready()
+        self.assertEqual(0, len(self.cache))
+        self._read_everything(FakeSCSIDevice(device.target, inquiry_cache_key=KEY))
+        device.target.check_conditions[None] = (UNIT_ATTENTION, INQUIRY_DATA_HAS_CHANGED)
+        with self.assertRaises(RescanIsNeeded):
+            FakeSCSIDevice(device.target, inquiry_cache_key=('other', '')).get_scsi_standard_inquiry()
+        self.assertEqual(1, len(self.cache))
+
+
+class LinuxInquiryCacheKeyTestCase(TestCase):
+    def test_key(self):
+        from infi.storagemodel.linux.sysfs import Sysfs
+        from infi.storagemodel.linux.scsi import LinuxSCSIBlockDevice
+        if name == "nt":
+            raise SkipTest
+        fake = FakeSysfs()
+        self.addCleanup(fake.cleanup)
+        fake.add_disk(3, '1:0:2:3', attributes=dict(wwid='naa.6742b0f000004e4f0000000000000ace', inquiry=b'\x00',
+                                                    vpd_pg83=b'\x00'))
+        [sysfs_device] = Sysfs(fake.root).get_all_sd_disks()
+        identity, generation = LinuxSCSIBlockDevice(sysfs_device)._get_inquiry_cache_key()
+        self.assertEqual('21:3/1:0:2:3/naa.6742b0f000004e4f0000000000000ace', identity)
+        self.assertEqual(3, len(generation.split(',')))
+        self.assertEqual('', generation.split(',')[1])
+
+    def test_no_key_without_wwid_and_inquiry_attributes(self):
+        from infi.storagemodel.linux.sysfs import Sysfs
+        from infi.storagemodel.linux.scsi import LinuxSCSIBlockDevice
+        if name == "nt":
+            raise SkipTest
+        fake = FakeSysfs()
+        self.addCleanup(fake.cleanup)
+        fake.add_disk(3, '1:0:2:3')
+        [sysfs_device] = Sysfs(fake.root).get_all_sd_disks()
+        self.assertIsNone(LinuxSCSIBlockDevice(sysfs_device)._get_inquiry_cache_key())
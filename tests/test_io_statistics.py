@@ -0,0 +1,80 @@
+from unittest import TestCase
+from infi.storagemodel.base.multipath import PathStatistics
+from infi.storagemodel.base.io_statistics import IOStatisticsSampler
+
+
+def statistics(ios, io_time=None, io_ticks=None):
+    # every I/O reads or writes 4KB
+    return PathStatistics(ios * 4096, ios * 4096, ios, ios, 0, io_ticks, None, io_time, io_time)
+
+
+class IOStatisticsSamplerTestCase(TestCase):
+    def test_rates(self):
+        sampler = IOStatisticsSampler(None, capacity=4)
+        for second in range(6):
+            sampler.add_sample({"sda": statistics(100 * second, 200 * second, 500 * second),
+                                "sdb": statistics(10 * second)}, timestamp=second)
+        rates = sampler.get_rates("sda", window=2)
+        self.assertEqual((100, 100, 409600, 409600, 2.0, 0.5), tuple(rates))
+        self.assertEqual((10, 10, 40960, 40960, None, None), tuple(sampler.get_rates("sdb", window=60)))
+        lun_rates = sampler.get_lun_rates(["sda", "sdb"], window=2)
+        self.assertEqual((110, 110, 0.5), (lun_rates.read_iops, lun_rates.write_iops, lun_rates.utilization))
+        self.assertEqual(set(["sda", "sdb"]), set(sampler.get_all_rates(window=1)))
+
+    def test_not_enough_samples_and_counter_reset(self):
+        sampler = IOStatisticsSampler(None, capacity=4)
+        sampler.add_sample({"sda": statistics(100)}, timestamp=0)
+        self.assertEqual(None, sampler.get_rates("sda", window=10))
+        sampler.add_sample({"sda": statistics(10)}, timestamp=1)
+        self.assertEqual(None, sampler.get_rates("sda", window=10))
+        self.assertEqual({}, sampler.get_all_rates(window=10))
+
+    def test_memory_is_bounded(self):
+        sampler = IOStatisticsSampler(None, capacity=3)
+        sampler.add_sample({"sda": statistics(1), "sdb": statistics(1)}, timestamp=0)
+        for second in range(1, 10):
+            sampler.add_sample({"sda": statistics(second)}, timestamp=second)
+        self.assertEqual(["sda"], sampler.get_names())
+        self.assertEqual(3 * 7, len(sampler._buffers["sda"]))
+        self.assertEqual(1, sampler.get_rates("sda", window=60).read_iops)
+
+    def test_start(self):
+        from infi.storagemodel.base.gevent_wrapper import sleep
+        samples = []
+
+        def get_statistics():
+            samples.append(len(samples))
+            return {"sda": statistics(len(samples))}
+
+        sampler = IOStatisticsSampler(get_statistics)
+        sampler.start(interval=0.01)
+        sleep(0.1)
+        sampler.stop()
+        sleep(0.05)
+        count = len(samples)
+        self.assertGreater(count, 2)
+        sleep(0.05)
+        self.assertEqual(count, len(samples))
+        self.assertNotEqual(None, sampler.get_rates("sda", window=60))
+
+    def test_rates_are_not_read_during_a_sample(self):
+        from infi.storagemodel.base.gevent_wrapper import spawn, sleep, Event
+        sampler = IOStatisticsSampler(None, capacity=4)
+        sampler.add_sample({"sda": statistics(0)}, timestamp=0)
+        storing, stored = Event(), Event()
+
+        class Statistics(dict):
+            def items(self):
+                storing.set()
+                stored.wait()
+                return super(Statistics, self).items()
+
+        spawn(sampler.add_sample, Statistics(sda=statistics(100)), timestamp=1)
+        storing.wait()
+        rates = []
+        reader = spawn(lambda: rates.append(sampler.get_all_rates(window=60)))
+        sleep(0.05)
+        self.assertEqual([], rates)
+        stored.set()
+        reader.join()
+        self.assertEqual(100, rates[0]["sda"].read_iops)
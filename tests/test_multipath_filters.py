@@ -0,0 +1,43 @@
+from unittest import TestCase
+from infi.dtypes.hctl import HCTL
+from infi.storagemodel.base.multipath import MultipathFrameworkModel
+
+
+class Device(object):
+    def __init__(self, hctl, paths=()):
+        self.hctl = hctl
+        self.paths = [Device(path) for path in paths]
+
+    def get_hctl(self):
+        return self.hctl
+
+    def get_paths(self):
+        return self.paths
+
+
+class FakeMultipathModel(MultipathFrameworkModel):
+    def __init__(self, block_devices, controllers):
+        self.block_devices = block_devices
+        self.controllers = controllers
+        self.listings = 0
+
+    def get_all_multipath_block_devices(self):
+        self.listings += 1
+        return self.block_devices
+
+    def get_all_multipath_storage_controller_devices(self):
+        return self.controllers
+
+
+class FilterNonMultipathTestCase(TestCase):
+    def test_filter(self):
+        model = FakeMultipathModel([Device(None, [HCTL(1, 0, 0, 1), HCTL(2, 0, 0, 1)])],
+                                   [Device(None, [HCTL(1, 0, 0, 0)])])
+        scsi_block_devices = [Device(HCTL(host, 0, 0, 1)) for host in range(1, 4)]
+        scsi_controllers = [Device(HCTL(host, 0, 0, 0)) for host in range(1, 4)]
+        self.assertEqual(frozenset([HCTL(1, 0, 0, 1), HCTL(2, 0, 0, 1)]), model.get_claimed_hctls())
+        self.assertEqual(scsi_block_devices[2:], model.filter_non_multipath_scsi_block_devices(scsi_block_devices))
+        self.assertEqual(scsi_controllers[1:],
+                         model.filter_non_multipath_scsi_storage_controller_devices(scsi_controllers))
+        model.filter_non_multipath_scsi_block_devices(scsi_block_devices)
+        self.assertEqual(1, model.listings)
@@ -0,0 +1,122 @@
+from unittest import TestCase
+from mock import patch
+from infi.storagemodel.linux.multipathd import PooledMultipathClient
+from infi.storagemodel.linux.multipathd import MAPS_SIGNATURE_COMMAND, PATHS_SIGNATURE_COMMAND
+from fake_multipathd import FakeMultipathd
+
+
+class PooledMultipathClientTestCase(TestCase):
+    def setUp(self):
+        self.multipathd = FakeMultipathd({"reconfigure": "ok",
+                                          MAPS_SIGNATURE_COMMAND: "wwid1 mpatha dm-0 2 active 0",
+                                          PATHS_SIGNATURE_COMMAND: "wwid1 1:0:0:1 sdb 8:16 active ready running 50",
+                                          "show multipaths topology": "topology",
+                                          "show paths": "paths"})
+        self.addCleanup(self.multipathd.close)
+        self.client = PooledMultipathClient(timeout=5, address=self.multipathd.address)
+        self.addCleanup(self.client.close)
+
+    def test_connection_is_reused(self):
+        self.assertTrue(self.client.is_running())
+        for _ in range(3):
+            self.client.rescan()
+        self.assertEqual(["reconfigure"] * 3, self.multipathd.commands)
+        self.assertEqual(1, self.multipathd.connection_count)
+
+    def test_reconnect(self):
+        self.client.rescan()
+        self.multipathd.drop_connections()
+        self.client.rescan()
+        self.assertTrue(self.client.is_running())
+        self.assertEqual(["reconfigure"] * 2, self.multipathd.commands)
+        self.assertEqual(2, self.multipathd.connection_count)
+
+    def test_not_running(self):
+        from infi.multipathtools.errors import ConnectionError
+        self.multipathd.close()
+        self.client.close()
+        self.assertFalse(self.client.is_running())
+        self.assertRaises(ConnectionError, self.client.rescan)
+
+    def test_poll_changed_maps(self):
+        def parse(maps_topology, paths_table):
+            return [(maps_topology, paths_table)]
+
+        with patch("infi.multipathtools.model.get_list_of_multipath_devices_from_multipathd_output", new=parse):
+            self.assertEqual([("topology", "paths")], self.client.poll_list_of_multipath_devices())
+            self.assertEqual([("topology", "paths")], self.client.poll_list_of_multipath_devices())
+            self.assertEqual(1, self.multipathd.commands.count("show multipaths topology"))
+            self.multipathd.responses[PATHS_SIGNATURE_COMMAND] = "wwid1 1:0:0:1 sdb 8:16 failed faulty running 50"
+            self.multipathd.responses["show paths"] = "failed paths"
+            self.assertEqual([("topology", "failed paths")], self.client.poll_list_of_multipath_devices())
+            self.assertEqual(2, self.multipathd.commands.count("show multipaths topology"))
+        self.assertEqual(1, self.multipathd.connection_count)
+
+    def test_poll_priority_change(self):
+        def parse(maps_topology, paths_table):
+            return [(maps_topology, paths_table)]
+
+        self.assertIn("%p", PATHS_SIGNATURE_COMMAND)
+        with patch("infi.multipathtools.model.get_list_of_multipath_devices_from_multipathd_output", new=parse):
+            self.client.poll_list_of_multipath_devices()
+            # an ALUA transition: the path stays active and ready, only its priority changes
+            self.multipathd.responses[PATHS_SIGNATURE_COMMAND] = "wwid1 1:0:0:1 sdb 8:16 active ready running 10"
+            self.multipathd.responses["show paths"] = "paths with priority 10"
+            self.assertEqual([("topology", "paths with priority 10")], self.client.poll_list_of_multipath_devices())
+            self.assertEqual(2, self.multipathd.commands.count("show multipaths topology"))
+
+
+class StorageModelMultipathdClientTestCase(TestCase):
+    def test_client_is_kept_across_refresh(self):
+        from infi.storagemodel.linux import LinuxStorageModel
+        model = LinuxStorageModel()
+        client = model.get_multipathd_client()
+        model.refresh()
+        self.assertIs(client, model.get_multipathd_client())
+
+
+MAP_TOPOLOGY = """mpatha (36742b0f0000004d2000000000000b001) dm-0 NFINIDAT,InfiniBox
+size=1.0G features='0' hwhandler='1 alua' wp=rw
+`-+- policy='service-time 0' prio=50 status=active
+  |- 1:0:0:1 sda 8:0  active ready running
+  `- 2:0:0:1 sdb 8:16 failed faulty running"""
+
+
+class MultipathMapLookupTestCase(TestCase):
+    def setUp(self):
+        from mock import mock_open
+        from fake_sysfs import FakeSysfs
+        from infi.storagemodel.linux.sysfs import Sysfs
+        self.multipathd = FakeMultipathd({"show map mpatha topology": MAP_TOPOLOGY})
+        self.addCleanup(self.multipathd.close)
+        self.client = PooledMultipathClient(timeout=5, address=self.multipathd.address)
+        self.addCleanup(self.client.close)
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        self.fake.add_disk(0, '1:0:0:1')
+        self.fake.add_disk(1, '2:0:0:1')
+        self.fake.add_block_device('dm-0', (253, 0))
+        self.sysfs = Sysfs(self.fake.root)
+        # MultipathDevice reads the devno of the map from the real /sys/block
+        patcher = patch("infi.multipathtools.dtypes.open", mock_open(read_data="253:0\n"), create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_topology_without_paths_table(self):
+        from infi.storagemodel.linux.multipathd import get_list_of_multipath_devices_from_topology
+        [device] = get_list_of_multipath_devices_from_topology(MAP_TOPOLOGY)
+        self.assertEqual(("36742b0f0000004d2000000000000b001", "mpatha", "dm-0", (253, 0)),
+                         (device.id, device.device_name, device.dm_name, device.major_minor))
+        [group] = device.path_groups
+        self.assertEqual([("sda", (8, 0), "active", 50, (1, 0, 0, 1)), ("sdb", (8, 16), "failed", 50, (2, 0, 0, 1))],
+                         [(path.device_name, path.major_minor, path.state, path.priority, path.hctl)
+                          for path in group.paths])
+
+    def test_find_by_block_access_path(self):
+        from infi.storagemodel.linux.native_multipath import LinuxNativeMultipathModel
+        model = LinuxNativeMultipathModel(self.sysfs, self.client)
+        device = model.find_multipath_device_by_block_access_path("/dev/mapper/mpatha")
+        self.assertEqual(["up", "down"], [path.get_state() for path in device.get_paths()])
+        self.assertIs(device, model.find_multipath_device_by_block_access_path("/dev/mapper/mpatha"))
+        self.assertRaises(KeyError, model.find_multipath_device_by_block_access_path, "/dev/mapper/mpathb")
+        self.assertEqual(["show map mpatha topology", "show map mpathb topology"], self.multipathd.commands)
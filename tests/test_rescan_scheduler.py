@@ -0,0 +1,110 @@
+from unittest import TestCase
+from mock import patch
+from infi.storagemodel.base.gevent_wrapper import sleep
+from infi.storagemodel.linux.rescan_scsi_bus import logic
+from infi.storagemodel.linux.rescan_scsi_bus.report import TargetScanReport
+
+
+class ScanTargetsTestCase(TestCase):
+    def setUp(self):
+        self.running = dict()
+        self.max_running = dict()
+        self.timeouts = set()
+
+    def _block_target_scan(self, host, channel, target, timeout, topology):
+        self.timeouts.add(timeout)
+        self.running[host] = self.running.get(host, 0) + 1
+        self.max_running[host] = max(self.max_running.get(host, 0), self.running[host])
+        self.max_running['total'] = max(self.max_running.get('total', 0), sum(self.running.values()))
+        try:
+            sleep(0.01)
+        finally:
+            self.running[host] -= 1
+        if target == 13:
+            return TargetScanReport(host, channel, target, error="Timeout()")
+        report = TargetScanReport(host, channel, target)
+        report.added.add(target)
+        if target == 0:
+            report.failed.add(5)
+        return report
+
+    def _scan_targets(self, targets, **kwargs):
+        with patch.object(logic, 'block_target_scan', new=self._block_target_scan):
+            return logic.scan_targets(targets, 7, **kwargs)
+
+    def test_concurrency_limits(self):
+        targets = [(host, 0, target) for host in (1, 2, 3) for target in range(10)]
+        report = self._scan_targets(targets, concurrency=6, concurrency_per_host=2)
+        self.assertEqual(6, self.max_running['total'])
+        self.assertEqual(2, max(self.max_running[host] for host in (1, 2, 3)))
+        self.assertEqual(set([7]), self.timeouts)
+        self.assertEqual(30, len(report.targets))
+        self.assertEqual(sorted(targets), sorted((item.host, item.channel, item.target) for item in report.targets))
+
+    def test_report(self):
+        report = self._scan_targets([(1, 0, 0), (1, 0, 1), (2, 0, 13)])
+        self.assertEqual(['1:0:0:0', '1:0:1:1'], report.get_added())
+        self.assertEqual([], report.get_removed())
+        self.assertEqual(['1:0:0:5'], report.get_failed())
+        [failed_target] = report.get_failed_targets()
+        self.assertEqual((2, 0, 13, 'Timeout()'), (failed_target.host, failed_target.channel, failed_target.target,
+                                                   failed_target.error))
+        self.assertIn("failed=['1:0:0:5']", repr(report))
+
+    def test_no_targets(self):
+        self.assertEqual([], self._scan_targets([]).targets)
+
+    def test_interleave_by_host(self):
+        targets = [(1, 0, 0), (1, 0, 1), (1, 0, 2), (2, 0, 0), (3, 0, 0), (3, 0, 1)]
+        self.assertEqual([(1, 0, 0), (2, 0, 0), (3, 0, 0), (1, 0, 1), (3, 0, 1), (1, 0, 2)],
+                         logic._interleave_by_host(targets))
+
+    def test_failing_worker(self):
+        from infi.storagemodel.base import gevent_wrapper
+
+        def make_blocking(func, timeout):
+            def wrapper(*args):
+                raise gevent_wrapper.Timeout()
+            return wrapper
+
+        with patch.object(gevent_wrapper, 'make_blocking', new=make_blocking):
+            report = logic.block_target_scan(1, 0, 2, 7)
+        self.assertEqual((1, 0, 2), (report.host, report.channel, report.target))
+        self.assertIsNotNone(report.error)
+
+
+class RescanReportTestCase(TestCase):
+    def test_main_returns_the_report(self):
+        from infi.storagemodel.linux import rescan_scsi_bus
+        report = logic.RescanReport([TargetScanReport(1, 0, 0)])
+        with patch.object(rescan_scsi_bus, 'rescan_scsi_hosts', return_value=report) as rescan_scsi_hosts:
+            self.assertIs(report, rescan_scsi_bus.main(timeout=5, concurrency=4))
+        rescan_scsi_hosts.assert_called_once_with(timeout=5, scope=None, concurrency=4)
+        with patch.object(rescan_scsi_bus, 'rescan_scsi_hosts', side_effect=RuntimeError()):
+            self.assertIsNone(rescan_scsi_bus.main())
+
+    def test_model_keeps_the_report(self):
+        from contextlib import contextmanager
+        from infi.storagemodel.base import gevent_wrapper
+        from infi.storagemodel.base.gevent_wrapper import Event
+        from infi.storagemodel.linux import LinuxStorageModel
+        report = logic.RescanReport([TargetScanReport(1, 0, 0)])
+
+        class Worker(object):
+            def prepare(self, method, kwargs=None):
+                return method, kwargs or dict()
+
+            def call(self, method, kwargs, timeout):
+                return method(**kwargs)
+
+        @contextmanager
+        def blocking_context(timeout):
+            yield None, Worker()
+
+        model = LinuxStorageModel()
+        event = Event()
+        with patch.object(gevent_wrapper, 'blocking_context', new=blocking_context), \
+                patch.object(LinuxStorageModel, 'rescan_method', return_value=report):
+            self.assertIs(report, model.block_on_rescan_process(event))
+        self.assertIs(report, model.last_rescan_report)
+        self.assertTrue(event.is_set())
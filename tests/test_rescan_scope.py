@@ -0,0 +1,114 @@
+from unittest import TestCase
+from mock import patch
+from infi.storagemodel.base import StorageModel
+from infi.storagemodel.base.rescan_scope import RescanScope, PREDICATE_SCOPE, create_rescan_scope
+from infi.storagemodel.predicates import FiberChannelMappingExists, PredicateList, DiskExists
+
+INITIATOR = '21:00:00:24:ff:3e:4f:5a'
+TARGET = '57:42:b0:f0:00:00:4e:12'
+OTHER_TARGET = '57:42:b0:f0:00:00:4e:13'
+
+
+class RecordingModel(StorageModel):
+    supports_scoped_rescan = True
+
+    def __init__(self):
+        super(RecordingModel, self).__init__()
+        self.rescans = []
+
+    def _initiate_rescan(self, **kwargs):
+        self.rescans.append(kwargs)
+
+
+class RescanScopeTestCase(TestCase):
+    def test_includes(self):
+        scope = RescanScope(hosts=[3], target_wwns=['0x5742b0f000004e12'])
+        self.assertTrue(scope.includes_host(3))
+        self.assertFalse(scope.includes_host(4))
+        self.assertTrue(scope.includes_initiator_wwn(None))
+        self.assertTrue(scope.includes_target_wwn(TARGET))
+        self.assertTrue(scope.includes_target_wwn('0x5742B0F000004E12'))
+        self.assertFalse(scope.includes_target_wwn(OTHER_TARGET))
+        self.assertFalse(scope.includes_target_wwn(None))
+
+    def test_union(self):
+        first = RescanScope(hosts=[3], target_wwns=[TARGET])
+        second = RescanScope(hosts=[4], target_wwns=[OTHER_TARGET])
+        self.assertEqual(RescanScope(hosts=[3, 4], target_wwns=[TARGET, OTHER_TARGET]), first.union(second))
+        self.assertEqual(RescanScope(), first.union(RescanScope()))
+
+    def test_pickle(self):
+        from pickle import dumps, loads
+        scope = RescanScope(hosts=[3], initiator_wwns=[INITIATOR], target_wwns=[TARGET])
+        self.assertEqual(scope, loads(dumps(scope)))
+
+    def test_create(self):
+        predicate = FiberChannelMappingExists(INITIATOR, TARGET, 1)
+        self.assertIsNone(create_rescan_scope(None, predicate))
+        self.assertEqual(RescanScope(hosts=[1, 2]), create_rescan_scope(set([1, 2])))
+        self.assertEqual(RescanScope(target_wwns=[TARGET]), create_rescan_scope(set([TARGET])))
+        self.assertEqual(RescanScope(initiator_wwns=[INITIATOR], target_wwns=[TARGET]),
+                         create_rescan_scope(PREDICATE_SCOPE, predicate))
+        self.assertIsNone(create_rescan_scope(PREDICATE_SCOPE, DiskExists('serial')))
+
+    def test_predicate_list(self):
+        first = FiberChannelMappingExists(INITIATOR, TARGET, 1)
+        second = FiberChannelMappingExists(INITIATOR, OTHER_TARGET, 2)
+        self.assertEqual(RescanScope(initiator_wwns=[INITIATOR], target_wwns=[TARGET, OTHER_TARGET]),
+                         PredicateList([first, second]).get_rescan_scope())
+        self.assertIsNone(PredicateList([first, DiskExists('serial')]).get_rescan_scope())
+
+    def test_rescan_and_wait_for(self):
+        model = RecordingModel()
+        model.rescan_and_wait_for(scope=set([3]))
+        self.assertEqual([dict(scope=RescanScope(hosts=[3]))], model.rescans)
+        model = RecordingModel()
+        model.rescan_and_wait_for(scope=PREDICATE_SCOPE)
+        self.assertEqual([dict()], model.rescans)
+
+    def test_rescan_and_wait_for__unsupported(self):
+        model = RecordingModel()
+        model.supports_scoped_rescan = False
+        model.rescan_and_wait_for(scope=set([3]))
+        self.assertEqual([dict()], model.rescans)
+
+
+class LinuxScopedRescanTestCase(TestCase):
+    def _rescan(self, scope):
+        from infi.storagemodel.linux.rescan_scsi_bus import logic
+        scanned_targets = []
+        host_scans = []
+
+        def block_target_scan(host, channel, target, timeout, topology):
+            scanned_targets.append((host, channel, target))
+            return logic.TargetScanReport(host, channel, target)
+
+        remote_targets = {3: {(0, 1): '0x5742b0f000004e12', (0, 2): '0x5742b0f000004e13'}, 4: {}}
+        port_names = {3: '0x21000024ff3e4f5a', 4: '0x21000024ff3e4f5b', 5: None}
+        with patch.object(logic, 'is_sg_module_loaded', return_value=True), \
+                patch.object(logic, 'is_there_a_bug_in_sysfs_async_scanning', return_value=False), \
+                patch.object(logic, 'get_hosts', return_value=[3, 4, 5]), \
+                patch.object(logic, 'get_channels', return_value=set([0])), \
+                patch.object(logic, 'get_targets', return_value=set([1, 2, 7])), \
+                patch.object(logic, 'get_fc_host_port_name', new=port_names.get), \
+                patch.object(logic, 'get_fc_remote_targets', new=remote_targets.get), \
+                patch.object(logic, 'scsi_host_scan', new=lambda *args: host_scans.append(args)), \
+                patch.object(logic, 'block_target_scan', new=block_target_scan):
+            logic.rescan_scsi_hosts(scope=scope)
+        return sorted(host_scans), sorted(scanned_targets)
+
+    def test_everything(self):
+        host_scans, scanned_targets = self._rescan(None)
+        self.assertEqual([(3,), (4,), (5,)], host_scans)
+        self.assertEqual(9, len(scanned_targets))
+
+    def test_hosts(self):
+        host_scans, scanned_targets = self._rescan(RescanScope(hosts=[4]))
+        self.assertEqual([(4,)], host_scans)
+        self.assertEqual([(4, 0, 1), (4, 0, 2), (4, 0, 7)], scanned_targets)
+
+    def test_initiator_and_target_wwns(self):
+        scope = RescanScope(initiator_wwns=[INITIATOR], target_wwns=[TARGET])
+        host_scans, scanned_targets = self._rescan(scope)
+        self.assertEqual([(3, 0, 1)], host_scans)
+        self.assertEqual([(3, 0, 1)], scanned_targets)
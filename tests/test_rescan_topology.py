@@ -0,0 +1,66 @@
+from unittest import TestCase
+from mock import patch
+from infi.storagemodel.linux.rescan_scsi_bus import getters, logic
+from infi.storagemodel.linux.rescan_scsi_bus.getters import SCSITopology
+
+
+class SCSITopologyTestCase(TestCase):
+    def setUp(self):
+        self.names = ['3:0:1:0', '3:0:1:1', '3:0:2:0', '3:1:0:5', '4:0:0:0', 'not-an-hctl']
+        self.listings = 0
+
+        def get_scsi_device_names_from_sysfs():
+            self.listings += 1
+            return list(self.names)
+
+        patcher = patch.object(getters, 'get_scsi_device_names_from_sysfs', new=get_scsi_device_names_from_sysfs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_listing(self):
+        topology = SCSITopology()
+        self.assertEqual(set([0, 1]), getters.get_channels(3, topology))
+        self.assertEqual(set([1, 2]), getters.get_targets(3, 0, topology))
+        self.assertEqual(set([0, 1]), getters.get_luns(3, 0, 1, topology))
+        self.assertEqual(set([5]), getters.get_luns(3, 1, 0, topology))
+        self.assertEqual(set(), getters.get_luns(5, 0, 0, topology))
+        self.assertEqual(1, self.listings)
+        self.names.append('3:0:1:2')
+        self.assertEqual(set([0, 1]), topology.get_luns(3, 0, 1))
+        topology.invalidate()
+        self.assertEqual(set([0, 1, 2]), topology.get_luns(3, 0, 1))
+        self.assertEqual(2, self.listings)
+
+    def test_without_topology(self):
+        self.assertEqual(set([0]), getters.get_luns(4, 0, 0))
+        self.assertEqual(set([0]), getters.get_targets(4, 0))
+        self.assertEqual(2, self.listings)
+
+    def test_pickle(self):
+        from pickle import dumps, loads
+        topology = SCSITopology()
+        topology.get_channels(3)
+        self.assertEqual(set([1, 2]), loads(dumps(topology)).get_targets(3, 0))
+        self.assertEqual(1, self.listings)
+
+    def test_target_scan_invalidates_after_writes(self):
+        topology = SCSITopology()
+        with patch.object(logic, 'get_lun_type', return_value=logic.DIRECT_ACCESS_BLOCK_DEVICE), \
+                patch.object(logic, 'get_scsi_generic_device', return_value='sg1'), \
+                patch.object(logic, 'do_report_luns') as do_report_luns, \
+                patch.object(logic, 'is_there_a_bug_in_target_removal', return_value=False), \
+                patch.object(logic, 'handle_add_devices') as handle_add_devices, \
+                patch.object(logic, 'handle_device_removal') as handle_device_removal:
+            do_report_luns.return_value.lun_list = [0, 1]
+            logic.target_scan(3, 0, 1, topology)
+            self.assertEqual(1, self.listings)
+            self.assertFalse(handle_add_devices.called or handle_device_removal.called)
+            do_report_luns.return_value.lun_list = [0, 2]
+            handle_device_removal.return_value = False
+            report = logic.target_scan(3, 0, 1, topology)
+            self.assertEqual((set([2]), set(), set([1])), (report.added, report.removed, report.failed))
+            handle_add_devices.assert_called_once_with(3, 0, 1, set([2]))
+            handle_device_removal.assert_called_once_with(3, 0, 1, 1)
+            self.assertEqual(1, self.listings)
+            self.assertEqual(set([0, 1]), topology.get_luns(3, 0, 1))
+            self.assertEqual(2, self.listings)
@@ -0,0 +1,73 @@
+from unittest import TestCase
+from infi.dtypes.hctl import HCTL
+from infi.storagemodel.base.scsi import SCSIModel
+from fake_scsi import FakeSCSIDevice, FakeSCSITarget
+
+
+class FakeSCSIBlockDevice(FakeSCSIDevice):
+    def __init__(self, index, target):
+        super(FakeSCSIBlockDevice, self).__init__(target, 'sg{}'.format(index))
+        self.index = index
+
+    def get_block_access_path(self):
+        return '/dev/sd{}'.format(chr(ord('a') + self.index))
+
+    def get_scsi_access_path(self):
+        return '/dev/sg{}'.format(self.index)
+
+    def get_hctl(self):
+        return HCTL(1, 0, self.index % 2, self.index // 2)
+
+    def get_unix_block_devno(self):
+        return (8, self.index * 16)
+
+    def get_wwid(self):
+        return 'wwid{}'.format(self.index // 2)
+
+
+class FakeSCSIModel(SCSIModel):
+    def __init__(self, devices):
+        super(FakeSCSIModel, self).__init__()
+        self.devices = devices
+        self.listings = 0
+
+    def get_all_scsi_block_devices(self):
+        self.listings += 1
+        return self.devices
+
+
+class SCSIBlockDeviceIndexTestCase(TestCase):
+    def setUp(self):
+        # two paths to every volume
+        targets = [FakeSCSITarget(serial='serial{}'.format(index)) for index in range(3)]
+        self.devices = [FakeSCSIBlockDevice(index, targets[index // 2]) for index in range(6)]
+        self.model = FakeSCSIModel(self.devices)
+
+    def test_find(self):
+        for device in self.devices:
+            self.assertIs(device, self.model.find_scsi_block_device_by_block_access_path(device.get_block_access_path()))
+            self.assertIs(device, self.model.find_scsi_block_device_by_scsi_access_path(device.get_scsi_access_path()))
+            self.assertIs(device, self.model.find_scsi_block_device_by_hctl(device.get_hctl()))
+            self.assertIs(device, self.model.find_scsi_block_device_by_devno(device.get_unix_block_devno()))
+        self.assertIs(self.devices[3], self.model.find_scsi_block_device_by_hctl('1:0:1:1'))
+        self.assertEqual(1, self.model.listings)
+        self.assertRaises(KeyError, self.model.find_scsi_block_device_by_block_access_path, '/dev/sdz')
+
+    def test_find_by_serial_and_wwid(self):
+        self.assertEqual(self.devices[2:4], self.model.find_scsi_block_devices_by_serial('serial1'))
+        self.assertEqual(self.devices[4:6], self.model.find_scsi_block_devices_by_wwid('wwid2'))
+        self.assertEqual([], self.model.find_scsi_block_devices_by_serial('serial9'))
+        sent = sum(device.target.count_cdbs() for device in self.devices)
+        self.model.find_scsi_block_devices_by_serial('serial0')
+        self.assertEqual(sent, sum(device.target.count_cdbs() for device in self.devices))
+
+    def test_devices_that_fail_are_not_indexed(self):
+        del self.devices[0].target.pages[0x00]
+        self.assertEqual([], self.model.find_scsi_block_devices_by_serial('serial0'))
+
+    def test_device_index_extends_the_scsi_index(self):
+        from infi.storagemodel.base.device_index import DeviceIndex
+        index = DeviceIndex(self.devices)
+        self.assertEqual(self.devices[2:4], index.find_devices_by_serial('serial1'))
+        self.assertIs(self.devices[3], index.get_hctl_dict()[HCTL(1, 0, 1, 1)])
+        self.assertEqual({}, index.get_volume_dict())
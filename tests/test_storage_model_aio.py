@@ -0,0 +1,154 @@
+from unittest import TestCase, SkipTest
+from sys import version_info
+from infi.storagemodel.base import StorageModel
+from infi.storagemodel.base.scsi import SCSIModel
+from fake_scsi import FakeSCSIDevice, FakeSCSITarget
+
+
+class FakeSCSIModel(SCSIModel):
+    def __init__(self, devices):
+        super(FakeSCSIModel, self).__init__()
+        self.devices = devices
+
+    def get_all_scsi_block_devices(self):
+        return self.devices
+
+
+class FakeStorageModel(StorageModel):
+    def __init__(self, devices):
+        super(FakeStorageModel, self).__init__()
+        self.devices = devices
+        self.rescans = 0
+
+    def _create_scsi_model(self):
+        return FakeSCSIModel(self.devices)
+
+    def _initiate_rescan(self, wait_for_completion=False, raise_error=False):
+        self.rescans += 1
+
+
+class AsyncStorageModelTestCase(TestCase):
+    def setUp(self):
+        if version_info < (3, 5):
+            raise SkipTest("asyncio front-end requires Python 3.5")
+        import asyncio
+        from infi.storagemodel.aio import AsyncExecutor, AsyncStorageModel
+        self.targets = [FakeSCSITarget(serial='serial{}'.format(index)) for index in range(4)]
+        self.devices = [FakeSCSIDevice(target, 'sg{}'.format(index)) for index, target in enumerate(self.targets)]
+        self.model = FakeStorageModel(self.devices)
+        self.executor = AsyncExecutor(concurrency=2)
+        self.addCleanup(self.executor.shutdown)
+        self.async_model = AsyncStorageModel(self.model, self.executor)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_devices(self):
+        import asyncio
+        from infi.storagemodel.aio import AsyncProxy
+
+        async def get_serials():
+            scsi = await self.async_model.get_scsi()
+            devices = await scsi.get_all_scsi_block_devices()
+            self.assertTrue(all(isinstance(device, AsyncProxy) for device in devices))
+            return await asyncio.gather(*[device.get_scsi_serial_number() for device in devices])
+
+        self.assertEqual(['serial0', 'serial1', 'serial2', 'serial3'], self._run(get_serials()))
+        # the caches are shared with the synchronous model
+        self.assertIs(self.model.get_scsi(), self._run(self.async_model.get_scsi()).sync)
+        sent = sum(target.count_cdbs() for target in self.targets)
+        self.assertEqual(['serial0', 'serial1', 'serial2', 'serial3'],
+                         [device.get_scsi_serial_number() for device in self.devices])
+        self.assertEqual(sent, sum(target.count_cdbs() for target in self.targets))
+
+    def test_rescan_and_wait_for__sync_predicate(self):
+        from infi.storagemodel.predicates import WaitForNothing
+        self._run(self.async_model.rescan_and_wait_for(WaitForNothing()))
+        self.assertEqual(1, self.model.rescans)
+
+    def test_rescan_and_wait_for__async_predicate(self):
+        calls = []
+
+        async def predicate():
+            calls.append(None)
+            scsi = await self.async_model.get_scsi()
+            devices = await scsi.get_all_scsi_block_devices()
+            return len(calls) > 1 and len(devices) == 4
+
+        self.model._create_device_change_listener = lambda: None
+        self._run(self.async_model.rescan_and_wait_for(predicate, timeout_in_seconds=5))
+        self.assertEqual(2, len(calls))
+        self.assertEqual(2, self.model.rescans)
+
+    def test_rescan_and_wait_for__timeout(self):
+        from infi.storagemodel.errors import TimeoutError
+
+        async def predicate():
+            return False
+
+        self.assertRaises(TimeoutError, self._run, self.async_model.rescan_and_wait_for(predicate, 0))
+
+    def test_model_calls_are_serialized(self):
+        import asyncio
+        from time import sleep
+        running, most_running = [0], [0]
+
+        def get_all_scsi_block_devices():
+            running[0] += 1
+            most_running[0] = max(most_running[0], running[0])
+            sleep(0.01)
+            running[0] -= 1
+            return self.devices
+
+        self.model.get_scsi().get_all_scsi_block_devices = get_all_scsi_block_devices
+
+        async def get_devices():
+            scsi = await self.async_model.get_scsi()
+            return await asyncio.gather(*[scsi.get_all_scsi_block_devices() for _ in range(8)])
+
+        self.assertEqual(8, len(self._run(get_devices())))
+        self.assertEqual(1, most_running[0])
+
+    def _track_running(self, devices):
+        from time import sleep
+        running, most_running = [0], [0]
+
+        def track(device):
+            def get_scsi_test_unit_ready():
+                running[0] += 1
+                most_running[0] = max(most_running[0], running[0])
+                sleep(0.05)
+                running[0] -= 1
+                return True
+            device.get_scsi_test_unit_ready = get_scsi_test_unit_ready
+
+        for device in devices:
+            track(device)
+        return most_running
+
+    def test_device_calls_run_concurrently(self):
+        import asyncio
+        most_running = self._track_running(self.devices)
+
+        async def test_unit_ready():
+            scsi = await self.async_model.get_scsi()
+            devices = await scsi.get_all_scsi_block_devices()
+            return await asyncio.gather(*[device.get_scsi_test_unit_ready() for device in devices])
+
+        self.assertEqual([True] * 4, self._run(test_unit_ready()))
+        # up to the concurrency of the executor
+        self.assertEqual(2, most_running[0])
+
+    def test_calls_into_a_device_are_serialized(self):
+        import asyncio
+        most_running = self._track_running(self.devices[:1])
+
+        async def test_unit_ready():
+            scsi = await self.async_model.get_scsi()
+            device = (await scsi.get_all_scsi_block_devices())[0]
+            return await asyncio.gather(*[device.get_scsi_test_unit_ready() for _ in range(4)])
+
+        self.assertEqual([True] * 4, self._run(test_unit_ready()))
+        self.assertEqual(1, most_running[0])
@@ -1,151 +1,37 @@
-import sys
 from unittest import TestCase, SkipTest
-from mock import Mock, patch
 from os import name
 from infi.dtypes.hctl import HCTL
 from infi.storagemodel.linux.sysfs import Sysfs
+from fake_sysfs import FakeSysfs, build_fake_sysfs
+from fake_scsi import FakeSCSITarget, FakeExecuter
 
-PY2 = sys.version_info[0] == 2
 
 class SysfsTestCase(TestCase):
-    @patch('infi.storagemodel.linux.sysfs.get_hctl_for_sd_device')
-    @patch('os.path.islink')
-    @patch('os.path.exists')
-    @patch('os.listdir')
-    @patch('__builtin__.open' if PY2 else 'builtins.open')
-    def test_sysfs(self, open_mock, listdir_mock, exists_mock, islink_mock, get_hctl_for_sd_device_mock):
+    def setUp(self):
         if name == "nt":
             raise SkipTest
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
 
-        listdir_map = {
-            '/sys/class/scsi_device': [ '2:0:0:0', '3:0:0:0', '3:0:1:1', '3:0:1:2', '4:0:0:0', '4:0:1:1', '4:0:1:2',
-                                        '5:0:0:0' ],
-            # SCSI Disks:
-            '/sys/class/scsi_device/2:0:0:0/device/block': [ 'sda' ],
-            '/sys/class/scsi_device/2:0:0:0/device/scsi_generic': [ 'sg0' ],
-            '/sys/class/scsi_device/3:0:0:0/device/block': [ 'sde' ],
-            '/sys/class/scsi_device/3:0:0:0/device/scsi_generic': [ 'sg4' ],
-            '/sys/class/scsi_device/3:0:1:1/device/block': [ 'sdf' ],
-            '/sys/class/scsi_device/3:0:1:1/device/scsi_generic': [ 'sg2' ],
-            '/sys/class/scsi_device/3:0:1:2/device/block': [ 'sdg' ],
-            '/sys/class/scsi_device/3:0:1:2/device/scsi_generic': [ 'sg5' ],
-            '/sys/class/scsi_device/4:0:0:0/device/block': [ 'sdb' ],
-            '/sys/class/scsi_device/4:0:0:0/device/scsi_generic': [ 'sg1' ],
-            '/sys/class/scsi_device/4:0:1:1/device/block': [ 'sdc' ],
-            '/sys/class/scsi_device/4:0:1:1/device/scsi_generic': [ 'sg7' ],
-            '/sys/class/scsi_device/4:0:1:2/device/block': [ 'sdd' ],
-            '/sys/class/scsi_device/4:0:1:2/device/scsi_generic': [ 'sg6' ],
-            # SCSI Storage Controllers:
-            '/sys/class/scsi_device/5:0:0:0/device/scsi_generic': [ 'sg3' ],
-
-            # Block Devices:
-            '/sys/block': ['sda','sde','sdf','sdg','sdb','sdc','sdd'],
-
-            # Device names:
-            '/dev' : ['sg0','sg4','sg2','sg5','sg1','sg7','sg6','sg3','sda','sde','sdf','sdg','sdb','sdc','sdd']
-        }
-
-        file_map = {
-            '/sys/class/scsi_device/2:0:0:0/device/type': '0',
-            '/sys/class/scsi_device/2:0:0:0/device/vendor': 'VMware',
-            '/sys/class/scsi_device/2:0:0:0/device/block/sda/size': '16777216',
-            '/sys/class/scsi_device/2:0:0:0/device/block/sda/dev': '8:0',
-            '/sys/class/scsi_device/2:0:0:0/device/queue_depth': '64',
-
-            '/sys/class/scsi_device/3:0:0:0/device/type': '0',
-            '/sys/class/scsi_device/3:0:0:0/device/vendor': 'NFINIDAT',
-            '/sys/class/scsi_device/3:0:0:0/device/block/sde/size': '2097156',
-            '/sys/class/scsi_device/3:0:0:0/device/block/sde/dev': '8:4',
-            '/sys/class/scsi_device/3:0:0:0/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/3:0:1:1/device/type': '0',
-            '/sys/class/scsi_device/3:0:1:1/device/vendor': 'NEXSAN',
-            '/sys/class/scsi_device/3:0:1:1/device/block/sdf/size': '1953792',
-            '/sys/class/scsi_device/3:0:1:1/device/block/sdf/dev': '8:5',
-            '/sys/class/scsi_device/3:0:1:1/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/3:0:1:2/device/type': '0',
-            '/sys/class/scsi_device/3:0:1:2/device/vendor': 'NEXSAN',
-            '/sys/class/scsi_device/3:0:1:2/device/block/sdg/size': '1953792',
-            '/sys/class/scsi_device/3:0:1:2/device/block/sdg/dev': '8:6',
-            '/sys/class/scsi_device/3:0:1:2/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/4:0:0:0/device/type': '0',
-            '/sys/class/scsi_device/4:0:0:0/device/vendor': 'NFINIDAT',
-            '/sys/class/scsi_device/4:0:0:0/device/block/sdb/size': '2097156',
-            '/sys/class/scsi_device/4:0:0:0/device/block/sdb/dev': '8:1',
-            '/sys/class/scsi_device/4:0:0:0/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/4:0:1:1/device/type': '0',
-            '/sys/class/scsi_device/4:0:1:1/device/vendor': 'NEXSAN',
-            '/sys/class/scsi_device/4:0:1:1/device/block/sdc/size': '1953792',
-            '/sys/class/scsi_device/4:0:1:1/device/block/sdc/dev': '8:2',
-            '/sys/class/scsi_device/4:0:1:1/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/4:0:1:2/device/type': '0',
-            '/sys/class/scsi_device/4:0:1:2/device/vendor': 'NEXSAN',
-            '/sys/class/scsi_device/4:0:1:2/device/block/sdd/size': '1953792',
-            '/sys/class/scsi_device/4:0:1:2/device/block/sdd/dev': '8:3',
-            '/sys/class/scsi_device/4:0:1:2/device/queue_depth': '32',
-
-            '/sys/class/scsi_device/5:0:0:0/device/type': '12',
-            '/sys/class/scsi_device/5:0:0:0/device/vendor': 'NFINIDAT',
-            '/sys/class/scsi_device/5:0:0:0/device/queue_depth': '32',
-
-            '/sys/block/sda/dev' : '8:0',
-            '/sys/block/sda/size' : '16777216',
-            '/sys/block/sde/dev' : '8:4',
-            '/sys/block/sde/size' : '2097156',
-            '/sys/block/sdf/dev' : '8:5',
-            '/sys/block/sdf/size' : '1953792',
-            '/sys/block/sdg/dev' : '8:6',
-            '/sys/block/sdg/size' : '1953792',
-            '/sys/block/sdb/dev' : '8:1',
-            '/sys/block/sdb/size' : '2097156',
-            '/sys/block/sdc/dev' : '8:2',
-            '/sys/block/sdc/size' : '1953792',
-            '/sys/block/sdd/dev' : '8:3',
-            '/sys/block/sdd/size' : '1953792',
-
-
-        }
-
-        get_sd_hctl_map = {
-            '/dev/sda' : HCTL.from_string('2:0:0:0'),
-            '/dev/sde' : HCTL.from_string('3:0:0:0'),
-            '/dev/sdf' : HCTL.from_string('3:0:1:1'),
-            '/dev/sdg' : HCTL.from_string('3:0:1:2'),
-            '/dev/sdb' : HCTL.from_string('4:0:0:0'),
-            '/dev/sdc' : HCTL.from_string('4:0:1:1'),
-            '/dev/sdd' : HCTL.from_string('4:0:1:2'),
-        }
-
-        def create_file_context_manager(*args, **kwargs):
-            path = args[0]
-            file_mock = Mock()
-            file_mock.read = Mock(return_value=file_map[path])
-            cm = Mock()
-            cm.__enter__ = Mock(return_value=file_mock)
-            cm.__exit__ = Mock()
-            return cm
-
+    def test_sysfs(self):
         disk_properties = {
-            'sda': dict(queue_depth=64, sysfs_size=16777216, hctl='2:0:0:0', vendor='VMware'),
-            'sde': dict(queue_depth=32, sysfs_size=2097156, hctl='3:0:0:0', vendor='NFINIDAT'),
-            'sdf': dict(queue_depth=32, sysfs_size=1953792, hctl='3:0:1:1', vendor='NEXSAN'),
-            'sdg': dict(queue_depth=32, sysfs_size=1953792, hctl='3:0:1:2', vendor='NEXSAN'),
-            'sdb': dict(queue_depth=32, sysfs_size=2097156, hctl='4:0:0:0', vendor='NFINIDAT'),
-            'sdc': dict(queue_depth=32, sysfs_size=1953792, hctl='4:0:1:1', vendor='NEXSAN'),
-            'sdd': dict(queue_depth=32, sysfs_size=1953792, hctl='4:0:1:2', vendor='NEXSAN'),
+            'sda': dict(queue_depth=64, sysfs_size=16777216, hctl='2:0:0:0', vendor='VMware', sg='sg0', devno=(8, 0)),
+            'sde': dict(queue_depth=32, sysfs_size=2097156, hctl='3:0:0:0', vendor='NFINIDAT', sg='sg4', devno=(8, 64)),
+            'sdf': dict(queue_depth=32, sysfs_size=1953792, hctl='3:0:1:1', vendor='NEXSAN', sg='sg2', devno=(8, 80)),
+            'sdg': dict(queue_depth=32, sysfs_size=1953792, hctl='3:0:1:2', vendor='NEXSAN', sg='sg5', devno=(8, 96)),
+            'sdb': dict(queue_depth=32, sysfs_size=2097156, hctl='4:0:0:0', vendor='NFINIDAT', sg='sg1', devno=(8, 16)),
+            'sdc': dict(queue_depth=32, sysfs_size=1953792, hctl='4:0:1:1', vendor='NEXSAN', sg='sg7', devno=(8, 32)),
+            'sdd': dict(queue_depth=32, sysfs_size=1953792, hctl='4:0:1:2', vendor='NEXSAN', sg='sg6', devno=(8, 48)),
         }
+        for sd_name, properties in disk_properties.items():
+            self.fake.add_scsi_device(properties['hctl'], sg_name=properties['sg'],
+                                      sg_devno=(21, int(properties['sg'][2:])), sd_name=sd_name,
+                                      sd_devno=properties['devno'], vendor=properties['vendor'],
+                                      queue_depth=properties['queue_depth'], size=properties['sysfs_size'])
+        self.fake.add_controller(3, '5:0:0:0')
+        self.fake.add_block_device('dm-0', (253, 0))
 
-        listdir_mock.side_effect = listdir_map.get
-        open_mock.side_effect = create_file_context_manager
-        exists_mock.return_value = True
-        islink_mock.return_value = False
-        get_hctl_for_sd_device_mock.side_effect = get_sd_hctl_map.get
-
-        sysfs = Sysfs()
+        sysfs = Sysfs(self.fake.root)
 
         disks = sysfs.get_all_sd_disks()
         self.assertEqual(7, len(disks))
@@ -158,3 +44,222 @@ class SysfsTestCase(TestCase):
             self.assertEqual(disk_properties[block_dev]['queue_depth'], disk.get_queue_depth())
             self.assertEqual(disk_properties[block_dev]['sysfs_size'] * 512, disk.get_size_in_bytes())
             self.assertEqual(disk_properties[block_dev]['vendor'], disk.get_vendor())
+            self.assertEqual(disk_properties[block_dev]['sg'], disk.get_scsi_generic_device_name())
+            self.assertEqual(disk_properties[block_dev]['devno'], disk.get_block_devno())
+
+        [controller] = sysfs.get_all_scsi_storage_controllers()
+        self.assertEqual(HCTL(5, 0, 0, 0), controller.get_hctl())
+        self.assertEqual('sg3', controller.get_scsi_generic_device_name())
+        self.assertEqual(8, len(sysfs.get_all_block_devices()))
+        self.assertEqual('dm-0', sysfs.find_block_device_by_devno((253, 0)).get_block_device_name())
+        self.assertIs(disks[0], sysfs.find_block_device_by_devno(disks[0].get_block_devno()))
+
+    def test_nvme_and_partitions(self):
+        self.fake.add_disk(0, '1:0:0:0')
+        self.fake.add_partition('sda', 1, (8, 1))
+        self.fake.add_nvme_namespace(0, 1, (259, 0))
+        self.fake.add_partition('nvme0n1', 1, (259, 1))
+        sysfs = Sysfs(self.fake.root)
+        self.assertEqual(['nvme0n1', 'sda'],
+                         sorted(device.get_block_device_name() for device in sysfs.get_all_block_devices()))
+        self.assertEqual('nvme0n1', sysfs.find_block_device_by_devno((259, 0)).get_block_device_name())
+        self.assertIsNone(sysfs.find_block_device_by_devno((259, 1)))
+
+    def test_disk_without_sd(self):
+        self.fake.add_scsi_device('1:0:0:0', sg_name='sg9', sg_devno=(21, 9))
+        sysfs = Sysfs(self.fake.root)
+        self.assertEqual([], sysfs.get_all_sd_disks())
+        [disk] = sysfs.get_all_sg_disks()
+        self.assertEqual('sg9', disk.get_scsi_generic_device_name())
+
+    def test_device_without_sg_is_skipped(self):
+        self.fake.add_scsi_device('1:0:0:0', sd_name='sda', sd_devno=(8, 0))
+        sysfs = Sysfs(self.fake.root)
+        self.assertEqual([], sysfs.get_all_sg_disks())
+        self.assertEqual(['sda'], [device.get_block_device_name() for device in sysfs.get_all_block_devices()])
+
+    def test_find_by_hctl_and_name(self):
+        self.fake.add_disk(0, '1:0:0:0')
+        self.fake.add_scsi_device('1:0:0:1', sg_name='sg1', sg_devno=(21, 1))
+        self.fake.add_controller(2, '1:0:0:2')
+        self.fake.add_block_device('dm-0', (253, 0))
+        sysfs = Sysfs(self.fake.root)
+        [disk] = sysfs.get_all_sd_disks()
+        [controller] = sysfs.get_all_scsi_storage_controllers()
+        self.assertIs(disk, sysfs.find_scsi_disk_by_hctl(HCTL(1, 0, 0, 0)))
+        self.assertIs(disk, sysfs.find_scsi_disk_by_hctl('1:0:0:0'))
+        self.assertRaises(ValueError, sysfs.find_scsi_disk_by_hctl, HCTL(1, 0, 0, 1))
+        self.assertRaises(ValueError, sysfs.find_scsi_disk_by_hctl, HCTL(1, 0, 0, 2))
+        self.assertIs(controller, sysfs.find_scsi_device_by_hctl(HCTL(1, 0, 0, 2)))
+        self.assertEqual('sg1', sysfs.find_scsi_device_by_hctl(HCTL(1, 0, 0, 1)).get_scsi_generic_device_name())
+        self.assertIsNone(sysfs.find_scsi_device_by_hctl(HCTL(1, 0, 0, 3)))
+        self.assertIs(disk, sysfs.find_device_by_name('sda'))
+        self.assertIs(disk, sysfs.find_device_by_name('sg0'))
+        self.assertIs(controller, sysfs.find_device_by_name('sg2'))
+        self.assertEqual((253, 0), sysfs.find_device_by_name('dm-0').get_block_devno())
+        self.assertIsNone(sysfs.find_device_by_name('sdz'))
+
+    def test_find_by_name_of_sg_resolved_from_the_device(self):
+        import os
+        self.fake.add_disk(0, '1:0:0:0')
+        # the sg is not in /sys/class/scsi_generic, so it is resolved from the device directory
+        os.remove(self.fake.path('class/scsi_generic/sg0'))
+        sysfs = Sysfs(self.fake.root)
+        [disk] = sysfs.get_all_sd_disks()
+        self.assertIs(disk, sysfs.find_device_by_name('sg0'))
+        self.assertIsNone(sysfs.find_device_by_name(None))
+
+    def test_snapshot_is_shared(self):
+        self.fake.add_disk(0, '1:0:0:0')
+        sysfs = Sysfs(self.fake.root)
+        self.assertIs(sysfs.get_snapshot(), sysfs.get_snapshot())
+        [scsi_device] = sysfs.get_snapshot().scsi_devices
+        self.assertEqual(('1:0:0:0', 0, 'sg0', 'sda'), (scsi_device.hctl_str, scsi_device.scsi_type,
+                                                        scsi_device.scsi_generic_device_name,
+                                                        scsi_device.block_device_name))
+
+    def test_incremental(self):
+        self.fake.add_disk(0, '1:0:0:0')
+        self.fake.add_disk(1, '1:0:0:1')
+        self.fake.add_disk(2, '1:0:0:2')
+        self.fake.add_controller(3, '1:0:0:3')
+        previous = Sysfs(self.fake.root)
+        sda = previous.find_scsi_disk_by_hctl('1:0:0:0')
+        [controller] = previous.get_all_scsi_storage_controllers()
+        self.fake.remove_scsi_device('1:0:0:1')
+        self.fake.remove_scsi_device('1:0:0:2')
+        self.fake.add_disk(4, '1:0:0:2')
+        self.fake.add_disk(5, '1:0:0:5')
+        sysfs = Sysfs(self.fake.root, previous=previous)
+        self.assertEqual(([HCTL(1, 0, 0, 5)], [HCTL(1, 0, 0, 1)], [HCTL(1, 0, 0, 2)]), sysfs.get_delta())
+        self.assertIs(sda, sysfs.find_scsi_disk_by_hctl('1:0:0:0'))
+        self.assertIs(controller, sysfs.find_scsi_device_by_hctl('1:0:0:3'))
+        self.assertEqual(['sda', 'sde', 'sdf'],
+                         sorted(disk.get_block_device_name() for disk in sysfs.get_all_sd_disks()))
+        self.assertIsNone(sysfs.find_device_by_name('sdb'))
+        self.assertEqual(([], [], []), Sysfs(self.fake.root, previous=sysfs).get_delta())
+
+    def test_incremental_remapped_lun(self):
+        self.fake.add_disk(0, '1:0:0:0', attributes=dict(wwid='naa.6742b0f000004e4f0000000000000001'))
+        # the identity of the devices is read only by Sysfs objects that have a previous one
+        previous = Sysfs(self.fake.root, previous=Sysfs(self.fake.root))
+        sda = previous.find_scsi_disk_by_hctl('1:0:0:0')
+        # another volume is mapped to the same LUN, and the kernel gives it the same names
+        self.fake.remove_scsi_device('1:0:0:0')
+        self.fake.add_disk(0, '1:0:0:0', attributes=dict(wwid='naa.6742b0f000004e4f0000000000000002'))
+        sysfs = Sysfs(self.fake.root, previous=previous)
+        self.assertEqual(([], [], [HCTL(1, 0, 0, 0)]), sysfs.get_delta())
+        self.assertIsNot(sda, sysfs.find_scsi_disk_by_hctl('1:0:0:0'))
+
+    def test_identity_is_read_only_when_incremental(self):
+        from mock import patch
+        self.fake.add_disk(0, '1:0:0:0')
+        self.fake.add_disk(1, '1:0:0:1')
+        with patch('infi.storagemodel.linux.sysfs._sysfs_read_wwid') as read_wwid:
+            previous = Sysfs(self.fake.root)
+            previous.get_all_sd_disks()
+            self.assertFalse(read_wwid.called)
+            self.fake.remove_scsi_device('1:0:0:1')
+            self.fake.add_disk(2, '1:0:0:1')
+            Sysfs(self.fake.root, previous=previous).get_all_sd_disks()
+        # 1:0:0:1 got other names, so only the device whose names did not change was identified
+        self.assertEqual(1, read_wwid.call_count)
+
+
+class LinuxStorageModelIncrementalRefreshTestCase(TestCase):
+    def setUp(self):
+        if name == "nt":
+            raise SkipTest
+        from mock import patch
+        from infi.pyutils.lazy import cached_method
+        from infi.storagemodel.linux import LinuxStorageModel
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        patcher = patch('infi.storagemodel.linux.scsi.is_sg_module_loaded', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        root = self.fake.root
+
+        class Model(LinuxStorageModel):
+            @cached_method
+            def _get_sysfs(self):
+                return Sysfs(root, previous=self._previous_sysfs)
+
+        self.model = Model()
+
+    def _get_devices_by_hctl(self):
+        return dict((str(device.get_hctl()), device) for device in self.model.get_scsi().get_all_scsi_block_devices())
+
+    def test_refresh_incrementally(self):
+        self.fake.add_disk(0, '1:0:0:0')
+        self.fake.add_disk(1, '1:0:0:1')
+        before = self._get_devices_by_hctl()
+        self.assertEqual(2 * 1024 * 1024 * 512, before['1:0:0:0'].get_size_in_bytes())
+        self.fake.write(self.fake.scsi_device_path('1:0:0:0') + '/block/sda/size', '4194304\n')
+        self.fake.remove_scsi_device('1:0:0:1')
+        self.fake.add_disk(2, '1:0:0:2')
+        delta = self.model.refresh_incrementally()
+        self.assertEqual(([HCTL(1, 0, 0, 2)], [HCTL(1, 0, 0, 1)], []), delta)
+        after = self._get_devices_by_hctl()
+        self.assertEqual(['1:0:0:0', '1:0:0:2'], sorted(after))
+        self.assertIs(before['1:0:0:0'], after['1:0:0:0'])
+        self.assertEqual(4 * 1024 * 1024 * 512, after['1:0:0:0'].get_size_in_bytes())
+        self.model.refresh()
+        self.assertIsNot(before['1:0:0:0'], self._get_devices_by_hctl()['1:0:0:0'])
+
+
+class SysfsInquiryTestCase(TestCase):
+    def setUp(self):
+        if name == "nt":
+            raise SkipTest
+        self.fake = FakeSysfs()
+        self.addCleanup(self.fake.cleanup)
+        self.target = FakeSCSITarget(serial='sysfs_serial')
+
+    def _get_device(self, *attributes):
+        from contextlib import contextmanager
+        from infi.storagemodel.linux.scsi import LinuxSCSIBlockDevice
+        target = self.target
+        names = dict(inquiry='inquiry', vpd_pg0=0x00, vpd_pg80=0x80, vpd_pg83=0x83)
+        self.fake.add_disk(0, '1:0:0:0', attributes=dict(
+            (attribute, target.standard_inquiry if attribute == 'inquiry' else target.pages[names[attribute]])
+            for attribute in attributes))
+
+        class Device(LinuxSCSIBlockDevice):
+            @contextmanager
+            def asi_context(self):
+                yield FakeExecuter(target)
+
+        [sysfs_device] = Sysfs(self.fake.root).get_all_sd_disks()
+        return Device(sysfs_device)
+
+    def test_all_pages_in_sysfs(self):
+        device = self._get_device('inquiry', 'vpd_pg0', 'vpd_pg80', 'vpd_pg83')
+        self.assertEqual('sysfs_serial', device.get_scsi_serial_number())
+        self.assertEqual('36742b0f000004e4f0000000000000ace', device.get_wwid())
+        self.assertEqual('InfiniBox', device.get_scsi_standard_inquiry().product_identification.strip())
+        self.assertEqual(0, self.target.count_cdbs())
+
+    def test_fallback_to_sg_io(self):
+        device = self._get_device('vpd_pg80')
+        self.assertEqual('sysfs_serial', device.get_scsi_serial_number())
+        self.assertEqual('36742b0f000004e4f0000000000000ace', device.get_wwid())
+        self.assertEqual(2, self.target.count_cdbs())
+
+    def test_truncated_standard_inquiry(self):
+        self.target.standard_inquiry = self.target.standard_inquiry[:36]
+        device = self._get_device('inquiry')
+        self.target.standard_inquiry += b'\x00' * 60
+        device.get_scsi_standard_inquiry()
+        self.assertEqual(1, self.target.count_cdbs())
+
+
+class SysfsBenchmarkTestCase(TestCase):
+    def test_benchmark_small(self):
+        from benchmark_sysfs import benchmark_sysfs_populate
+        if name == "nt":
+            raise SkipTest
+        fake = build_fake_sysfs(200)
+        self.addCleanup(fake.cleanup)
+        sysfs = benchmark_sysfs_populate(fake.root)
+        self.assertEqual(200, len(sysfs.get_all_sd_disks()))
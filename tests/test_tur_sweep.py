@@ -0,0 +1,79 @@
+from unittest import TestCase
+from time import time
+from infi.storagemodel.base.gevent_wrapper import sleep
+from infi.storagemodel.base.inquiry import sweep_test_unit_ready
+
+
+class Device(object):
+    def __init__(self, name, delay=0, ready=True, error=None):
+        self.name = name
+        self.delay = delay
+        self.ready = ready
+        self.error = error
+
+    def get_scsi_test_unit_ready(self):
+        sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.ready
+
+    def __repr__(self):
+        return "<Device {}>".format(self.name)
+
+
+class SweepTestUnitReadyTestCase(TestCase):
+    def test_readiness(self):
+        devices = [Device("ready"), Device("not-ready", ready=False), Device("dead", delay=5)]
+        start = time()
+        readiness = sweep_test_unit_ready(devices, device_timeout=0.2)
+        self.assertLess(time() - start, 1)
+        self.assertEqual([True, False, None], [readiness[device] for device in devices])
+
+    def test_dead_device_does_not_hold_a_worker(self):
+        devices = [Device("dead", delay=5)] + [Device(str(index), delay=0.05) for index in range(4)]
+        readiness = sweep_test_unit_ready(devices, device_timeout=0.1, concurrency=1)
+        self.assertEqual([None, True, True, True, True], [readiness[device] for device in devices])
+
+    def test_sweep_timeout(self):
+        devices = [Device(str(index), delay=0.1) for index in range(10)]
+        start = time()
+        readiness = sweep_test_unit_ready(devices, timeout=0.25, concurrency=2)
+        self.assertLess(time() - start, 1)
+        self.assertEqual(set([True, None]), set(readiness.values()))
+        self.assertEqual(set(devices), set(readiness))
+
+    def test_errors(self):
+        devices = [Device("ok"), Device("error", error=ValueError())]
+        self.assertRaises(ValueError, sweep_test_unit_ready, devices)
+        self.assertEqual({}, sweep_test_unit_ready([]))
+
+    def test_many_workers_finish(self):
+        devices = [Device(str(index)) for index in range(500)]
+        start = time()
+        readiness = sweep_test_unit_ready(devices, timeout=10, concurrency=100)
+        self.assertLess(time() - start, 5)
+        self.assertEqual([True] * len(devices), [readiness[device] for device in devices])
+
+    def test_hung_device_is_not_swept_again(self):
+        from infi.storagemodel.base.gevent_wrapper import Event
+        released = Event()
+
+        class HungDevice(Device):
+            commands = 0
+
+            def get_scsi_test_unit_ready(self):
+                HungDevice.commands += 1
+                released.wait()
+                return True
+
+        hung, ready = HungDevice("hung"), Device("ready")
+        try:
+            for _ in range(2):
+                readiness = sweep_test_unit_ready([hung, ready], device_timeout=0.1)
+                self.assertEqual([None, True], [readiness[hung], readiness[ready]])
+            self.assertEqual(1, HungDevice.commands)
+        finally:
+            released.set()
+        sleep(0.05)
+        self.assertEqual({hung: True}, sweep_test_unit_ready([hung], device_timeout=0.1))
+        self.assertEqual(2, HungDevice.commands)
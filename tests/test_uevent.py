@@ -0,0 +1,106 @@
+from unittest import TestCase, SkipTest
+from os import name
+from time import time
+from fake_uevent import FakeUeventSource, format_uevent
+
+DEVPATH = '/devices/pci0000:00/0000:00:15.0/host3/target3:0:0/3:0:0:1'
+
+
+class UeventTestCase(TestCase):
+    def setUp(self):
+        from infi.storagemodel.linux.uevent import UeventListener
+        if name == "nt":
+            raise SkipTest
+        self.source = FakeUeventSource()
+        self.listener = UeventListener(self.source)
+        self.addCleanup(self.listener.close)
+
+    def test_parse(self):
+        from infi.storagemodel.linux.uevent import parse_uevent
+        uevent = parse_uevent(format_uevent('add', DEVPATH + '/block/sdb', 'block', DEVNAME='sdb', SEQNUM=1234))
+        self.assertEqual(dict(ACTION='add', DEVPATH=DEVPATH + '/block/sdb', SUBSYSTEM='block', DEVNAME='sdb',
+                              SEQNUM='1234'), uevent)
+        self.assertIsNone(parse_uevent(b'libudev\0\xfe\xed\xca\xfe'))
+
+    def test_timeout(self):
+        start = time()
+        self.assertEqual([], self.listener.wait_for_change(0.05))
+        self.assertLess(time() - start, 1)
+
+    def test_burst(self):
+        self.source.send('add', DEVPATH, 'scsi')
+        self.source.send('add', DEVPATH + '/scsi_device/3:0:0:1', 'scsi_device')
+        self.source.send('add', '/devices/virtual/net/veth0', 'net')
+        self.source.send_raw(b'libudev\0\xfe\xed\xca\xfe')
+        self.source.send('add', DEVPATH + '/block/sdb', 'block')
+        uevents = self.listener.wait_for_change(5, settle_time=0.05)
+        self.assertEqual(['scsi', 'scsi_device', 'block'], [uevent['SUBSYSTEM'] for uevent in uevents])
+        self.assertEqual([], self.listener.wait_for_change(0.01))
+
+    def test_irrelevant_uevents_only(self):
+        self.source.send('add', '/devices/virtual/net/veth0', 'net')
+        self.assertEqual([], self.listener.wait_for_change(0.05))
+
+
+class NetlinkUeventSourceTestCase(TestCase):
+    def test_two_sources_in_one_process(self):
+        from infi.storagemodel.linux.uevent import NetlinkUeventSource
+        try:
+            first = NetlinkUeventSource()
+        except (AttributeError, EnvironmentError):
+            raise SkipTest("netlink is not available")
+        self.addCleanup(first.close)
+        second = NetlinkUeventSource()
+        self.addCleanup(second.close)
+        self.assertNotEqual(first._socket.getsockname(), second._socket.getsockname())
+
+
+class RescanAndWaitForTestCase(TestCase):
+    def setUp(self):
+        from infi.storagemodel.linux import LinuxStorageModel
+        from infi.storagemodel.linux.uevent import UeventListener
+        if name == "nt":
+            raise SkipTest
+        source = self.source = FakeUeventSource()
+        test = self
+        test.rescans = 0
+
+        class Model(LinuxStorageModel):
+            device_change_poll_interval_in_seconds = 0.05
+
+            def _initiate_rescan(self, **kwargs):
+                test.rescans += 1
+                if test.send_uevents:
+                    source.send('add', DEVPATH, 'scsi')
+
+            def _create_device_change_listener(self):
+                return UeventListener(source)
+
+        self.model = Model()
+
+    def _predicate(self, true_on_call):
+        calls = []
+
+        def predicate():
+            calls.append(1)
+            return len(calls) >= true_on_call
+        return predicate
+
+    def test_predicate_is_tried_on_uevents(self):
+        self.send_uevents = True
+        start = time()
+        self.model.rescan_and_wait_for(self._predicate(2), 10)
+        self.assertLess(time() - start, 1)
+        self.assertEqual(1, self.rescans)
+        self.assertTrue(self.source.closed)
+
+    def test_rescan_again_when_nothing_changes(self):
+        self.send_uevents = False
+        self.model.rescan_and_wait_for(self._predicate(3), 10)
+        self.assertEqual(3, self.rescans)
+
+    def test_timeout(self):
+        from infi.storagemodel.errors import TimeoutError
+        self.send_uevents = False
+        self.assertRaises(TimeoutError, self.model.rescan_and_wait_for, self._predicate(1000), 0.2)
+        self.assertTrue(self.source.closed)